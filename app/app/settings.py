@@ -111,6 +111,31 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Password hashing
+# HASHER picks the preferred hasher (argon2, bcrypt or pbkdf2) and its cost. Hashes made by the other hashers of the
+# list (e.g. the PBKDF2 hashes of existing users) still verify and are re-hashed with the preferred one on login.
+# OFFLOAD_WORKERS > 0 verifies passwords in a bounded thread pool (user.backends.HashOffloadModelBackend).
+PASSWORD_HASHING = {
+    'HASHER': os.environ.get('PASSWORD_HASHER', 'argon2'),
+    'ARGON2_TIME_COST': int(os.environ.get('ARGON2_TIME_COST', 2)),
+    'ARGON2_MEMORY_COST': int(os.environ.get('ARGON2_MEMORY_COST', 65536)),  # KiB
+    'ARGON2_PARALLELISM': 1,
+    'BCRYPT_ROUNDS': int(os.environ.get('BCRYPT_ROUNDS', 12)),
+    'OFFLOAD_WORKERS': int(os.environ.get('PASSWORD_HASH_WORKERS', 0)),
+}
+
+_PASSWORD_HASHERS = {
+    'argon2': 'user.hashers.TunableArgon2PasswordHasher',
+    'bcrypt': 'user.hashers.TunableBCryptSHA256PasswordHasher',
+    'pbkdf2': 'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+}
+PASSWORD_HASHERS = [_PASSWORD_HASHERS[PASSWORD_HASHING['HASHER']]] + [
+    hasher for name, hasher in _PASSWORD_HASHERS.items() if name != PASSWORD_HASHING['HASHER']
+] + ['django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher']
+
+AUTHENTICATION_BACKENDS = ['user.backends.HashOffloadModelBackend']
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/3.2/topics/i18n/
 
@@ -141,3 +166,73 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 
 AUTH_USER_MODEL = 'core.UserAccount'
+
+
+# JSON rendered/parsed with orjson when it is installed (core/renderers.py, core/parsers.py), same output as DRF's
+REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': (
+        'core.renderers.StreamingJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'core.parsers.JSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
+}
+
+# Responses of more than STREAM_MIN_ITEMS list items are streamed in pieces of STREAM_CHUNK_SIZE bytes
+JSON_RENDERING = {
+    'STREAM_MIN_ITEMS': 1000,
+    'STREAM_CHUNK_SIZE': 64 * 1024,
+}
+
+# Token -> user cache used by user.authentication.CachedTokenAuthentication
+# SHARED_CACHE is an alias of CACHES shared by all workers (e.g. redis), None keeps the in-process LRU only.
+# Without it a deleted token or deactivated user is only evicted from the worker handling the change, the other
+# workers trust their entry for up to TTL seconds: keep it short when running several workers without SHARED_CACHE
+TOKEN_AUTH_CACHE = {
+    'TTL': int(os.environ.get('TOKEN_AUTH_CACHE_TTL', 60)),
+    'MAX_SIZE': 10000,
+    'SHARED_CACHE': os.environ.get('TOKEN_AUTH_SHARED_CACHE') or None,
+}
+
+# Per-user cache of the tag/ingredient/recipe lists (recipe/cache.py), TTL 0 disables it.
+# SHARED_CACHE is an alias of CACHES shared by all workers (e.g. redis), None keeps the in-process LRU only
+LIST_CACHE = {
+    'TTL': int(os.environ.get('LIST_CACHE_TTL', 300)),
+    'MAX_SIZE': 1000,
+    'SHARED_CACHE': os.environ.get('LIST_SHARED_CACHE') or None,
+}
+
+# ?q= search of the recipes (recipe/search.py), run ./manage.py update_search_vectors after changing CONFIG
+RECIPE_SEARCH = {
+    'CONFIG': 'english',
+    'MAX_TERMS': 10,
+}
+
+# Resized WebP/JPEG copies of the recipe images generated by recipe.images in a pool of WORKERS threads
+# (0 generates them inline, once the upload request commits)
+RECIPE_IMAGES = {
+    'WORKERS': int(os.environ.get('RECIPE_IMAGE_WORKERS', 2)),
+    'SIZES': {'thumbnail': 200, 'medium': 800, 'large': 1600},
+    'FORMATS': ('webp', 'jpeg'),
+    'QUALITY': 80,
+}
+
+# Resumable chunked image uploads (recipe/uploads.py), the partial files are kept in TEMP_DIR
+CHUNKED_UPLOADS = {
+    'TEMP_DIR': os.environ.get('CHUNKED_UPLOAD_DIR', '/vol/web/uploads'),
+    'MAX_SIZE': 30 * 1024 * 1024,
+    'MAX_CHUNK_SIZE': 8 * 1024 * 1024,
+    'MAX_CONCURRENT_CHUNKS': int(os.environ.get('CHUNKED_UPLOAD_CONCURRENCY', 4)),  # per worker process
+    'EXPIRY_HOURS': 24,
+}
+
+# Media files view core.views.serve_media, SENDFILE 'x-accel-redirect' (nginx) or 'x-sendfile' (Apache) lets the
+# front server send the file, nginx needs an internal location ACCEL_REDIRECT_PREFIX aliased to MEDIA_ROOT
+MEDIA_SERVING = {
+    'SENDFILE': os.environ.get('MEDIA_SENDFILE') or None,
+    'ACCEL_REDIRECT_PREFIX': '/protected-media/',
+    'MAX_AGE': 3600,
+}
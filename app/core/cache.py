@@ -0,0 +1,44 @@
+"""
+In-process LRU of the token authentication (user/authentication.py) and of the list response cache
+(recipe/cache.py), every worker process has its own.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+class LocalCache:
+    """Thread safe LRU of key -> value whose entries expire after a TTL"""
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl, max_size):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > max_size:
+                self._entries.popitem(last=False)  # least recently used
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,50 @@
+"""
+Change log of the recipes, tags and ingredients of the users, read by the delta sync (GET /api/recipe/sync/).
+
+Every change bumps the collection version of the user (core/conditional.py) and logs the written objects under the
+new version. The version row stays locked until the transaction commits, so the versions of one user are committed
+in order: a client holding version N has seen every change up to N and only needs the log rows after it.
+"""
+from django.db import transaction
+from django.db.models import Max
+
+from core.conditional import bump_collection_version
+from core.models import ChangeLog, CollectionVersion
+
+
+def record_changes(user_id, model, object_ids, action=ChangeLog.UPSERT):
+    """Bump the collection version of the user and log the objects under it, return the version"""
+    object_ids = list(object_ids)
+    if not object_ids:
+        return None
+
+    # in autocommit mode too the version and its log rows commit together, inside a transaction no savepoint is needed
+    with transaction.atomic(savepoint=False):
+        version = bump_collection_version(user_id)
+        ChangeLog.objects.bulk_create([
+            ChangeLog(
+                useraccount_id=user_id, version=version, model=model._meta.model_name, object_id=object_id,
+                action=action
+            )
+            for object_id in object_ids
+        ])
+    return version
+
+
+def prune_changes(before):
+    """Delete the log rows created before a datetime, return the number of rows deleted"""
+    deleted = 0
+    pruned = (
+        ChangeLog.objects.filter(created_at__lt=before)
+        .values('useraccount_id').annotate(version=Max('version')).order_by()
+    )
+    for row in pruned:
+        with transaction.atomic():
+            # a client with an older version than pruned_version can't sync its delta any more
+            CollectionVersion.objects.filter(
+                pk=row['useraccount_id'], pruned_version__lt=row['version']
+            ).update(pruned_version=row['version'])
+            deleted += ChangeLog.objects.filter(
+                useraccount_id=row['useraccount_id'], version__lte=row['version']
+            ).delete()[0]
+    return deleted
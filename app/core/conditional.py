@@ -0,0 +1,46 @@
+"""
+ETags of the API resources, built from cheap version markers instead of the response body.
+
+A single object is versioned by its updated_at column, a collection by the CollectionVersion of its owner, bumped
+on every change of the user's recipes, tags and ingredients (recipe/signals.py). The views read the marker with a
+one-row query in the etag_func of Django's condition() decorator, which answers 304 to a matching If-None-Match
+before the list query or the serializer run.
+"""
+import hashlib
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from core.models import CollectionVersion
+
+
+def make_etag(*parts):
+    """Return a weak ETag of the parts (the same representation, not the same bytes: it may be compressed)"""
+    digest = hashlib.sha1(':'.join(str(part) for part in parts).encode()).hexdigest()
+    return f'W/"{digest}"'
+
+
+def get_collection_version(user_id):
+    """Return the version of the recipes, tags and ingredients of a user"""
+    return CollectionVersion.objects.filter(pk=user_id).values_list('version', flat=True).first() or 0
+
+
+def bump_collection_version(user_id):
+    """Increment the collection version of a user and return it"""
+    # the UPDATE locks the row until the transaction ends: the writers of one user get their versions in commit order
+    versions = CollectionVersion.objects.filter(pk=user_id)
+    if not versions.update(version=F('version') + 1):
+        try:
+            with transaction.atomic():
+                return CollectionVersion.objects.create(useraccount_id=user_id, version=1).version
+        except IntegrityError:  # created by a concurrent request
+            versions.update(version=F('version') + 1)
+    return versions.values_list('version', flat=True).get()
+
+
+# etag_func of django.views.decorators.http.condition for the list endpoints
+def collection_etag(request, *args, **kwargs):
+    """Return the ETag of a list of the user: its collection version and the url (filters, page)"""
+    user_id = request.user.pk
+    request.collection_version = get_collection_version(user_id)  # reused by the list cache (recipe/cache.py)
+    return make_etag(user_id, request.collection_version, request.get_full_path())
@@ -0,0 +1,37 @@
+from django.db import migrations
+
+
+# The auto-created through tables only have (recipe_id, tag_id) as a composite index, which serves
+# recipe -> tags. Filtering recipes by tag id (RecipeViewSet ?tag_fk=, TagViewSet ?assigned_only=) goes the other
+# way, so we add (tag_id, recipe_id) / (ingredient_id, recipe_id) to make those lookups index-only scans.
+# The single column tag_id / ingredient_id indexes Django created (named after the tables before 0008 renamed them)
+# are a prefix of the new ones, so they are dropped instead of being maintained twice on every insert.
+# Django has no model for these tables (no explicit through=) therefore the indexes are managed with raw SQL.
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql=[
+                'CREATE INDEX core_recipe_tag_fk_tag_recipe_idx ON core_recipe_tag_fk (tag_id, recipe_id);',
+                'DROP INDEX IF EXISTS core_recipe_tags_tag_id_10c0ffea;',
+            ],
+            reverse_sql=[
+                'CREATE INDEX core_recipe_tags_tag_id_10c0ffea ON core_recipe_tag_fk (tag_id);',
+                'DROP INDEX core_recipe_tag_fk_tag_recipe_idx;',
+            ],
+        ),
+        migrations.RunSQL(
+            sql=[
+                'CREATE INDEX core_recipe_ing_fk_ing_recipe_idx ON core_recipe_ingredient_fk (ingredient_id, recipe_id);',
+                'DROP INDEX IF EXISTS core_recipe_ingredients_ingredient_id_a8fec9ee;',
+            ],
+            reverse_sql=[
+                'CREATE INDEX core_recipe_ingredients_ingredient_id_a8fec9ee ON core_recipe_ingredient_fk (ingredient_id);',
+                'DROP INDEX core_recipe_ing_fk_ing_recipe_idx;',
+            ],
+        ),
+    ]
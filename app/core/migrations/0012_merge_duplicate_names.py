@@ -0,0 +1,45 @@
+# Generated by Django 3.2.12 on 2026-10-18 09:04
+
+from django.db import migrations
+from django.db.models import Count, Min
+
+
+def merge_duplicate_names(apps, schema_editor):
+    """Merge the tags/ingredients a user created twice under the same name into the oldest one"""
+    Recipe = apps.get_model('core', 'Recipe')
+
+    for model_name, name_field, recipe_field in (('Tag', 'tag_name', 'tag_fk'),
+                                                 ('Ingredient', 'ing_name', 'ingredient_fk')):
+        model = apps.get_model('core', model_name)
+        field = Recipe._meta.get_field(recipe_field)
+        through = field.remote_field.through
+        target = field.m2m_reverse_name()  # 'tag_id'
+
+        duplicates = model.objects.values('useraccount', name_field).annotate(
+            keep_id=Min('id'), total=Count('id')
+        ).filter(total__gt=1)
+        for group in duplicates:
+            twin_ids = list(model.objects.filter(
+                useraccount=group['useraccount'], **{name_field: group[name_field]}
+            ).exclude(id=group['keep_id']).values_list('id', flat=True))
+
+            # link the recipes of the twins to the kept row (once), then drop the twins and their links
+            linked = set(through.objects.filter(**{target: group['keep_id']}).values_list('recipe_id', flat=True))
+            recipe_ids = set(through.objects.filter(**{f'{target}__in': twin_ids}).values_list('recipe_id', flat=True))
+            through.objects.bulk_create([
+                through(recipe_id=recipe_id, **{target: group['keep_id']}) for recipe_id in recipe_ids - linked
+            ])
+            model.objects.filter(id__in=twin_ids).delete()
+
+
+# The data migration runs on its own: Postgres refuses to ALTER core_tag while the deferred FK checks of the
+# deleted rows are still pending in the same transaction.
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_recipe_m2m_reverse_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_names, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 3.2.12 on 2026-10-18 09:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_merge_duplicate_names'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='ingredient',
+            constraint=models.UniqueConstraint(fields=('useraccount', 'ing_name'), name='core_ing_user_name_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='tag',
+            constraint=models.UniqueConstraint(fields=('useraccount', 'tag_name'), name='core_tag_user_name_uniq'),
+        ),
+    ]
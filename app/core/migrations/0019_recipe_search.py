@@ -0,0 +1,53 @@
+# Generated by Django 3.2.12 on 2026-10-18 09:45
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations, transaction
+
+
+def fill_search_vectors(apps, schema_editor):
+    """Build the search vector of the existing recipes"""
+    from recipe.search import update_search_vectors
+
+    update_search_vectors(apps.get_model('core', 'Recipe').objects.all())
+
+
+def create_trigram_index(apps, schema_editor):
+    """Create pg_trgm and the trigram index of the titles, skipped when the extension can't be installed"""
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+        if cursor.fetchone() is None:
+            return
+        try:
+            with transaction.atomic(using=schema_editor.connection.alias):
+                cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        except Exception:  # a role without the CREATE privilege before Postgres 13: search without typo tolerance
+            return
+        cursor.execute('CREATE INDEX core_recipe_title_trgm_idx ON core_recipe USING gin (title gin_trgm_ops)')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0018_change_log'),
+    ]
+
+    # the vectors are filled before the GIN index is built, rather than updating the index row by row.
+    # pg_trgm (the typo tolerant part of the search, recipe/search.py) is a contrib extension not every server has,
+    # so the trigram index is not in the model state
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(fill_search_vectors, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='core_recipe_search_idx'),
+        ),
+        migrations.RunPython(
+            create_trigram_index,
+            lambda apps, schema_editor: schema_editor.execute('DROP INDEX IF EXISTS core_recipe_title_trgm_idx'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+from django.db import migrations
+
+
+# The autocomplete/ action of the tag and ingredient viewsets filters "UPPER(tag_name) LIKE UPPER('ve%')". A b-tree
+# only serves LIKE prefixes with the byte order of text_pattern_ops (the database collation isn't C), and Django
+# 3.2 can't declare an opclass on an expression index, so the indexes are managed with raw SQL.
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0019_recipe_search'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql='CREATE INDEX core_tag_user_name_prefix_idx ON core_tag (useraccount_id, upper(tag_name) text_pattern_ops);',
+            reverse_sql='DROP INDEX core_tag_user_name_prefix_idx;',
+        ),
+        migrations.RunSQL(
+            sql='CREATE INDEX core_ing_user_name_prefix_idx ON core_ingredient (useraccount_id, upper(ing_name) text_pattern_ops);',
+            reverse_sql='DROP INDEX core_ing_user_name_prefix_idx;',
+        ),
+    ]
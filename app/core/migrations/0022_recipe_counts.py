@@ -0,0 +1,33 @@
+# Generated by Django 3.2.12 on 2026-10-18 09:57
+
+from django.db import migrations, models
+
+
+def count_recipes(apps, schema_editor):
+    """Count the recipes of the existing tags and ingredients"""
+    from recipe.counts import reconcile
+
+    Recipe = apps.get_model('core', 'Recipe')
+    for field_name in ('tag_fk', 'ingredient_fk'):
+        reconcile(Recipe, field_name)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0021_recipe_range_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ingredient',
+            name='recipe_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='tag',
+            name='recipe_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(count_recipes, migrations.RunPython.noop),
+    ]
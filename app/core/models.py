@@ -3,9 +3,13 @@ import os
 
 from django.db import models
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 
 from django.conf import settings
 
+from core.storage import ContentAddressedStorage
+
 
 def recipe_image_file_path(instance, filename):
     """Generate file path for new recipe image"""
@@ -70,6 +74,7 @@ class UserAccount(AbstractBaseUser, PermissionsMixin):
     is_active   = models.BooleanField(default=True, verbose_name='is_active')
     is_admin    = models.BooleanField(default=False, verbose_name='is_admin')
     is_staff    = models.BooleanField(default=False, verbose_name='is_staff')
+    updated_at  = models.DateTimeField(auto_now=True)  # version of /api/user/me/ for the ETags
     # this will pop when running "python manage.py createsuperuser"
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username', 'first_name', 'last_name']
@@ -84,34 +89,70 @@ class UserAccount(AbstractBaseUser, PermissionsMixin):
         return self.email
 
 
+# number of recipes using a tag/ingredient, kept by recipe/counts.py with "recipe_count = recipe_count + n" updates
+# when the recipes are linked/unlinked (./manage.py reconcile_recipe_counts recounts them)
+class RecipeCountModel(models.Model):
+    """Abstract model with the denormalized number of recipes of the object"""
+    recipe_count = models.PositiveIntegerField(default=0, editable=False)
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        # a full save of a loaded object would write back the count read with it, over the concurrent updates
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'recipe_count'
+            ]
+        super().save(*args, **kwargs)
+
+
 # creating class tags() because AttributeError: module 'core.models' has no attribute 'Tag'
-class Tag(models.Model):
+class Tag(RecipeCountModel):
     """Tag to be used for a recipe"""
     print('*****Tag_Model*****')
 
     # Id = models.UUIDField(default=uuid.uuid4, primary_key=True)
     tag_name = models.CharField(max_length=255)
+    updated_at = models.DateTimeField(auto_now=True)
     useraccount = models.ForeignKey(
         settings.AUTH_USER_MODEL,   # Note that Django suggests getting the User from the settings for relationship definitions
         on_delete=models.CASCADE,
 
     )
 
+    class Meta:
+        # recipes can reference tags by name (get-or-create), the constraint stops concurrent writers creating twins.
+        # Its index also serves TagViewSet, which lists the tags of one user ordered by (tag_name, id) and pages on
+        # that position: the names are unique per user so the id never breaks a tie.
+        # + core_tag_user_name_prefix_idx on (useraccount_id, upper(tag_name)) for autocomplete/ (migration 0020)
+        constraints = [
+            models.UniqueConstraint(fields=['useraccount', 'tag_name'], name='core_tag_user_name_uniq'),
+        ]
+
     # String Representation
     def __str__(self):
         return self.tag_name
 
 
-class Ingredient(models.Model):
+class Ingredient(RecipeCountModel):
     """Ingredient to be used in a recipe"""
     print('*****Ingredient_Model*****')
 
     ing_name = models.CharField(max_length=255, verbose_name='ing_name')
+    updated_at = models.DateTimeField(auto_now=True)
     useraccount = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE
     )
 
+    class Meta:
+        # + core_ing_user_name_prefix_idx on (useraccount_id, upper(ing_name)) for autocomplete/ (migration 0020)
+        constraints = [
+            models.UniqueConstraint(fields=['useraccount', 'ing_name'], name='core_ing_user_name_uniq'),
+        ]
+
     def __str__(self):
         return self.ing_name
 
@@ -134,8 +175,121 @@ class Recipe(models.Model):
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE
     )
-    image = models.ImageField(null=True, upload_to=recipe_image_file_path)  # added image field to handle Images (veiws, serializer)
+    # stored under the hash of the content, uploading the same photo again doesn't store a second copy
+    image = models.ImageField(null=True, upload_to=recipe_image_file_path, storage=ContentAddressedStorage())  # added image field to handle Images (veiws, serializer)
+
+    # resized WebP/JPEG copies of the image generated in the background by recipe.images,
+    # image_renditions = {'thumbnail': {'webp': 'uploads/recipe/ab/ab12...ef.webp', 'jpeg': ...}, ...}
+    IMAGE_PENDING = 'pending'
+    IMAGE_READY = 'ready'
+    IMAGE_FAILED = 'failed'
+    IMAGE_STATUS_CHOICES = [
+        (IMAGE_PENDING, 'Pending'),
+        (IMAGE_READY, 'Ready'),
+        (IMAGE_FAILED, 'Failed'),
+    ]
+    image_status = models.CharField(max_length=10, choices=IMAGE_STATUS_CHOICES, blank=True)
+    image_renditions = models.JSONField(default=dict, blank=True)
+
+    # version of the recipe for the ETags: also touched when its tags/ingredients change (recipe/signals.py)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    # tsvector of the title, tag and ingredient names for the ?q= search, kept up to date by recipe/search.py
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['useraccount', 'id'], name='core_recipe_user_id_idx'),
+            # ?time_max= / ?price_min= ranges and ?ordering= of the recipe list, id is the keyset tie-breaker
+            models.Index(fields=['useraccount', 'time_minutes', 'id'], name='core_recipe_user_time_idx'),
+            models.Index(fields=['useraccount', 'price', 'id'], name='core_recipe_user_price_idx'),
+            GinIndex(fields=['search_vector'], name='core_recipe_search_idx'),
+            # + core_recipe_title_trgm_idx, the trigram index of the title when pg_trgm is installed (migration 0019)
+        ]
 
     # String Representation
     def __str__(self):
         return self.title
+
+
+# chunked upload of a recipe image in progress (see recipe/uploads.py), the received bytes are appended to
+# <CHUNKED_UPLOADS['TEMP_DIR']>/<id>.part until the upload is finalized into Recipe.image
+class ImageUpload(models.Model):
+    """Resumable image upload of a recipe"""
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE, related_name='image_uploads')
+    filename = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField()  # total bytes announced by the client
+    sha256 = models.CharField(max_length=64)  # hex digest of the whole file, checked when finalizing
+    offset = models.PositiveBigIntegerField(default=0)  # bytes received so far
+    header_checked = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f'{self.filename} ({self.offset}/{self.size})'
+
+
+# a file of ContentAddressedStorage (core/storage.py) and the number of references to it (recipe images, renditions)
+class ImageBlob(models.Model):
+    """Deduplicated image file"""
+
+    name = models.CharField(max_length=255, unique=True)
+    size = models.PositiveBigIntegerField()
+    refcount = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f'{self.name} (x{self.refcount})'
+
+
+# bumped on every change of a user's recipes, tags or ingredients (recipe/signals.py), the list ETags are built from it.
+# No database constraint: the row may be bumped while the user is being deleted, a left-over row is harmless
+class CollectionVersion(models.Model):
+    """Version of the recipes, tags and ingredients of a user"""
+
+    useraccount = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        primary_key=True
+    )
+    version = models.PositiveBigIntegerField(default=0)
+    pruned_version = models.PositiveBigIntegerField(default=0)  # the ChangeLog rows up to this version were deleted
+
+    def __str__(self):
+        return f'{self.useraccount_id}: {self.version}'
+
+
+# one row per recipe, tag or ingredient written by a change of the user's collection (core/changes.py), under the
+# collection version of the change. GET /api/recipe/sync/?since=<version> replays the rows after a version,
+# the deleted objects keep a row (a tombstone) so the clients learn about the deletions too.
+class ChangeLog(models.Model):
+    """Change of a recipe, tag or ingredient of a user"""
+
+    UPSERT = 'upsert'
+    DELETE = 'delete'
+    ACTION_CHOICES = [
+        (UPSERT, 'Created or updated'),
+        (DELETE, 'Deleted'),
+    ]
+
+    useraccount = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,  # written while the user's recipes are deleted with the user, see CollectionVersion
+        related_name='+'
+    )
+    version = models.PositiveBigIntegerField()
+    model = models.CharField(max_length=20)  # model_name: 'recipe', 'tag' or 'ingredient'
+    object_id = models.BigIntegerField()
+    action = models.CharField(max_length=10, choices=ACTION_CHOICES)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['useraccount', 'version'], name='core_changelog_user_ver_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.version} {self.action} {self.model} {self.object_id}'
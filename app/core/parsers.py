@@ -0,0 +1,27 @@
+"""
+JSON parser of the API (settings.REST_FRAMEWORK['DEFAULT_PARSER_CLASSES']): DRF's JSONParser, with orjson reading
+the request body when it is installed. Like DRF in strict mode, NaN and Infinity are rejected.
+"""
+from django.conf import settings
+from rest_framework import parsers
+from rest_framework.exceptions import ParseError
+
+from core.renderers import JSONRenderer, orjson
+
+
+class JSONParser(parsers.JSONParser):
+    """DRF's JSON parser, decoding with orjson when it is installed"""
+    renderer_class = JSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if orjson is None or not self.strict:
+            return super().parse(stream, media_type, parser_context)
+
+        encoding = (parser_context or {}).get('encoding', settings.DEFAULT_CHARSET)
+        try:
+            body = stream.read()
+            if encoding.lower().replace('-', '') != 'utf8':
+                body = body.decode(encoding)
+            return orjson.loads(body)
+        except (ValueError, UnicodeDecodeError) as exc:  # orjson.JSONDecodeError is a ValueError
+            raise ParseError('JSON parse error - %s' % str(exc))
@@ -0,0 +1,128 @@
+"""
+JSON renderers of the API (settings.REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES']).
+
+JSONRenderer writes the same bytes as DRF's JSONRenderer (compact, UTF-8, U+2028/U+2029 escaped, datetimes ending
+in 'Z', Decimals and lazy strings through DRF's encoder) with orjson when it is installed, a few times faster than
+the stdlib json module. Without orjson, and for the indented output of ?indent= / the browsable API, DRF renders.
+
+StreamingJSONRenderer can also write a response piece by piece: stream_response() turns the responses holding
+more than JSON_RENDERING['STREAM_MIN_ITEMS'] list items into a StreamingHttpResponse encoding one item at a time,
+instead of building the whole string in memory before the first byte is sent.
+"""
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from rest_framework import renderers
+
+try:
+    import orjson
+except ImportError:  # optional, DRF's stdlib json rendering is used instead
+    orjson = None
+
+
+DEFAULTS = {
+    'STREAM_MIN_ITEMS': 1000,  # list items of a response from which it is streamed
+    'STREAM_CHUNK_SIZE': 64 * 1024,  # bytes buffered before a piece of a streamed response is sent
+}
+
+
+def get_json_settings():
+    """Return JSON_RENDERING merged with the defaults"""
+    return {**DEFAULTS, **getattr(settings, 'JSON_RENDERING', {})}
+
+
+class JSONRenderer(renderers.JSONRenderer):
+    """DRF's JSON output, encoded with orjson when it is installed"""
+
+    def use_orjson(self, accepted_media_type, renderer_context):
+        """Return whether orjson can write the output DRF would write"""
+        return (
+            orjson is not None and self.compact and not self.ensure_ascii
+            and not self.get_indent(accepted_media_type, renderer_context or {})
+        )
+
+    def dumps(self, data):
+        """Return the JSON bytes of data"""
+        ret = orjson.dumps(
+            data,
+            default=self.encoder_class().default,  # Decimal, lazy strings, querysets... like DRF
+            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME,  # datetimes too: '...Z' like DRF
+        )
+        # like DRF: U+2028 and U+2029 are valid JSON but end a line in javascript
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None or not self.use_orjson(accepted_media_type, renderer_context):
+            return super().render(data, accepted_media_type, renderer_context)
+        return self.dumps(data)
+
+
+class StreamingJSONRenderer(JSONRenderer):
+    """JSON renderer that can also encode a response one list item at a time, see stream_response()"""
+
+    def iter_render(self, data, accepted_media_type=None, renderer_context=None):
+        """Yield the JSON of data in pieces of about STREAM_CHUNK_SIZE bytes"""
+        if self.use_orjson(accepted_media_type, renderer_context):
+            dumps = self.dumps
+        else:
+            def dumps(value):
+                if value is None:  # DRF renders no data as an empty body
+                    return b'null'
+                return super(StreamingJSONRenderer, self).render(value, accepted_media_type, renderer_context)
+
+        chunk_size = get_json_settings()['STREAM_CHUNK_SIZE']
+        buffer = bytearray()
+        for piece in self._iter_json(data, dumps):
+            buffer += piece
+            if len(buffer) >= chunk_size:
+                yield bytes(buffer)
+                buffer.clear()
+        if buffer:
+            yield bytes(buffer)
+
+    def _iter_json(self, data, dumps):
+        """Yield the JSON of data, the dicts key by key and the lists item by item"""
+        if isinstance(data, dict):
+            yield b'{'
+            for index, (key, value) in enumerate(data.items()):
+                yield (b',' if index else b'') + dumps(key if isinstance(key, str) else str(key)) + b':'
+                yield from self._iter_json(value, dumps)
+            yield b'}'
+        elif isinstance(data, (list, tuple)):
+            yield b'['
+            for index, item in enumerate(data):
+                yield (b',' if index else b'') + dumps(item)
+            yield b']'
+        else:
+            yield dumps(data)
+
+
+def count_items(data, depth=2):
+    """Return the number of list items in data and its dict values, down to depth"""
+    if isinstance(data, (list, tuple)):
+        return len(data)
+    if isinstance(data, dict) and depth:
+        return sum(count_items(value, depth - 1) for value in data.values())
+    return 0
+
+
+def stream_response(response):
+    """Return a StreamingHttpResponse of a large rendered DRF response, the response itself otherwise"""
+    renderer = getattr(response, 'accepted_renderer', None)
+    if (
+        not isinstance(renderer, StreamingJSONRenderer) or response.status_code != 200
+        or count_items(response.data) < get_json_settings()['STREAM_MIN_ITEMS']
+    ):
+        return response
+
+    streaming = StreamingHttpResponse(
+        renderer.iter_render(response.data, response.accepted_media_type, response.renderer_context),
+        status=response.status_code,
+        content_type=response.accepted_media_type,
+    )
+    for header, value in response.items():
+        if header.lower() != 'content-type':
+            streaming[header] = value
+    streaming.data = response.data  # like a DRF response, for the tests and middlewares reading it
+    return streaming
@@ -0,0 +1,94 @@
+"""
+Content-addressed storage for the recipe images.
+
+A file is stored under the SHA-256 of its bytes, uploads/recipe/<2 first hex>/<sha256>.<ext>, whatever name it was
+uploaded with. Saving a file that is already stored only increments the reference count of its ImageBlob row, and
+delete() decrements it, the file itself is removed with the last reference. Our imports re-upload the same photos
+over and over, they now cost one copy each.
+
+Every save() has to be paired with a delete() when the reference goes away: the recipe views release the previous
+image when it is replaced, recipe.signals releases the image and renditions of a deleted recipe, and
+`manage.py image_blobs --reconcile` recounts the references from the recipes if anything went out of sync.
+Files stored before this storage existed have no ImageBlob row and are deleted at their first delete().
+
+The file of the last reference is only removed once the transaction of the delete() commits: a rolled back
+transaction (e.g. an image replace in upload_image that fails after releasing the previous image) gets its
+ImageBlob row back and must find its file too.
+"""
+import hashlib
+import os
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.db.models import F
+from django.utils.deconstruct import deconstructible
+
+
+# the only extensions a stored name keeps: the file is shared and served from MEDIA_URL, its name must never make
+# the browser run it (.html, .svg...)
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.webp')
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """File system storage naming the files after the hash of their content, with reference counting"""
+
+    def __init__(self, prefix='uploads/recipe', **kwargs):
+        self.prefix = prefix
+        super().__init__(**kwargs)
+
+    def content_name(self, name, content):
+        """Return (name, size) of content in this storage"""
+        digest, size = hashlib.sha256(), 0
+        for chunk in content.chunks():
+            digest.update(chunk)
+            size += len(chunk)
+        digest = digest.hexdigest()
+        ext = os.path.splitext(name)[1].lower()
+        if ext not in IMAGE_EXTENSIONS:
+            ext = ''  # served as application/octet-stream rather than as whatever the client named it
+        return f'{self.prefix}/{digest[:2]}/{digest}{ext}', size
+
+    def save(self, name, content, max_length=None):
+        from core.models import ImageBlob
+
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name, size = self.content_name(name, content)
+
+        # the row lock orders a save and a delete of the same blob, the file is never removed under a new reference
+        with transaction.atomic():
+            blob, _ = ImageBlob.objects.select_for_update().get_or_create(name=name, defaults={'size': size})
+            if not self.exists(name):
+                name = self._save(name, content)
+            ImageBlob.objects.filter(pk=blob.pk).update(refcount=F('refcount') + 1)
+        return name
+
+    def delete(self, name):
+        from core.models import ImageBlob
+
+        if not name:
+            return
+        with transaction.atomic():
+            blob = ImageBlob.objects.select_for_update().filter(name=name).first()
+            if blob is not None and blob.refcount > 1:
+                ImageBlob.objects.filter(pk=blob.pk).update(refcount=F('refcount') - 1)
+                return
+            if blob is not None:
+                blob.delete()
+            transaction.on_commit(lambda: self._delete_unreferenced(name))
+
+    def _delete_unreferenced(self, name):
+        """Remove the file of name, unless it was saved again since its last reference was released"""
+        from core.models import ImageBlob
+
+        # the placeholder row takes the name: a save() in progress is waited for, a new one waits for the unlink
+        with transaction.atomic():
+            blob, created = ImageBlob.objects.select_for_update().get_or_create(name=name, defaults={'size': 0})
+            if not created and blob.refcount:
+                return
+            super().delete(name)
+            blob.delete()
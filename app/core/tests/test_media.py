@@ -0,0 +1,144 @@
+import hashlib
+import os
+import shutil
+import tempfile
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+
+class MediaServingTests(TestCase):
+    """Test the media files view"""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.media_settings = override_settings(MEDIA_ROOT=self.media_root)
+        self.media_settings.enable()
+        self.data = bytes(range(256)) * 40
+        self.digest = hashlib.sha256(self.data).hexdigest()
+        self.hashed = f'uploads/recipe/{self.digest[:2]}/{self.digest}.jpg'
+        self.plain = 'uploads/recipe/photo.jpg'
+        for name in (self.hashed, self.plain):
+            os.makedirs(os.path.dirname(os.path.join(self.media_root, name)), exist_ok=True)
+            with open(os.path.join(self.media_root, name), 'wb') as file:
+                file.write(self.data)
+
+    def tearDown(self):
+        self.media_settings.disable()
+        shutil.rmtree(self.media_root)
+
+    def get(self, name, **headers):
+        return self.client.get(reverse('media', args=[name]), **headers)
+
+    def test_serve_file(self):
+        """Test a file is served with its validators and cache headers"""
+        res = self.get(self.plain)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(b''.join(res.streaming_content), self.data)
+        self.assertEqual(res['Content-Type'], 'image/jpeg')
+        self.assertEqual(res['Accept-Ranges'], 'bytes')
+        self.assertIn('Last-Modified', res)
+        self.assertEqual(res['Cache-Control'], 'public, max-age=3600')
+
+    def test_other_types_downloaded(self):
+        """Test a file that isn't an image is sent as a never sniffed attachment"""
+        for name in ('uploads/recipe/page.html', 'uploads/recipe/drawing.svg', f'uploads/recipe/{self.digest}'):
+            with open(os.path.join(self.media_root, name), 'wb') as file:
+                file.write(b'<html><script>alert(1)</script></html>')
+
+            res = self.get(name)
+
+            self.assertEqual(res.status_code, 200)
+            self.assertEqual(res['Content-Disposition'], 'attachment')
+            self.assertEqual(res['X-Content-Type-Options'], 'nosniff')
+        self.assertNotIn('attachment', self.get(self.plain)['Content-Disposition'])
+
+    def test_hashed_name_cached_forever(self):
+        """Test the content-addressed names are immutable with their hash as ETag"""
+        res = self.get(self.hashed)
+
+        self.assertEqual(res['ETag'], f'"{self.digest}"')
+        self.assertIn('immutable', res['Cache-Control'])
+
+    def test_if_none_match(self):
+        """Test a revalidation with the current ETag is a 304 without body"""
+        etag = self.get(self.plain)['ETag']
+
+        res = self.get(self.plain, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, 304)
+        self.assertEqual(res.content, b'')
+
+    def test_if_modified_since(self):
+        """Test a revalidation with the current Last-Modified is a 304"""
+        last_modified = self.get(self.plain)['Last-Modified']
+
+        res = self.get(self.plain, HTTP_IF_MODIFIED_SINCE=last_modified)
+
+        self.assertEqual(res.status_code, 304)
+
+    def test_range(self):
+        """Test a byte range is answered with 206 and only these bytes"""
+        res = self.get(self.plain, HTTP_RANGE='bytes=10-19')
+
+        self.assertEqual(res.status_code, 206)
+        self.assertEqual(b''.join(res.streaming_content), self.data[10:20])
+        self.assertEqual(res['Content-Range'], f'bytes 10-19/{len(self.data)}')
+        self.assertEqual(res['Content-Length'], '10')
+
+    def test_suffix_range(self):
+        """Test bytes=-N returns the last N bytes"""
+        res = self.get(self.plain, HTTP_RANGE='bytes=-5')
+
+        self.assertEqual(b''.join(res.streaming_content), self.data[-5:])
+
+    def test_unsatisfiable_range(self):
+        """Test a range after the end of the file is a 416"""
+        for header in (f'bytes={len(self.data)}-', f'bytes={len(self.data) + 5}-{len(self.data) + 9}'):
+            res = self.get(self.plain, HTTP_RANGE=header)
+
+            self.assertEqual(res.status_code, 416)
+            self.assertEqual(res['Content-Range'], f'bytes */{len(self.data)}')
+
+    def test_invalid_range_ignored(self):
+        """Test a range ending before its start is ignored and the whole file is sent"""
+        res = self.get(self.plain, HTTP_RANGE='bytes=5-3')
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(b''.join(res.streaming_content), self.data)
+
+    def test_if_range_mismatch(self):
+        """Test a range for another version of the file returns the whole file"""
+        res = self.get(self.plain, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"old"')
+
+        self.assertEqual(res.status_code, 200)
+
+    def test_missing_and_outside_files(self):
+        """Test unknown files, directories and paths outside MEDIA_ROOT are 404"""
+        self.assertEqual(self.get('uploads/recipe/nope.jpg').status_code, 404)
+        self.assertEqual(self.get('uploads/recipe').status_code, 404)
+        self.assertEqual(self.get('../etc/passwd').status_code, 404)
+
+    def test_post_not_allowed(self):
+        """Test the view only answers GET and HEAD"""
+        res = self.client.post(reverse('media', args=[self.plain]))
+
+        self.assertEqual(res.status_code, 405)
+
+    def test_x_accel_redirect(self):
+        """Test nginx mode only sends headers"""
+        with override_settings(MEDIA_SERVING={'SENDFILE': 'x-accel-redirect'}):
+            res = self.get(self.hashed)
+
+        self.assertEqual(res['X-Accel-Redirect'], f'/protected-media/{self.hashed}')
+        self.assertEqual(res.content, b'')
+        self.assertIn('immutable', res['Cache-Control'])
+
+    def test_x_sendfile(self):
+        """Test X-Sendfile mode sends the file path"""
+        with override_settings(MEDIA_SERVING={'SENDFILE': 'x-sendfile'}):
+            res = self.get(self.plain)
+
+        self.assertEqual(res['X-Sendfile'], os.path.join(self.media_root, self.plain))
+        self.assertEqual(res.content, b'')
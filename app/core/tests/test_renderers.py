@@ -0,0 +1,135 @@
+import os
+from datetime import datetime, timezone
+from decimal import Decimal
+from io import BytesIO
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils.translation import gettext_lazy
+
+from rest_framework import renderers, status
+from rest_framework.exceptions import ParseError
+from rest_framework.test import APIClient
+
+from core import parsers
+from core.models import Tag
+from core.renderers import JSONRenderer, StreamingJSONRenderer
+
+
+TAGS_URL = reverse('recipe:tag-list')
+
+SAMPLE = {
+    'price': Decimal('5.50'),
+    'created': datetime(2022, 3, 1, 12, 30, 15, 123456, tzinfo=timezone.utc),
+    'title': gettext_lazy('Curry'),
+    'name': 'Crème brûlée \u2028\u2029 \U0001f35b',
+    'ids': [1, 2, 3],
+    'nested': {1: None, 'flag': True, 'ratio': 0.5},
+}
+
+
+class JSONRendererTests(SimpleTestCase):
+    """Test the JSON renderer writes what DRF writes"""
+
+    def test_same_output_as_drf(self):
+        """Test Decimals, datetimes, lazy strings and unicode are rendered like DRF"""
+        self.assertEqual(JSONRenderer().render(SAMPLE), renderers.JSONRenderer().render(SAMPLE))
+
+    def test_without_orjson(self):
+        """Test DRF renders when orjson isn't installed"""
+        with patch('core.renderers.orjson', None):
+            self.assertEqual(JSONRenderer().render(SAMPLE), renderers.JSONRenderer().render(SAMPLE))
+
+    def test_indent(self):
+        """Test an indented output is rendered like DRF"""
+        media_type = 'application/json; indent=2'
+
+        self.assertEqual(
+            JSONRenderer().render(SAMPLE, media_type), renderers.JSONRenderer().render(SAMPLE, media_type)
+        )
+
+    def test_none(self):
+        """Test no data is an empty body"""
+        self.assertEqual(JSONRenderer().render(None), b'')
+
+    def test_iter_render(self):
+        """Test the streamed pieces join into the rendered output"""
+        data = {'next': None, 'results': [dict(SAMPLE, id=i) for i in range(50)]}
+
+        with override_settings(JSON_RENDERING={'STREAM_CHUNK_SIZE': 256}):
+            pieces = list(StreamingJSONRenderer().iter_render(data))
+
+        self.assertGreater(len(pieces), 1)
+        self.assertEqual(b''.join(pieces), renderers.JSONRenderer().render(data))
+
+    def test_iter_render_without_orjson(self):
+        """Test the pieces are encoded by DRF when orjson isn't installed"""
+        data = {'next': None, 'results': [dict(SAMPLE, id=i) for i in range(5)]}
+
+        with patch('core.renderers.orjson', None):
+            pieces = list(StreamingJSONRenderer().iter_render(data))
+
+        self.assertEqual(b''.join(pieces), renderers.JSONRenderer().render(data))
+
+
+class JSONParserTests(SimpleTestCase):
+    """Test the JSON parser"""
+
+    def parse(self, body, encoding='utf-8'):
+        return parsers.JSONParser().parse(BytesIO(body), parser_context={'encoding': encoding})
+
+    def test_parse(self):
+        """Test a body is parsed like DRF"""
+        body = '{"title": "Crème", "ids": [1, 2], "price": 5.5}'.encode()
+
+        self.assertEqual(self.parse(body), {'title': 'Crème', 'ids': [1, 2], 'price': 5.5})
+
+    def test_other_encoding(self):
+        """Test a body in another charset is decoded first"""
+        self.assertEqual(self.parse('{"title": "Crème"}'.encode('latin-1'), 'latin-1'), {'title': 'Crème'})
+
+    def test_invalid(self):
+        """Test an invalid body and NaN are parse errors"""
+        for body in (b'{"title": ', b'{"price": NaN}', b'\xff'):
+            with self.assertRaises(ParseError):
+                self.parse(body)
+
+    def test_without_orjson(self):
+        """Test DRF parses when orjson isn't installed"""
+        with patch('core.parsers.orjson', None):
+            self.assertEqual(self.parse(b'{"ids": [1]}'), {'ids': [1]})
+
+
+class StreamingResponseTests(TestCase):
+    """Test the large lists are streamed"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            os.environ.get('USER_EMAIL'),
+            os.environ.get('USER_PASS')
+        )
+        self.client.force_authenticate(self.user)
+        Tag.objects.bulk_create(Tag(useraccount=self.user, tag_name=f'Tag {i}') for i in range(5))
+
+    def test_small_list_not_streamed(self):
+        """Test a list under STREAM_MIN_ITEMS is a regular response"""
+        res = self.client.get(TAGS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertFalse(res.streaming)
+
+    @override_settings(JSON_RENDERING={'STREAM_MIN_ITEMS': 3, 'STREAM_CHUNK_SIZE': 64})
+    def test_large_list_streamed(self):
+        """Test a list over STREAM_MIN_ITEMS is streamed with the same body and headers"""
+        res = self.client.get(TAGS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res.streaming)
+        self.assertEqual(res['Content-Type'], 'application/json')
+        self.assertIn('ETag', res)
+        body = b''.join(res.streaming_content)
+        self.assertEqual(body, renderers.JSONRenderer().render(res.data))
+        self.assertEqual(len(res.data['results']), 5)
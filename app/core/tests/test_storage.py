@@ -0,0 +1,111 @@
+import hashlib
+import os
+import shutil
+import tempfile
+
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.test import TestCase
+
+from core.models import ImageBlob
+from core.storage import ContentAddressedStorage
+
+
+class ContentAddressedStorageTests(TestCase):
+    """Test the deduplicated, reference counted storage"""
+
+    def setUp(self):
+        self.location = tempfile.mkdtemp()
+        self.storage = ContentAddressedStorage(location=self.location)
+
+    def tearDown(self):
+        shutil.rmtree(self.location)
+
+    def test_named_after_content(self):
+        """Test a file is stored under the hash of its bytes"""
+        name = self.storage.save('uploads/recipe/photo.JPG', ContentFile(b'photo'))
+
+        digest = hashlib.sha256(b'photo').hexdigest()
+        self.assertEqual(name, f'uploads/recipe/{digest[:2]}/{digest}.jpg')
+        self.assertEqual(self.storage.open(name).read(), b'photo')
+
+    def test_only_image_extensions_kept(self):
+        """Test a name whose extension isn't an image one is stored without its extension"""
+        digest = hashlib.sha256(b'<html>').hexdigest()
+
+        for name in ('x.html', 'x.svg', 'x'):
+            self.assertEqual(self.storage.save(name, ContentFile(b'<html>')), f'uploads/recipe/{digest[:2]}/{digest}')
+
+    def test_same_content_stored_once(self):
+        """Test saving the same bytes twice references one file"""
+        first = self.storage.save('a.jpg', ContentFile(b'photo'))
+        second = self.storage.save('b.jpg', ContentFile(b'photo'))
+
+        self.assertEqual(first, second)
+        blob = ImageBlob.objects.get(name=first)
+        self.assertEqual((blob.refcount, blob.size), (2, 5))
+
+    def test_file_deleted_with_last_reference(self):
+        """Test delete() only removes the file once nothing references it"""
+        name = self.storage.save('a.jpg', ContentFile(b'photo'))
+        self.storage.save('b.jpg', ContentFile(b'photo'))
+
+        self.storage.delete(name)
+        self.assertTrue(self.storage.exists(name))
+        self.assertEqual(ImageBlob.objects.get(name=name).refcount, 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.storage.delete(name)
+        self.assertFalse(self.storage.exists(name))
+        self.assertFalse(ImageBlob.objects.exists())
+
+    def test_file_deleted_on_commit(self):
+        """Test the file of the last reference is only removed once the transaction commits"""
+        name = self.storage.save('a.jpg', ContentFile(b'photo'))
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.storage.delete(name)
+            self.assertTrue(self.storage.exists(name))
+        self.assertEqual(len(callbacks), 1)
+
+        callbacks[0]()
+        self.assertFalse(self.storage.exists(name))
+
+    def test_rolled_back_delete_keeps_file(self):
+        """Test a rolled back delete() leaves the reference and its file"""
+        name = self.storage.save('a.jpg', ContentFile(b'photo'))
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            try:
+                with transaction.atomic():
+                    self.storage.delete(name)
+                    raise ValueError('replace failed')
+            except ValueError:
+                pass
+
+        self.assertEqual(callbacks, [])
+        self.assertTrue(self.storage.exists(name))
+        self.assertEqual(ImageBlob.objects.get(name=name).refcount, 1)
+
+    def test_saved_again_before_commit(self):
+        """Test the file isn't removed when the same bytes were saved again before the unlink ran"""
+        name = self.storage.save('a.jpg', ContentFile(b'photo'))
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.storage.delete(name)
+        self.storage.save('b.jpg', ContentFile(b'photo'))
+
+        callbacks[0]()
+
+        self.assertTrue(self.storage.exists(name))
+        self.assertEqual(ImageBlob.objects.get(name=name).refcount, 1)
+
+    def test_delete_untracked_file(self):
+        """Test a file stored before the deduplication is deleted directly"""
+        os.makedirs(os.path.join(self.location, 'uploads/recipe'))
+        with open(os.path.join(self.location, 'uploads/recipe/old.jpg'), 'wb') as file:
+            file.write(b'old')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.storage.delete('uploads/recipe/old.jpg')
+
+        self.assertFalse(self.storage.exists('uploads/recipe/old.jpg'))
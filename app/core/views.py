@@ -0,0 +1,152 @@
+"""
+Media files view, in place of django.conf.urls.static.static which streams the whole file on every request.
+
+- ETag / Last-Modified and the If-None-Match / If-Modified-Since / If-Range conditions, a revalidation is a 304.
+- Single byte ranges (Range: bytes=start-end) answered with 206, unsatisfiable ones with 416.
+- The content-addressed names of core/storage.py (<sha256>.<ext>) never change content: they are cached for a year
+  as immutable, anything else for MEDIA_SERVING['MAX_AGE'] seconds.
+- Only the image types of INLINE_TYPES are shown inline, any other file is sent as an attachment, and never sniffed.
+- MEDIA_SERVING['SENDFILE'] = 'x-sendfile' (Apache, lighttpd) or 'x-accel-redirect' (nginx) only sends the headers,
+  the front server reads the file (and handles the ranges) itself, the worker never copies image bytes.
+"""
+import mimetypes
+import os
+import re
+from email.utils import formatdate
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+from django.views.decorators.http import require_safe
+
+
+DEFAULTS = {
+    'SENDFILE': None,  # None, 'x-sendfile' or 'x-accel-redirect'
+    'ACCEL_REDIRECT_PREFIX': '/protected-media/',  # nginx internal location aliased to MEDIA_ROOT
+    'MAX_AGE': 3600,
+    'IMMUTABLE_MAX_AGE': 365 * 24 * 3600,
+    'CHUNK_SIZE': 64 * 1024,
+}
+
+# the types served inline, anything else (html, svg, a file without extension...) is downloaded as an attachment
+INLINE_TYPES = ('image/jpeg', 'image/png', 'image/gif', 'image/webp')
+
+HASHED_NAME_RE = re.compile(r'^(?P<digest>[0-9a-f]{64})\.\w+$')
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def get_media_settings():
+    """Return MEDIA_SERVING merged with the defaults"""
+    return {**DEFAULTS, **getattr(settings, 'MEDIA_SERVING', {})}
+
+
+def parse_range(header, size):
+    """Return (start, end) of a single 'bytes=' range, None to send the whole file, raise ValueError if unsatisfiable"""
+    match = RANGE_RE.match(header or '')
+    if not match or match.groups() == ('', ''):
+        return None  # no range, several ranges or a syntax we ignore: the whole file is a valid answer
+
+    first, last = match.groups()
+    if first and last and int(last) < int(first):
+        return None  # bytes=5-3 is syntactically invalid (RFC 7233), the header is ignored rather than a 416
+    if not first:  # bytes=-500, the last 500 bytes
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        start, end = int(first), min(int(last), size - 1) if last else size - 1
+    if start > end or start >= size:
+        raise ValueError(header)
+    return start, end
+
+
+def iter_range(path, start, length, chunk_size):
+    """Yield length bytes of the file from start"""
+    with open(path, 'rb') as file:
+        file.seek(start)
+        while length > 0:
+            data = file.read(min(chunk_size, length))
+            if not data:
+                break
+            length -= len(data)
+            yield data
+
+
+@require_safe
+def serve_media(request, path):
+    """Serve a file of MEDIA_ROOT"""
+    conf = get_media_settings()
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+        stat = os.stat(full_path)
+    except (SuspiciousFileOperation, OSError):
+        raise Http404('File not found')
+    if not os.path.isfile(full_path):
+        raise Http404('File not found')
+
+    hashed = HASHED_NAME_RE.match(os.path.basename(path))
+    etag = f'"{hashed["digest"]}"' if hashed else f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+    last_modified = int(stat.st_mtime)
+
+    headers = {
+        'ETag': etag,
+        'Last-Modified': formatdate(last_modified, usegmt=True),
+        'Cache-Control': (
+            f'public, max-age={conf["IMMUTABLE_MAX_AGE"]}, immutable' if hashed else f'public, max-age={conf["MAX_AGE"]}'
+        ),
+        'Accept-Ranges': 'bytes',
+        'X-Content-Type-Options': 'nosniff',  # the browser must not guess another type from the bytes
+    }
+    content_type = mimetypes.guess_type(full_path)[0] or 'application/octet-stream'
+    if content_type not in INLINE_TYPES:
+        headers['Content-Disposition'] = 'attachment'
+
+    not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if not_modified is not None:
+        for header, value in headers.items():
+            not_modified[header] = value
+        return not_modified
+
+    if conf['SENDFILE']:
+        response = HttpResponse(content_type=content_type)
+        if conf['SENDFILE'] == 'x-accel-redirect':
+            response['X-Accel-Redirect'] = conf['ACCEL_REDIRECT_PREFIX'].rstrip('/') + '/' + path.lstrip('/')
+        else:
+            response['X-Sendfile'] = full_path
+    else:
+        response = _file_response(request, full_path, stat.st_size, content_type, etag, last_modified, conf)
+
+    for header, value in headers.items():
+        response[header] = value
+    return response
+
+
+def _file_response(request, path, size, content_type, etag, last_modified, conf):
+    """Return the whole file, or the requested range of it"""
+    byte_range = None
+    if_range = request.META.get('HTTP_IF_RANGE')
+    # If-Range: the range only applies to the version of the file the client already has part of
+    if not if_range or if_range == etag or parse_http_date_safe(if_range) == last_modified:
+        try:
+            byte_range = parse_range(request.META.get('HTTP_RANGE'), size)
+        except ValueError:
+            response = HttpResponse(status=416, content_type=content_type)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+
+    if request.method == 'HEAD':
+        response = HttpResponse(content_type=content_type)
+        response['Content-Length'] = size
+        return response
+
+    if byte_range is None:
+        return FileResponse(open(path, 'rb'), content_type=content_type)  # wsgi.file_wrapper when available
+
+    start, end = byte_range
+    response = StreamingHttpResponse(
+        iter_range(path, start, end - start + 1, conf['CHUNK_SIZE']), status=206, content_type=content_type
+    )
+    response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response['Content-Length'] = end - start + 1
+    return response
@@ -4,3 +4,12 @@ from django.apps import AppConfig
 class RecipeConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'recipe'
+
+    def ready(self):
+        # connect the image cleanup receivers
+        from recipe import signals  # noqa: F401
+
+        # title__trigram_word_similar of the recipe search
+        from django.db.models import CharField
+        from recipe.search import TrigramWordSimilar
+        CharField.register_lookup(TrigramWordSimilar)
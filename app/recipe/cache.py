@@ -0,0 +1,151 @@
+"""
+Per-user cache of the list responses of the tag, ingredient and recipe viewsets.
+
+An entry is keyed by the user, its collection version (core/conditional.py), the viewset and the normalized query
+params that change the response: the filters of the viewset (assigned_only, tag_fk, ingredient_fk) and the page.
+recipe/signals.py bumps the version on every save/delete of the user's recipes, tags and ingredients and every change
+of their relations, so entries are never rewritten: the following requests build new keys and the old entries fall
+out of the LRU or expire. It also keeps the in-process LRU of every worker right without telling the other workers.
+
+The serialized data is cached, not the rendered bytes, the renderer is still negotiated per request.
+
+settings.LIST_CACHE = {
+    'TTL': 300,              # seconds an entry is kept, 0 disables the cache
+    'MAX_SIZE': 1000,        # entries kept in the in-process LRU
+    'SHARED_CACHE': None,    # alias in settings.CACHES shared by the workers (redis, memcached...), None to disable
+}
+"""
+import functools
+import hashlib
+import threading
+from collections import Counter, OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.response import Response
+from rest_framework.utils.serializer_helpers import ReturnList
+
+from core.cache import LocalCache
+from core.conditional import get_collection_version
+
+
+DEFAULTS = {
+    'TTL': 300,
+    'MAX_SIZE': 1000,
+    'SHARED_CACHE': None,
+}
+
+
+def get_list_cache_settings():
+    """Return LIST_CACHE merged with the defaults"""
+    return {**DEFAULTS, **getattr(settings, 'LIST_CACHE', {})}
+
+
+def normalize(value):
+    """Return the comma separated values sorted and without duplicates: tag_fk=3,1,3 is tag_fk=1,3"""
+    return ','.join(sorted({part.strip() for part in value.split(',') if part.strip()}))
+
+
+def detach(data):
+    """Return the data without the serializer (and the model instances) a ReturnList keeps a reference to"""
+    if isinstance(data, ReturnList):
+        return list(data)
+    if isinstance(data, dict):  # paginated: {'next': ..., 'previous': ..., 'results': ReturnList}
+        return OrderedDict((key, detach(value)) for key, value in data.items())
+    return data
+
+
+class ListResponseCache:
+    """Two level cache of list data: the in-process LRU, then the optional shared Django cache"""
+    key_prefix = 'list-response:'
+
+    def __init__(self):
+        self.local = LocalCache()
+        self._counts = Counter()
+        self._lock = threading.Lock()
+
+    def _shared(self, conf):
+        return caches[conf['SHARED_CACHE']] if conf['SHARED_CACHE'] else None
+
+    def make_key(self, view, request):
+        """Return the key of the list request"""
+        paginator = getattr(view, 'paginator', None)
+        names = set(view.list_cache_params)
+        names.update(
+            getattr(paginator, name, None) for name in ('cursor_query_param', 'page_size_query_param')
+        )
+        params = sorted(
+            (name, value if name == getattr(paginator, 'cursor_query_param', None) else normalize(value))
+            for name in names if name and name in request.query_params
+            for value in request.query_params.getlist(name)
+        )
+
+        version = getattr(request, 'collection_version', None)  # read by collection_etag() for the same request
+        if version is None:
+            version = get_collection_version(request.user.pk)
+
+        # the next/previous links of the pages are absolute urls
+        parts = (request.build_absolute_uri(request.path), version, view.basename, params)
+        return f'{self.key_prefix}{request.user.pk}:{hashlib.sha1(repr(parts).encode()).hexdigest()}'
+
+    def get(self, key):
+        conf = get_list_cache_settings()
+        data = self.local.get(key)
+        if data is None and self._shared(conf) is not None:
+            data = self._shared(conf).get(key)
+            if data is not None:
+                self.local.set(key, data, conf['TTL'], conf['MAX_SIZE'])
+        return data
+
+    def set(self, key, data):
+        conf = get_list_cache_settings()
+        data = detach(data)
+        self.local.set(key, data, conf['TTL'], conf['MAX_SIZE'])
+        if self._shared(conf) is not None:
+            self._shared(conf).set(key, data, conf['TTL'])
+
+    def record(self, basename, hit):
+        """Count a hit or a miss of the viewset"""
+        with self._lock:
+            self._counts[basename, 'hits' if hit else 'misses'] += 1
+
+    def stats(self):
+        """Return {basename: {'hits': n, 'misses': n}} counted by this process"""
+        with self._lock:
+            stats = {}
+            for (basename, kind), count in self._counts.items():
+                stats.setdefault(basename, {'hits': 0, 'misses': 0})[kind] = count
+            return stats
+
+    def clear(self):
+        """Empty the in-process LRU and the counters (the shared cache entries expire on their own)"""
+        self.local.clear()
+        with self._lock:
+            self._counts.clear()
+
+
+list_cache = ListResponseCache()
+
+
+def cache_list(list_method):
+    """Decorate the list action of a viewset to answer from the list cache, the X-Cache header tells HIT or MISS"""
+    @functools.wraps(list_method)
+    def wrapper(view, request, *args, **kwargs):
+        if not get_list_cache_settings()['TTL']:
+            return list_method(view, request, *args, **kwargs)
+
+        key = list_cache.make_key(view, request)
+        data = list_cache.get(key)
+        list_cache.record(view.basename, hit=data is not None)
+        if data is not None:
+            response = Response(data)
+            response['X-Cache'] = 'HIT'
+            return response
+
+        response = list_method(view, request, *args, **kwargs)
+        if response.status_code == 200:
+            list_cache.set(key, response.data)
+        response['X-Cache'] = 'MISS'
+        return response
+
+    return wrapper
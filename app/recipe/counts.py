@@ -0,0 +1,61 @@
+"""
+Denormalized number of recipes of every tag and ingredient (Tag.recipe_count, Ingredient.recipe_count).
+
+The counts are moved by "recipe_count = recipe_count + n" updates in the transaction linking or unlinking the
+recipes: the m2m_changed/pre_delete receivers of recipe/signals.py and the bulk recipe creation, which inserts the
+through rows itself. An increment re-reads the row it updates, so concurrent requests don't lose each other's
+changes (a recount with a subquery would read a stale snapshot). Raw SQL or the admin of the through tables bypass
+them, ./manage.py reconcile_recipe_counts recounts every object from the through tables.
+"""
+from collections import Counter, defaultdict
+
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def related_field(through):
+    """Return the Recipe ManyToManyField of a through model"""
+    return next(
+        field for field in through._meta.get_field('recipe').related_model._meta.many_to_many
+        if field.remote_field.through is through
+    )
+
+
+def add_counts(model, related_ids, delta=1):
+    """Add delta to the recipe_count of the objects, once per occurrence of their id in related_ids"""
+    ids_by_delta = defaultdict(list)
+    for pk, occurrences in Counter(related_ids).items():
+        ids_by_delta[occurrences * delta].append(pk)
+
+    # ordered by id so that concurrent transactions lock the rows in the same order
+    for amount, ids in ids_by_delta.items():
+        model.objects.filter(pk__in=sorted(ids)).update(recipe_count=F('recipe_count') + amount)
+
+
+def linked_ids(through, instance, reverse, pk_set=None):
+    """Return the related (tag/ingredient) id of every through row of instance, optionally limited to pk_set"""
+    field = related_field(through)
+    source, target = field.m2m_column_name(), field.m2m_reverse_name()  # 'recipe_id', 'tag_id'
+    rows = through.objects.filter(**{target if reverse else source: instance.pk})
+    if pk_set is not None:
+        rows = rows.filter(**{f'{source if reverse else target}__in': pk_set})
+    return list(rows.values_list(target, flat=True))
+
+
+def actual_count(recipe_model, field_name):
+    """Return a subquery counting the through rows of the outer tag/ingredient"""
+    field = recipe_model._meta.get_field(field_name)
+    target = field.m2m_reverse_field_name()  # 'tag'
+    rows = (
+        field.remote_field.through.objects.filter(**{target: OuterRef('pk')})
+        .values(target).annotate(total=Count('id')).values('total')
+    )
+    return Coalesce(Subquery(rows), Value(0))
+
+
+def reconcile(recipe_model, field_name):
+    """Recount the recipes of the tags/ingredients whose count is wrong, return how many were fixed"""
+    model = recipe_model._meta.get_field(field_name).related_model
+    actual = actual_count(recipe_model, field_name)
+    stale = model.objects.annotate(actual=actual).exclude(recipe_count=F('actual')).values('pk')
+    return model.objects.filter(pk__in=stale).update(recipe_count=actual)
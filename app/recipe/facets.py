@@ -0,0 +1,40 @@
+"""
+Facets of a filtered recipe list (?facets=1 of the recipe list): the tags and ingredients of the recipes matching
+the filters, with the number of these recipes they are used by, e.g. to show "Vegan (12)" next to the results.
+
+Both facets are read in one statement: the grouped counts of the two through tables restricted to the filtered
+recipes (the filtered queryset as an IN subquery), joined to the tag/ingredient names and combined with UNION ALL.
+Unlike the recipe_count columns (recipe/counts.py), which count all the recipes of the user, they depend on the
+filters so they are computed per request.
+"""
+from django.db.models import CharField, Count, F, Value
+
+
+# response key -> (Recipe ManyToMany field, name field of the related model)
+FACETS = {
+    'tags': ('tag_fk', 'tag_name'),
+    'ingredients': ('ingredient_fk', 'ing_name'),
+}
+
+
+def facet_counts(recipes):
+    """Return {'tags': [...], 'ingredients': [...]} of the recipes queryset, most used first"""
+    recipe_ids = recipes.order_by().values('pk')
+    model = recipes.model
+    parts = []
+    for key, (field_name, name_field) in FACETS.items():
+        field = model._meta.get_field(field_name)
+        source, target = field.m2m_field_name(), field.m2m_reverse_field_name()  # 'recipe', 'tag'
+        parts.append(
+            field.remote_field.through.objects.filter(**{f'{source}__in': recipe_ids})
+            .values(target).annotate(facet=Value(key, output_field=CharField()), name=F(f'{target}__{name_field}'))
+            .annotate(total=Count('id')).values_list(target, 'facet', 'name', 'total')
+        )
+
+    data = {key: [] for key in FACETS}
+    for pk, key, name, total in parts[0].union(*parts[1:], all=True):
+        data[key].append({'id': pk, FACETS[key][1]: name, 'recipe_count': total})
+    for key, items in data.items():
+        name_field = FACETS[key][1]
+        items.sort(key=lambda item: (-item['recipe_count'], item[name_field], item['id']))
+    return data
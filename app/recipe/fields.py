@@ -0,0 +1,85 @@
+from django.core.exceptions import ValidationError as DjangoValidationError
+from rest_framework import serializers
+from rest_framework.relations import MANY_RELATION_KWARGS
+
+from core.models import Recipe
+
+
+# PrimaryKeyRelatedField(many=True) validates every id with its own queryset.get(pk=...), so a recipe with
+# 20 tags costs 20 SELECTs before anything is written. This one checks the whole list with a single
+# pk__in query and reports all the unknown ids in one error.
+class UserManyRelatedField(serializers.ManyRelatedField):
+    """Many related field validating all the submitted ids with one query"""
+
+    default_error_messages = {
+        'does_not_exist': 'Invalid pk(s) {pk_value} - object does not exist.',
+    }
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) or not hasattr(data, '__iter__'):
+            self.fail('not_a_list', input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail('empty')
+
+        pks = list(dict.fromkeys(self.child_relation.to_pk(item) for item in data))  # repeated ids only once
+        # in a bulk request the list serializer already read the objects of every item (related_objects)
+        objects = getattr(self.root, 'related_objects', {}).get(self.field_name)
+        if objects is None:
+            objects = self.child_relation.get_queryset().in_bulk(pks)
+
+        missing = [pk for pk in pks if pk not in objects]
+        if missing:
+            self.fail('does_not_exist', pk_value=', '.join(str(pk) for pk in missing))
+        return [objects[pk] for pk in pks]
+
+
+class UserPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """Primary key related field limited to the objects of the requesting user"""
+
+    def get_queryset(self):
+        request = self.context.get('request')
+        if request is None:
+            return super().get_queryset().none()
+        return super().get_queryset().filter(useraccount=request.user)
+
+    def to_pk(self, data):
+        """Return data converted to the model's primary key type"""
+        if self.pk_field is not None:
+            data = self.pk_field.to_internal_value(data)
+        try:
+            if isinstance(data, bool):
+                raise TypeError
+            return self.queryset.model._meta.pk.to_python(data)
+        except (TypeError, ValueError, DjangoValidationError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_kwargs = {'child_relation': cls(*args, **kwargs)}
+        for key in kwargs:
+            if key in MANY_RELATION_KWARGS:
+                list_kwargs[key] = kwargs[key]
+        return UserManyRelatedField(**list_kwargs)
+
+
+class ImageRenditionsField(serializers.Field):
+    """Read-only {size: {format: url}} of the recipe image renditions, empty until they are ready"""
+
+    def __init__(self, **kwargs):
+        kwargs['source'] = '*'
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, recipe):
+        if recipe.image_status != Recipe.IMAGE_READY:
+            return {}
+
+        storage = recipe.image.storage
+        request = self.context.get('request')
+        urls = {}
+        for size_name, files in recipe.image_renditions.items():
+            urls[size_name] = {}
+            for fmt, name in files.items():
+                url = storage.url(name)
+                urls[size_name][fmt] = request.build_absolute_uri(url) if request is not None else url
+        return urls
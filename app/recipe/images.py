@@ -0,0 +1,183 @@
+"""
+Resized renditions of the recipe images, generated off the request thread.
+
+upload_image only stores the original and queues (recipe id, image name) once the transaction commits. A worker of
+the local pool then writes a WebP and a JPEG copy of the image for every size of settings.RECIPE_IMAGES['SIZES'],
+without the EXIF metadata (camera, GPS...), and records them on Recipe.image_renditions with image_status 'ready'.
+Pillow releases the GIL while decoding, resizing and encoding, so the threads really work in parallel.
+
+The queue lives in the worker process: jobs still queued when it stops are lost and their recipes stay 'pending',
+`manage.py process_recipe_images` generates the missing renditions.
+"""
+import io
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from core.changes import record_changes
+from core.models import Recipe
+
+
+DEFAULTS = {
+    'WORKERS': 2,
+    'SIZES': {'thumbnail': 200, 'medium': 800, 'large': 1600},  # longest side in pixels
+    'FORMATS': ('webp', 'jpeg'),
+    'QUALITY': 80,
+}
+
+# format -> (Pillow format, file extension)
+FORMATS = {
+    'webp': ('WEBP', 'webp'),
+    'jpeg': ('JPEG', 'jpg'),
+}
+
+logger = logging.getLogger(__name__)
+
+
+def get_image_settings():
+    """Return RECIPE_IMAGES merged with the defaults"""
+    return {**DEFAULTS, **getattr(settings, 'RECIPE_IMAGES', {})}
+
+
+def get_storage():
+    """Return the storage of Recipe.image"""
+    return Recipe._meta.get_field('image').storage
+
+
+def rendition_name(image_name, size_name, fmt):
+    """Return the name a rendition is saved as, uploads/recipe/<name>.png -> uploads/recipe/renditions/<name>_thumbnail.webp"""
+    # (the content-addressed storage of Recipe.image only keeps the extension and names the file after its hash)
+    directory, filename = os.path.split(image_name)
+    stem = os.path.splitext(filename)[0]
+    return os.path.join(directory, 'renditions', f'{stem}_{size_name}.{FORMATS[fmt][1]}')
+
+
+def render_image(file, sizes, formats, quality):
+    """Return {size_name: {format: bytes}} of the image resized to each size, without metadata"""
+    with Image.open(file) as original:
+        image = ImageOps.exif_transpose(original)  # apply the camera rotation before its EXIF tag is dropped
+
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'transparency' in image.info or 'A' in image.getbands() else 'RGB')
+    image.info = {}  # nothing of the original metadata (exif, xmp, comments) is written to the renditions
+
+    rendered = {}
+    for size_name, size in sizes.items():
+        resized = image.copy()
+        resized.thumbnail((size, size), Image.LANCZOS)  # keeps the aspect ratio and never upscales
+        for fmt in formats:
+            pil_format = FORMATS[fmt][0]
+            out = io.BytesIO()
+            # JPEG has no alpha channel
+            (resized.convert('RGB') if pil_format == 'JPEG' else resized).save(out, pil_format, quality=quality)
+            rendered.setdefault(size_name, {})[fmt] = out.getvalue()
+
+    return rendered
+
+
+def delete_renditions(renditions):
+    """Delete the files of a Recipe.image_renditions dict"""
+    storage = get_storage()
+    for files in renditions.values():
+        for name in files.values():
+            storage.delete(name)
+
+
+def delete_image(image_name, renditions):
+    """Delete a recipe image and its renditions"""
+    if image_name:
+        get_storage().delete(image_name)
+    delete_renditions(renditions)
+
+
+def process_recipe_image(recipe_id, image_name):
+    """Generate the renditions of a recipe image and record them on the recipe"""
+    conf = get_image_settings()
+    storage = get_storage()
+
+    try:
+        with storage.open(image_name) as file:
+            rendered = render_image(file, conf['SIZES'], conf['FORMATS'], conf['QUALITY'])
+    except (OSError, SyntaxError, ValueError, Image.DecompressionBombError):
+        logger.warning('Cannot generate the renditions of %s', image_name, exc_info=True)
+        update_recipe_image(recipe_id, image_name, image_status=Recipe.IMAGE_FAILED)
+        return
+
+    renditions = {}
+    for size_name, files in rendered.items():
+        for fmt, data in files.items():
+            renditions.setdefault(size_name, {})[fmt] = storage.save(
+                rendition_name(image_name, size_name, fmt), ContentFile(data)
+            )
+
+    # the image may have been replaced (or the recipe deleted) meanwhile, then these renditions are of no use
+    if not update_recipe_image(recipe_id, image_name, image_status=Recipe.IMAGE_READY, image_renditions=renditions):
+        delete_renditions(renditions)
+
+
+def update_recipe_image(recipe_id, image_name, **fields):
+    """Write fields on the recipe if its image is still image_name, return whether it was"""
+    with transaction.atomic():
+        recipes = Recipe.objects.filter(pk=recipe_id, image=image_name)
+        # update() skips auto_now, the detail ETag depends on it
+        if not recipes.update(updated_at=timezone.now(), **fields):
+            return False
+        # update() sends no post_save either: the change is logged for the delta sync and bumps the collection
+        # version (list ETags and list cache) in the same transaction
+        record_changes(recipes.values_list('useraccount_id', flat=True).get(), Recipe, [recipe_id])
+    return True
+
+
+_executor = None
+_executor_workers = 0
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """Return the image processing pool, None when the images are processed inline"""
+    global _executor, _executor_workers
+
+    workers = get_image_settings()['WORKERS']
+    if not workers:
+        return None
+
+    with _executor_lock:
+        if _executor is None or _executor_workers != workers:
+            if _executor is not None:
+                _executor.shutdown(wait=False)
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='recipe-image')
+            _executor_workers = workers
+
+    return _executor
+
+
+def _run_job(recipe_id, image_name):
+    """Process an image in a pool thread"""
+    try:
+        process_recipe_image(recipe_id, image_name)
+    except Exception:
+        logger.exception('Image job of recipe %s failed', recipe_id)
+    finally:
+        connection.close()  # the thread's own database connection
+
+
+def submit(recipe_id, image_name):
+    """Queue an image job, or run it inline when WORKERS is 0"""
+    executor = get_executor()
+    if executor is None:
+        process_recipe_image(recipe_id, image_name)
+    else:
+        executor.submit(_run_job, recipe_id, image_name)
+
+
+def schedule_renditions(recipe):
+    """Queue the renditions of the recipe image once the current transaction commits"""
+    recipe_id, image_name = recipe.pk, recipe.image.name
+    transaction.on_commit(lambda: submit(recipe_id, image_name))
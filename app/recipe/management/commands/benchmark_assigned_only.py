@@ -0,0 +1,84 @@
+import random
+import statistics
+import time
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from core.models import Tag, Recipe
+from recipe.views import TagViewSet
+
+
+class Command(BaseCommand):
+    """Django command to compare the assigned_only tag filter as JOIN + DISTINCT and as EXISTS"""
+
+    help = 'Seed a throwaway user with recipes (rolled back at the end) and time both assigned_only queries'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=100000, help='recipes created for the user')
+        parser.add_argument('--tags', type=int, default=50, help='tags created for the user')
+        parser.add_argument('--tags-per-recipe', type=int, default=3)
+        parser.add_argument('--repeat', type=int, default=5, help='timed runs per query')
+        parser.add_argument('--explain', action='store_true', help='print EXPLAIN ANALYZE of both queries')
+
+    def handle(self, *args, **options):
+        """Handle the command"""
+        with transaction.atomic():
+            user = self.seed(options)
+            queries = {
+                'join + distinct': Tag.objects.filter(
+                    useraccount=user, recipe__isnull=False
+                ).order_by('-tag_name').distinct(),
+                'exists': TagViewSet()._filter_assigned_only(
+                    Tag.objects.filter(useraccount=user)
+                ).order_by(*TagViewSet.ordering),
+            }
+            for name, queryset in queries.items():
+                self.benchmark(name, queryset, options)
+
+            # nothing of the seeded data is kept
+            transaction.set_rollback(True)
+
+    def seed(self, options):
+        """Create the user, its tags and recipes with bulk inserts"""
+        self.stdout.write(f"Seeding {options['recipes']} recipes and {options['tags']} tags...")
+        user = get_user_model().objects.create_user(f'benchmark-{uuid.uuid4().hex}@example.com')
+
+        # half of the tags are used so assigned_only has something to filter out
+        tags = Tag.objects.bulk_create(
+            Tag(useraccount=user, tag_name=f'Tag {i}') for i in range(options['tags'])
+        )
+        used_tag_ids = [tag.id for tag in tags[:max(1, len(tags) // 2)]]
+
+        recipes = Recipe.objects.bulk_create(
+            (Recipe(useraccount=user, title=f'Recipe {i}', time_minutes=10, price=5) for i in range(options['recipes'])),
+            batch_size=5000,
+        )
+        Through = Recipe.tag_fk.through
+        links = []
+        for recipe in recipes:
+            for tag_id in random.sample(used_tag_ids, min(options['tags_per_recipe'], len(used_tag_ids))):
+                links.append(Through(recipe_id=recipe.id, tag_id=tag_id))
+        Through.objects.bulk_create(links, batch_size=10000)
+
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(f'ANALYZE {Tag._meta.db_table}, {Recipe._meta.db_table}, {Through._meta.db_table}')
+
+        return user
+
+    def benchmark(self, name, queryset, options):
+        """Run the query --repeat times and print the timings"""
+        timings = []
+        for _ in range(options['repeat']):
+            start = time.perf_counter()
+            rows = len(list(queryset.all()))
+            timings.append((time.perf_counter() - start) * 1000)
+
+        self.stdout.write(
+            f'{name:>16}: {rows} tags, min {min(timings):.1f} ms, median {statistics.median(timings):.1f} ms'
+        )
+        if options['explain'] and connection.vendor == 'postgresql':
+            self.stdout.write(queryset.explain(analyze=True))
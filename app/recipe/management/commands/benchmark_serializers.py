@@ -0,0 +1,95 @@
+import json
+import statistics
+import time
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.utils.encoders import JSONEncoder
+
+from core.models import Tag, Ingredient, Recipe
+from recipe.rows import RowSerializer
+from recipe.serializers import TagSerializer, IngredientSerializer, RecipeSerializer
+from recipe.views import RecipeViewSet
+
+
+class Command(BaseCommand):
+    """Django command to compare the serializers of the lists with the .values() rows of recipe/rows.py"""
+
+    help = 'Seed a throwaway user (rolled back at the end) and time the list serialization in rows per second'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=10000, help='recipes created for the user')
+        parser.add_argument('--tags', type=int, default=50, help='tags and ingredients created for the user')
+        parser.add_argument('--related-per-recipe', type=int, default=3, help='tags and ingredients of a recipe')
+        parser.add_argument('--repeat', type=int, default=5, help='timed runs per serialization')
+
+    def handle(self, *args, **options):
+        """Handle the command"""
+        with transaction.atomic():
+            user = self.seed(options)
+            for model, serializer_class in ((Recipe, RecipeSerializer), (Tag, TagSerializer),
+                                            (Ingredient, IngredientSerializer)):
+                queryset = model.objects.filter(useraccount=user).order_by('-id')
+                rows = RowSerializer(serializer_class())
+                serialized = self.benchmark(
+                    f'{model.__name__} serializer', lambda: self.serialize(model, serializer_class, queryset), options
+                )
+                from_rows = self.benchmark(
+                    f'{model.__name__} rows', lambda: rows.to_representation(rows.values(queryset, 'id')), options
+                )
+                if json.dumps(serialized, cls=JSONEncoder) != json.dumps(from_rows, cls=JSONEncoder):
+                    raise CommandError(f'The {model.__name__} rows differ from the serializer output')
+
+            # nothing of the seeded data is kept
+            transaction.set_rollback(True)
+
+    def seed(self, options):
+        """Create the user, its tags, ingredients and recipes with bulk inserts"""
+        self.stdout.write(f"Seeding {options['recipes']} recipes, {options['tags']} tags and ingredients...")
+        user = get_user_model().objects.create_user(f'benchmark-{uuid.uuid4().hex}@example.com')
+
+        tags = Tag.objects.bulk_create(Tag(useraccount=user, tag_name=f'Tag {i}') for i in range(options['tags']))
+        ingredients = Ingredient.objects.bulk_create(
+            Ingredient(useraccount=user, ing_name=f'Ingredient {i}') for i in range(options['tags'])
+        )
+        recipes = Recipe.objects.bulk_create(
+            (Recipe(useraccount=user, title=f'Recipe {i}', time_minutes=10, price=5) for i in range(options['recipes'])),
+            batch_size=5000,
+        )
+        for field_name, objects in (('tag_fk', tags), ('ingredient_fk', ingredients)):
+            field = Recipe._meta.get_field(field_name)
+            through = field.remote_field.through
+            source, target = field.m2m_column_name(), field.m2m_reverse_name()
+            through.objects.bulk_create(
+                (
+                    through(**{source: recipe.id, target: objects[(index + offset) % len(objects)].id})
+                    for index, recipe in enumerate(recipes)
+                    for offset in range(min(options['related_per_recipe'], len(objects)))
+                ),
+                batch_size=10000,
+            )
+        return user
+
+    def serialize(self, model, serializer_class, queryset):
+        """Serialize the queryset the way the list action did before recipe/rows.py"""
+        objects = list(queryset)
+        if model is Recipe:
+            RecipeViewSet()._attach_related_ids(objects)
+        return serializer_class(objects, many=True).data
+
+    def benchmark(self, name, serialize, options):
+        """Run serialize() --repeat times, print the timings and return its output"""
+        timings = []
+        for _ in range(options['repeat']):
+            start = time.perf_counter()
+            data = serialize()
+            timings.append(time.perf_counter() - start)
+
+        best = min(timings)
+        self.stdout.write(
+            f'{name:>22}: {len(data)} rows, min {best * 1000:.1f} ms, median {statistics.median(timings) * 1000:.1f} ms,'
+            f' {len(data) / best if best else 0:,.0f} rows/s'
+        )
+        return data
@@ -0,0 +1,36 @@
+import os
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.models import ImageUpload
+from recipe import uploads
+
+
+class Command(BaseCommand):
+    """Django command to delete the chunked uploads that were never finalized"""
+
+    help = 'Delete the chunked uploads older than CHUNKED_UPLOADS["EXPIRY_HOURS"] and their partial files'
+
+    def handle(self, *args, **options):
+        """Handle the command"""
+        conf = uploads.get_upload_settings()
+        expiry = timedelta(hours=conf['EXPIRY_HOURS'])
+
+        stale = ImageUpload.objects.filter(created_at__lt=timezone.now() - expiry)
+        for upload in stale:
+            uploads.delete_part(upload)
+        count, _ = stale.delete()
+
+        # partial files left by uploads deleted with their recipe, chunks left by a killed worker
+        orphans = 0
+        if os.path.isdir(conf['TEMP_DIR']):
+            known = {f'{pk}.part' for pk in ImageUpload.objects.values_list('id', flat=True)}
+            for entry in os.scandir(conf['TEMP_DIR']):
+                if entry.name not in known and entry.stat().st_mtime < time.time() - expiry.total_seconds():
+                    os.remove(entry.path)
+                    orphans += 1
+
+        self.stdout.write(self.style.SUCCESS(f'Deleted {count} stale uploads and {orphans} orphan files'))
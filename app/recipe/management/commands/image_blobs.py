@@ -0,0 +1,85 @@
+import os
+import time
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, Sum
+
+from core.models import ImageBlob, Recipe
+from recipe import images
+
+
+class Command(BaseCommand):
+    """Django command reporting (and repairing) the deduplicated recipe image storage"""
+
+    help = 'Report the space saved by the deduplicated image storage, --reconcile recounts the references'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reconcile', action='store_true',
+            help='recount the references from the recipes and delete the unreferenced files'
+        )
+        parser.add_argument(
+            '--min-age', type=int, default=3600,
+            help='seconds: unreferenced files younger than this may belong to an upload in progress and are kept'
+        )
+
+    def handle(self, *args, **options):
+        """Handle the command"""
+        if options['reconcile']:
+            self.reconcile(options['min_age'])
+
+        totals = ImageBlob.objects.aggregate(
+            blobs=Count('id'),
+            stored=Sum('size'),
+            referenced=Sum(F('size') * F('refcount')),
+        )
+        stored, referenced = totals['stored'] or 0, totals['referenced'] or 0
+        self.stdout.write(f'{totals["blobs"]} files, {stored} bytes stored for {referenced} bytes referenced')
+        self.stdout.write(self.style.SUCCESS(f'Saved {referenced - stored} bytes'))
+
+    def reconcile(self, min_age):
+        """Set the reference counts to the references of the recipes and delete what nothing references"""
+        storage = images.get_storage()
+        fixed = deleted = 0
+        with transaction.atomic():
+            # the rows are locked before the references are counted: a save() of one of these blobs (a recipe taking
+            # a new reference) waits for us, or committed before we count. Blobs created meanwhile aren't locked,
+            # so they aren't touched either
+            blobs = list(ImageBlob.objects.select_for_update().order_by('pk'))
+            references = self.count_references()
+            for blob in blobs:
+                count = references.get(blob.name, 0)
+                if count == blob.refcount:
+                    continue
+                if count:
+                    ImageBlob.objects.filter(pk=blob.pk).update(refcount=count)
+                    fixed += 1
+                else:
+                    blob.delete()
+                    storage.delete(blob.name)  # no row any more: removes the file
+                    deleted += 1
+
+        # files nobody references: replaced images from before the deduplication, leftovers of failed requests
+        known = references.keys() | set(ImageBlob.objects.values_list('name', flat=True))
+        root = storage.path(storage.prefix)
+        for directory, _, filenames in os.walk(root):
+            for filename in filenames:
+                path = os.path.join(directory, filename)
+                name = os.path.relpath(path, storage.location).replace(os.sep, '/')
+                if name not in known and os.path.getmtime(path) < time.time() - min_age:
+                    os.remove(path)
+                    deleted += 1
+
+        self.stdout.write(f'Fixed {fixed} reference counts, deleted {deleted} unreferenced files')
+
+    def count_references(self):
+        """Return {file name: number of recipe images and renditions using it}"""
+        references = Counter()
+        for image, renditions in Recipe.objects.values_list('image', 'image_renditions').iterator():
+            if image:
+                references[image] += 1
+            for files in renditions.values():
+                references.update(files.values())
+        return references
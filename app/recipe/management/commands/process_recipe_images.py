@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from core.models import Recipe
+from recipe import images
+
+
+class Command(BaseCommand):
+    """Django command to generate the missing renditions of recipe images"""
+
+    help = 'Generate the renditions of the recipe images that are not ready (lost jobs, images from before the pipeline)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--failed', action='store_true', help='also retry the images that failed')
+
+    def handle(self, *args, **options):
+        """Handle the command"""
+        statuses = ['', Recipe.IMAGE_PENDING] + ([Recipe.IMAGE_FAILED] if options['failed'] else [])
+        recipes = (
+            Recipe.objects
+            .exclude(image='').exclude(image__isnull=True)
+            .filter(image_status__in=statuses)
+            .values_list('id', 'image')
+        )
+
+        count = 0
+        for recipe_id, image_name in recipes.iterator():
+            images.process_recipe_image(recipe_id, image_name)  # inline, one image at a time
+            count += 1
+
+        self.stdout.write(self.style.SUCCESS(f'Processed {count} images'))
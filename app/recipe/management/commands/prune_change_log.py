@@ -0,0 +1,21 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.changes import prune_changes
+
+
+class Command(BaseCommand):
+    """Django command to delete the old rows of the delta sync change log"""
+
+    help = 'Delete the change log rows older than --days, clients with an older sync token must sync again in full'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=30, help='days of changes kept for the delta sync')
+
+    def handle(self, *args, **options):
+        """Handle the command"""
+        count = prune_changes(timezone.now() - timedelta(days=options['days']))
+
+        self.stdout.write(self.style.SUCCESS(f'Deleted {count} change log rows'))
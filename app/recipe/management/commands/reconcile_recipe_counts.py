@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from core.models import Recipe
+from recipe.counts import reconcile
+
+
+class Command(BaseCommand):
+    """Django command to recount the recipes of every tag and ingredient"""
+
+    help = 'Recount the recipe_count of the tags and ingredients from the recipe through tables, fixing the drifted ones'
+
+    def handle(self, *args, **options):
+        """Handle the command"""
+        for field_name in ('tag_fk', 'ingredient_fk'):
+            fixed = reconcile(Recipe, field_name)
+            model_name = Recipe._meta.get_field(field_name).related_model._meta.verbose_name_plural
+
+            self.stdout.write(self.style.SUCCESS(f'Fixed the recipe_count of {fixed} {model_name}'))
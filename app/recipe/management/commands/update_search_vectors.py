@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from core.models import Recipe
+from recipe.search import update_search_vectors
+
+
+class Command(BaseCommand):
+    """Django command to rebuild the search vectors of the recipes"""
+
+    help = 'Rebuild the ?q= search vectors of every recipe, e.g. after changing RECIPE_SEARCH["CONFIG"]'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000, help='recipes updated per UPDATE statement')
+
+    def handle(self, *args, **options):
+        """Handle the command"""
+        batch_size, last_id, count = options['batch_size'], 0, 0
+        while True:
+            ids = list(
+                Recipe.objects.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+            count += update_search_vectors(Recipe.objects.filter(id__in=ids))
+            last_id = ids[-1]
+
+        self.stdout.write(self.style.SUCCESS(f'Updated the search vectors of {count} recipes'))
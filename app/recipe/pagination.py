@@ -0,0 +1,120 @@
+import json
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import Cursor, CursorPagination, _reverse_ordering
+
+
+# DRF's CursorPagination only keys on the first ordering field and falls back to an OFFSET for duplicate values
+# (two tags with the same name), which gets slower the deeper you page. KeysetPagination keeps the whole
+# ordering tuple (e.g. tag_name, id) in the cursor and filters with "(tag_name, id) < (x, y)", so every page is a
+# plain index range scan on (useraccount_id, tag_name, id) no matter how deep the client is.
+class KeysetPagination(CursorPagination):
+    """Cursor pagination on the composite (ordering key, id) position"""
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+    ordering = ('-id',)
+
+    def get_ordering(self, request, queryset, view):
+        """Return the view ordering with the id as tie-breaker"""
+        ordering = getattr(view, 'ordering', None) or self.ordering
+        if isinstance(ordering, str):
+            ordering = (ordering,)
+
+        ordering = tuple(ordering)
+        if not any(field.lstrip('-') in ('id', 'pk') for field in ordering):
+            ordering += ('-id',)
+
+        return ordering
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+
+        reverse = self.cursor is not None and self.cursor.reverse
+        ordering = _reverse_ordering(self.ordering) if reverse else self.ordering
+        queryset = queryset.order_by(*ordering)
+
+        if self.cursor is not None and self.cursor.position is not None:
+            queryset = queryset.filter(self._keyset_filter(ordering, self._decode_position(self.cursor.position, queryset)))
+
+        # fetch one extra row to know whether there is a following page
+        results = list(queryset[:self.page_size + 1])
+        self.page = results[:self.page_size]
+        has_more = len(results) > self.page_size
+
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, self.cursor is not None
+
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+
+        position = self._get_position_from_instance(self.page[-1], self.ordering)
+        return self.encode_cursor(Cursor(offset=0, reverse=False, position=position))
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+
+        position = self._get_position_from_instance(self.page[0], self.ordering)
+        return self.encode_cursor(Cursor(offset=0, reverse=True, position=position))
+
+    def _get_position_from_instance(self, instance, ordering):
+        # the page may hold model instances or .values() rows
+        attrs = [field.lstrip('-') for field in ordering]
+        if isinstance(instance, dict):
+            values = [instance[attr] for attr in attrs]
+        else:
+            values = [getattr(instance, attr) for attr in attrs]
+
+        return json.dumps(values, cls=DjangoJSONEncoder)
+
+    def _decode_position(self, position, queryset):
+        """Return the list of ordering values stored in a cursor, converted to the types of their fields"""
+        try:
+            values = json.loads(position)
+            if not isinstance(values, list) or len(values) != len(self.ordering):
+                raise NotFound(self.invalid_cursor_message)
+            # a tampered cursor (["abc"] for an id) would only fail in the query, as a 500
+            return [
+                self._ordering_field(queryset, field).to_python(value)
+                for field, value in zip(self.ordering, values)
+            ]
+        except (TypeError, ValueError, DjangoValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    @staticmethod
+    def _ordering_field(queryset, field):
+        """Return the model field (or annotation output field, e.g. the search rank) of an ordering field"""
+        name = field.lstrip('-')
+        if name in queryset.query.annotations:
+            return queryset.query.annotations[name].output_field
+        return queryset.model._meta.pk if name == 'pk' else queryset.model._meta.get_field(name)
+
+    @staticmethod
+    def _keyset_filter(ordering, values):
+        """Build the row comparison "(a, b, id) > (x, y, z)" as ORed branches the planner can use an index for"""
+        condition = Q()
+        for index, field in enumerate(ordering):
+            lookup = '__lt' if field.startswith('-') else '__gt'
+            branch = Q(**{field.lstrip('-') + lookup: values[index]})
+            for previous_field, value in zip(ordering[:index], values[:index]):
+                branch &= Q(**{previous_field.lstrip('-'): value})
+            condition |= branch
+
+        return condition
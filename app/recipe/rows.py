@@ -0,0 +1,86 @@
+"""
+Read-only serialization of the list endpoints straight from .values() rows.
+
+ModelSerializer builds a model instance per row, then runs get_attribute() and to_representation() of every field of
+every object into an OrderedDict. The lists instead read .values() rows, with the ManyToMany ids aggregated by
+Postgres (array_agg in a correlated subquery per relation, in the order of the through rows, so no prefetch query),
+and turn every row into the dict the serializer would return: the same keys in the same order, the values that need
+it formatted by the serializer field itself (e.g. the DecimalField price as '5.00').
+
+Only fields read from a column of the model or ManyToMany primary keys are supported, a serializer nesting objects
+(?expand=) or computing values goes through the regular serializer.
+"""
+from django.contrib.postgres.aggregates import ArrayAgg
+from django.contrib.postgres.fields import ArrayField
+from django.db import models
+from django.db.models import OuterRef, Subquery
+from rest_framework import serializers
+from rest_framework.relations import ManyRelatedField, PrimaryKeyRelatedField, RelatedField
+
+
+# the database value of these fields is already their representation, no to_representation() call is needed
+PLAIN_FIELDS = (serializers.CharField, serializers.IntegerField, serializers.BooleanField)
+
+# fields whose representation isn't computed from their own column
+UNSUPPORTED_FIELDS = (
+    serializers.BaseSerializer, RelatedField, serializers.FileField, serializers.SerializerMethodField,
+    serializers.HiddenField,
+)
+
+
+def related_ids(model, field_name):
+    """Return a subquery of the ids of a ManyToMany field of the outer row, in the order they were added"""
+    field = model._meta.get_field(field_name)
+    source, target = field.m2m_field_name(), field.m2m_reverse_field_name()  # 'recipe', 'tag'
+    ids = (
+        field.remote_field.through.objects.filter(**{source: OuterRef('pk')})
+        .values(source).annotate(ids=ArrayAgg(target, ordering='id')).values('ids')
+    )
+    return Subquery(ids, output_field=ArrayField(models.BigIntegerField()))
+
+
+class RowSerializer:
+    """Serialize the .values() rows of a queryset the way the serializer serializes its objects"""
+
+    def __init__(self, serializer):
+        model = serializer.Meta.model
+        columns = {field.name for field in model._meta.concrete_fields}
+        self.model = model
+        self.fields = []  # (key, name in the row, to_representation or None)
+        self.related = {}  # name in the row -> ManyToMany field
+
+        for key, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            if isinstance(field, ManyRelatedField) and isinstance(field.child_relation, PrimaryKeyRelatedField):
+                if field.child_relation.pk_field is not None:
+                    raise TypeError(f'{key}: pk_field is not supported')
+                self.related[f'{field.source}_ids'] = field.source
+                self.fields.append((key, f'{field.source}_ids', None))
+            elif isinstance(field, UNSUPPORTED_FIELDS) or field.source not in columns:
+                raise TypeError(f'{key} of {type(serializer).__name__} is not read from a column')
+            else:
+                to_representation = None if isinstance(field, PLAIN_FIELDS) else field.to_representation
+                self.fields.append((key, field.source, to_representation))
+
+    def values(self, queryset, *names):
+        """Return the queryset of the rows, names adds columns read but not returned (e.g. the ordering)"""
+        annotations = {name: related_ids(self.model, source) for name, source in self.related.items()}
+        columns = {name for _, name, _ in self.fields} | set(names)
+        return queryset.annotate(**annotations).values(*columns)
+
+    def to_representation(self, rows):
+        """Return the list of representations of the rows"""
+        fields, related = self.fields, self.related
+        data = []
+        for row in rows:
+            item = {}
+            for key, name, to_representation in fields:
+                value = row[name]
+                if name in related:
+                    value = value or []  # no through row: NULL
+                elif to_representation is not None and value is not None:
+                    value = to_representation(value)
+                item[key] = value
+            data.append(item)
+        return data
@@ -0,0 +1,109 @@
+"""
+Full-text search of the recipes (?q= of the recipe list).
+
+Every recipe keeps a tsvector of its title (weight A) and of the names of its tags and ingredients (weight B) in
+Recipe.search_vector, indexed with GIN. It is rebuilt by the signals of recipe/signals.py when the title, the tags or
+ingredients of the recipe, or the name of one of them change (update_search_vectors()), and for every recipe by
+./manage.py update_search_vectors, e.g. after changing RECIPE_SEARCH['CONFIG'].
+
+A search matches the recipes whose vector has every word of ?q= as a prefix ("chick curr" finds "Chicken curry"),
+or whose title is close to ?q= for pg_trgm (word_similarity, "chiken" finds "Chicken curry") through the trigram GIN
+index of the title. Both conditions are answered by the indexes, Postgres ORs the two bitmaps. The recipes are
+ranked by ts_rank plus the trigram similarity, best first. pg_trgm is a contrib extension: on a server without it
+(see migration core 0019) only the full-text part is searched.
+"""
+import functools
+import re
+
+from django.conf import settings
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.lookups import PostgresOperatorLookup
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connection
+from django.db.models import F, FloatField, Func, OuterRef, Q, Subquery, TextField, Value
+from django.db.models.functions import Cast, Coalesce
+from rest_framework.exceptions import ValidationError
+
+
+DEFAULTS = {
+    'CONFIG': 'english',  # text search configuration of the vectors and the queries
+    'MAX_TERMS': 10,  # words of ?q= searched, the others are ignored
+}
+
+WORD_RE = re.compile(r'\w+')
+
+
+def get_search_settings():
+    """Return RECIPE_SEARCH merged with the defaults"""
+    return {**DEFAULTS, **getattr(settings, 'RECIPE_SEARCH', {})}
+
+
+# pg_trgm's "title %> q" operator and word_similarity(q, title) (Django 4.0 ships them, not 3.2): the similarity of
+# q with the most similar part of the title, so a word of a long title matches where similarity() is too low
+class TrigramWordSimilar(PostgresOperatorLookup):
+    lookup_name = 'trigram_word_similar'
+    postgres_operator = '%%>'
+
+
+class TrigramWordSimilarity(Func):
+    function = 'WORD_SIMILARITY'
+    output_field = FloatField()
+
+    def __init__(self, string, expression, **extra):
+        if not hasattr(string, 'resolve_expression'):
+            string = Value(string)
+        super().__init__(string, expression, **extra)
+
+
+@functools.lru_cache(maxsize=None)
+def has_trigram():
+    """Return whether pg_trgm is installed in the database, checked once per process"""
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+        return cursor.fetchone() is not None
+
+
+def related_names(model, field_name, name_field):
+    """Return a subquery of the names of a ManyToMany field of the outer recipe, separated by spaces"""
+    field = model._meta.get_field(field_name)
+    source, target = field.m2m_field_name(), field.m2m_reverse_field_name()  # 'recipe', 'tag'
+    names = (
+        field.remote_field.through.objects.filter(**{source: OuterRef('pk')})
+        .values(source).annotate(names=StringAgg(f'{target}__{name_field}', ' ')).values('names')
+    )
+    return Coalesce(Subquery(names), Value(''), output_field=TextField())
+
+
+def search_document(model):
+    """Return the tsvector expression of a recipe, model is Recipe or its historical model in a migration"""
+    config = get_search_settings()['CONFIG']
+    return (
+        SearchVector('title', weight='A', config=config)
+        + SearchVector(related_names(model, 'tag_fk', 'tag_name'), weight='B', config=config)
+        + SearchVector(related_names(model, 'ingredient_fk', 'ing_name'), weight='B', config=config)
+    )
+
+
+def update_search_vectors(queryset):
+    """Rebuild the search vector of the recipes of the queryset with one UPDATE"""
+    return queryset.update(search_vector=search_document(queryset.model))
+
+
+def search(queryset, q):
+    """Filter the recipes matching q, annotated with their rank"""
+    words = WORD_RE.findall(q)[:get_search_settings()['MAX_TERMS']]
+    if not words:
+        raise ValidationError({'q': ['Expected at least one word.']})
+
+    text = ' '.join(words)
+    # every word as a prefix: 'chick:* & curr:*', the words only hold \w so they can't be tsquery operators
+    query = SearchQuery(
+        ' & '.join(f'{word}:*' for word in words), search_type='raw', config=get_search_settings()['CONFIG']
+    )
+    condition, rank = Q(search_vector=query), SearchRank(F('search_vector'), query)
+    if has_trigram():
+        condition |= Q(title__trigram_word_similar=text)
+        rank += TrigramWordSimilarity(text, 'title')
+
+    # ts_rank is a real: the cursor of the pagination compares the exact double precision value instead
+    return queryset.filter(condition).annotate(rank=Cast(rank, FloatField()))
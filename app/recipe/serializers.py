@@ -1,56 +1,287 @@
+import re
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.files.base import ContentFile
+from django.core.validators import validate_image_file_extension
 from rest_framework import serializers
 
-from core.models import Tag, Ingredient, Recipe
+from core.changes import record_changes
+from core.models import Tag, Ingredient, Recipe, ImageUpload
+from recipe import counts, uploads
+from recipe.fields import ImageRenditionsField, UserPrimaryKeyRelatedField
+from recipe.search import update_search_vectors
+
+
+# used by the POST .../bulk/ actions: instead of one INSERT per item (and one per M2M row for recipes)
+# all the validated items are written with bulk_create
+class BulkCreateListSerializer(serializers.ListSerializer):
+    """List serializer creating all the items with bulk_create"""
+    batch_size = 1000
+
+    def to_internal_value(self, data):
+        items = super().to_internal_value(data)
+        name_field = getattr(self.child, 'name_field', None)
+        if name_field:
+            self._validate_unique_names(items, name_field)
+        return items
+
+    def _validate_unique_names(self, items, name_field):
+        """Reject names repeated in the payload or already used by the user, checked with one query"""
+        names = [attrs[name_field] for attrs in items]
+        existing = set(
+            self.child.Meta.model.objects
+            .filter(useraccount=self.context['request'].user, **{f'{name_field}__in': set(names)})
+            .values_list(name_field, flat=True)
+        )
+        errors, seen = [], set()
+        for name in names:
+            if name in existing or name in seen:
+                errors.append({name_field: [self.child.error_messages['duplicate_name']]})
+            else:
+                errors.append({})
+            seen.add(name)
+        if any(errors):
+            raise serializers.ValidationError(errors)
+
+    def create(self, validated_data):
+        model = self.child.Meta.model
+        objects = model.objects.bulk_create(
+            [model(**attrs) for attrs in validated_data],
+            batch_size=self.batch_size
+        )
+        # bulk_create sends no post_save, the objects are logged for the ETags and the delta sync all the same
+        for user_id in {obj.useraccount_id for obj in objects}:
+            record_changes(user_id, model, [obj.pk for obj in objects if obj.useraccount_id == user_id])
+        return objects
+
+
+class RecipeBulkCreateListSerializer(BulkCreateListSerializer):
+    """List serializer creating recipes and their tag/ingredient through rows with bulk_create"""
+    m2m_fields = ('ingredient_fk', 'tag_fk')
+    related_objects = {}  # {field name: {pk: object}} read for the items being validated
+
+    # every item would check its own tag_fk/ingredient_fk with one SELECT (2000 recipes, 2000 SELECTs): the ids of
+    # all the items are read first with one in_bulk per model and UserManyRelatedField picks its objects from there
+    def to_internal_value(self, data):
+        if isinstance(data, list):
+            self.related_objects = self._read_related_objects(data)
+        try:
+            return super().to_internal_value(data)
+        finally:
+            self.related_objects = {}
+
+    def _read_related_objects(self, data):
+        """Return {field name: {pk: object}} of the user's objects referenced by the items"""
+        related_objects = {}
+        for name in self.m2m_fields:
+            relation = self.child.fields[name].child_relation
+            pks = set()
+            for item in data:
+                values = item.get(name) if isinstance(item, dict) else None
+                for value in values if isinstance(values, list) else []:
+                    try:
+                        pks.add(relation.to_pk(value))
+                    except serializers.ValidationError:
+                        pass  # reported on its item by the field
+            related_objects[name] = relation.get_queryset().in_bulk(pks)
+        return related_objects
+
+    def create(self, validated_data):
+        if validated_data:
+            # the view saves every item with the same useraccount
+            self.child.resolve_related_names(validated_data, validated_data[0]['useraccount'])
+        related = [{name: attrs.pop(name, []) for name in self.m2m_fields} for attrs in validated_data]
+        # Postgres returns the ids of bulk inserted rows, we need them for the through rows
+        recipes = super().create(validated_data)
+
+        for name in self.m2m_fields:
+            field = Recipe._meta.get_field(name)
+            through = field.remote_field.through
+            source, target = field.m2m_column_name(), field.m2m_reverse_name()  # 'recipe_id', 'tag_id'
+            rows = [
+                through(**{source: recipe.id, target: pk})
+                for recipe, objects in zip(recipes, related)
+                for pk in {obj.pk for obj in objects[name]}  # a repeated id is only linked once
+            ]
+            through.objects.bulk_create(rows, batch_size=self.batch_size)
+            counts.add_counts(field.related_model, [getattr(row, target) for row in rows])
+
+        # no signal either for the search vectors, built once the tags and ingredients are linked
+        update_search_vectors(Recipe.objects.filter(pk__in=[recipe.id for recipe in recipes]))
+        return recipes
+
+
+def get_or_create_by_name(model, name_field, user, names):
+    """Return {name: object} of the user's objects with these names, bulk creating the missing ones"""
+    names = set(names)
+    if not names:
+        return {}
+
+    queryset = model.objects.filter(useraccount=user)
+    objects = {getattr(obj, name_field): obj for obj in queryset.filter(**{f'{name_field}__in': names})}
+    missing = names - objects.keys()
+    if missing:
+        # ignore_conflicts: a concurrent request may insert the same name first, the unique constraint on
+        # (useraccount, name) keeps a single row and we read back whichever row won
+        model.objects.bulk_create(
+            [model(useraccount=user, **{name_field: name}) for name in missing],
+            ignore_conflicts=True
+        )
+        created = queryset.filter(**{f'{name_field}__in': missing})
+        objects.update((getattr(obj, name_field), obj) for obj in created)
+        record_changes(user.pk, model, [obj.pk for obj in created])
+    return objects
+
+
+# a tag/ingredient name is unique per user (see the constraints on the models)
+class UserUniqueNameSerializer(serializers.ModelSerializer):
+    """Base serializer rejecting a name the requesting user already has"""
+    name_field = None
+
+    default_error_messages = {
+        'duplicate_name': 'You already have one with this name.'
+    }
+
+    # the recipe_count field is only serialized for ?with_counts=1, the view passes with_counts=True
+    def __init__(self, *args, with_counts=False, **kwargs):
+        super().__init__(*args, **kwargs)
+        if not with_counts:
+            self.fields.pop('recipe_count', None)
+
+    def validate(self, attrs):
+        name = attrs.get(self.name_field)
+        request = self.context.get('request')
+        # inside a bulk request BulkCreateListSerializer checks all the names in one query instead
+        if name is None or request is None or isinstance(self.parent, serializers.ListSerializer):
+            return attrs
+
+        queryset = self.Meta.model.objects.filter(useraccount=request.user, **{self.name_field: name})
+        if self.instance is not None:
+            queryset = queryset.exclude(pk=self.instance.pk)
+        if queryset.exists():
+            raise serializers.ValidationError({self.name_field: [self.error_messages['duplicate_name']]})
+        return attrs
 
 
 # building serializers to convert complex data such as queryset and model instances to naitve python dataytpes
 #   than can then be easily rendered into JSON, XML content types
-class TagSerializer(serializers.ModelSerializer):   #
+class TagSerializer(UserUniqueNameSerializer):   #
     """Serializer for tag object"""
     print('*****Tag_Serializer*****')
+    name_field = 'tag_name'
 
     class Meta:
         model = Tag
-        fields = ('id', 'tag_name')
-        read_only_fields = ('id',)
+        fields = ('id', 'tag_name', 'recipe_count')
+        read_only_fields = ('id', 'recipe_count')
+        list_serializer_class = BulkCreateListSerializer
 
 # the Django rest framework serializer is the normal serializer that will be used when building an API with Django. It simply parses data from complex types into JSON or XML.
 # The model serializer is just the same as the above serializer in the sense that it does the same job, only that it builds the serializer based on the model, making the creation of the serializer easier than building it normally.
-class IngredientSerializer(serializers.ModelSerializer):
+class IngredientSerializer(UserUniqueNameSerializer):
     """Serializers for ingredients objects"""
     print('*****Ingredient_Serializer*****')
+    name_field = 'ing_name'
 
     class Meta:
         model = Ingredient
-        fields = ('id','ing_name')
-        read_only_fields = ('id',)
+        fields = ('id', 'ing_name', 'recipe_count')
+        read_only_fields = ('id', 'recipe_count')
+        list_serializer_class = BulkCreateListSerializer
+
+
+# ?fields=id,title and ?expand=tag_fk of the recipe endpoints, the view passes them (RecipeViewSet.get_serializer)
+class SparseFieldsMixin:
+    """Serializer keeping only the requested fields and nesting the objects of the expanded relations"""
+    expandable = {}  # related field -> serializer of its nested objects
+    field_columns = {}  # field not backed by the model column of its name -> columns it reads
+
+    def __init__(self, *args, fields=None, expand=(), **kwargs):
+        super().__init__(*args, **kwargs)
+        for name in expand:
+            self.fields[name] = self.expandable[name](many=True, read_only=True)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+    @classmethod
+    def columns(cls, fields):
+        """Return the model columns needed to serialize these fields (ManyToMany fields have none)"""
+        concrete = {field.name for field in cls.Meta.model._meta.concrete_fields}
+        columns = {'id'}
+        for name in fields:
+            columns.update(cls.field_columns.get(name, [name] if name in concrete else []))
+        return sorted(columns)
 
 
   # Serializing data from database or model
   # Django automatically includes all model fields in the serializer and creates the create and update methods.
-class RecipeSerializer(serializers.ModelSerializer):
+class RecipeSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Serializers for Recipe objects"""
     print('*****Recipe_Serializer*****')
 
     # creating fields for ingredients and tags because these fields are not directly related to Recipe Model,
     # it is Foreign key from Ingredient and Tag model, Therefore; we are retrieving 'ID' of related Model(table)
     # PrimaryKeyRelatedField() means it return Primary_key field only (ID)
-    ingredient_fk = serializers.PrimaryKeyRelatedField(
+    # UserPrimaryKeyRelatedField only accepts the user's own objects and checks all the ids in one query
+    ingredient_fk = UserPrimaryKeyRelatedField(
         many=True,
+        required=False,
         queryset=Ingredient.objects.all()  #  it simply lists the objects... the ingredients with their ID, with their primary key ID
     )
-    tag_fk = serializers.PrimaryKeyRelatedField(
+    tag_fk = UserPrimaryKeyRelatedField(
         many=True,
+        required=False,
         queryset=Tag.objects.all()
     )
 
+    # tags/ingredients can also be given by name, the ones the user doesn't have yet are created,
+    # e.g. {"title": "Curry", ..., "tag_names": ["Vegan"], "ingredient_names": ["Rice", "Chickpeas"]}
+    # On an update the names are added to the tag_fk/ingredient_fk of the payload, or to the current ones without it
+    ingredient_names = serializers.ListField(
+        child=serializers.CharField(max_length=255), write_only=True, required=False
+    )
+    tag_names = serializers.ListField(
+        child=serializers.CharField(max_length=255), write_only=True, required=False
+    )
+
+    expandable = {'ingredient_fk': IngredientSerializer, 'tag_fk': TagSerializer}
+
+    # related field -> (names field, model, model name field)
+    related_names = {
+        'ingredient_fk': ('ingredient_names', Ingredient, 'ing_name'),
+        'tag_fk': ('tag_names', Tag, 'tag_name'),
+    }
+
     class Meta:
         model = Recipe
         fields = ('id', 'title', 'time_minutes', 'price', 'link',
-                  'ingredient_fk','tag_fk'  # we need to define the primary_key related filed for these two fields
+                  'ingredient_fk','tag_fk',  # we need to define the primary_key related filed for these two fields
                                         # because the 'ingredients','tags' are not part of the serializer, they are reference to the ingredient and tag model_class
+                  'ingredient_names', 'tag_names'
                   )
         read_only_fields = ('id',)  # we are making 'id' read_only so that no body can change this
+        list_serializer_class = RecipeBulkCreateListSerializer
+
+    def resolve_related_names(self, items, user):
+        """Move the *_names of the validated items into their related field, one query per type for all the items"""
+        for field_name, (names_field, model, name_field) in self.related_names.items():
+            names = [name for attrs in items for name in attrs.get(names_field, [])]
+            objects = get_or_create_by_name(model, name_field, user, names)
+            for attrs in items:
+                if names_field in attrs:
+                    attrs[field_name] = list(attrs.get(field_name, [])) + [objects[name] for name in attrs.pop(names_field)]
+
+    def create(self, validated_data):
+        self.resolve_related_names([validated_data], validated_data['useraccount'])
+        return super().create(validated_data)
+
+    def update(self, instance, validated_data):
+        for field_name, (names_field, _, _) in self.related_names.items():
+            if names_field in validated_data and field_name not in validated_data:
+                validated_data[field_name] = list(getattr(instance, field_name).all())
+        self.resolve_related_names([validated_data], instance.useraccount)
+        return super().update(instance, validated_data)
 
     # when calling RecipeSerializer() it wil return ==>> [OrderedDict([('id', 3), ('title', 'Chowmien'), ('time_minutes', 10), ('price', '7.00'), ('link', ''), ('ingredients', []), ('tags', [])] )]
 
@@ -62,15 +293,56 @@ class RecipeDetailSerializer(RecipeSerializer):
     # we will inherit attributes from RecipeSerializer and override it.
     ingredient_fk = IngredientSerializer(many=True, read_only=True)
     tag_fk = TagSerializer(many=True, read_only=True)
+    renditions = ImageRenditionsField()
+    field_columns = {'renditions': ('image', 'image_status', 'image_renditions')}
 
-    # since This class Inherit RecipeSerializer it will auto-inherit 'Class Meta:' too
+    # the detail also shows the image and its resized copies (the image is changed through upload-image)
+    class Meta(RecipeSerializer.Meta):
+        fields = RecipeSerializer.Meta.fields + ('image', 'image_status', 'renditions')
+        read_only_fields = ('id', 'image', 'image_status')
 
 
 # To handle the uploaded image (for this we are going to create View {get_serializer_class & upload_image()})
 class RecipeImageSerializer(serializers.ModelSerializer):
     """Serializer for uploading images to recipes"""
+    # the renditions are generated after the response, image_status tells when they are ready
+    renditions = ImageRenditionsField()
 
     class Meta:
         model = Recipe
-        fields = ('id', 'image')
-        read_only_fields = ('id',)
+        fields = ('id', 'image', 'image_status', 'renditions')
+        read_only_fields = ('id', 'image_status')
+
+
+# starts a chunked upload (recipe/uploads.py), the response tells the client where to start and how much to send per chunk
+class ImageUploadSerializer(serializers.ModelSerializer):
+    """Serializer for chunked image uploads"""
+    chunk_size = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ImageUpload
+        fields = ('id', 'filename', 'size', 'sha256', 'offset', 'chunk_size')
+        read_only_fields = ('id', 'offset')
+
+    def get_chunk_size(self, upload):
+        return uploads.get_upload_settings()['MAX_CHUNK_SIZE']
+
+    # the same extensions as the upload-image endpoint (ImageField): the stored file must never be served as html & co
+    def validate_filename(self, value):
+        try:
+            validate_image_file_extension(ContentFile(b'', name=value))
+        except DjangoValidationError as exc:
+            raise serializers.ValidationError(exc.messages)
+        return value
+
+    def validate_size(self, value):
+        max_size = uploads.get_upload_settings()['MAX_SIZE']
+        if not 0 < value <= max_size:
+            raise serializers.ValidationError(f'Expected a size between 1 and {max_size} bytes.')
+        return value
+
+    def validate_sha256(self, value):
+        value = value.lower()
+        if not re.fullmatch(r'[0-9a-f]{64}', value):
+            raise serializers.ValidationError('Expected the hex SHA-256 digest of the file.')
+        return value
@@ -0,0 +1,126 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from core.changes import record_changes
+from core.models import ChangeLog, Tag, Ingredient, Recipe
+from recipe import counts, images
+from recipe.search import update_search_vectors
+
+
+# the image files are shared between recipes (core/storage.py), deleting the recipe releases its references
+@receiver(post_delete, sender=Recipe)
+def release_recipe_image(sender, instance, **kwargs):
+    """Release the image and renditions of a deleted recipe"""
+    images.delete_image(instance.image.name, instance.image_renditions)
+
+
+# versions used by the ETags (core/conditional.py) and the keys of the list cache (recipe/cache.py), with the change
+# log of the delta sync (core/changes.py). Writes that don't send signals (bulk_create, update()) record their
+# changes themselves.
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+def log_saved(sender, instance, **kwargs):
+    """Log a created or updated object in the change log of its owner"""
+    record_changes(instance.useraccount_id, sender, [instance.pk])
+
+
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def log_deleted(sender, instance, **kwargs):
+    """Log a tombstone of a deleted object in the change log of its owner"""
+    record_changes(instance.useraccount_id, sender, [instance.pk], action=ChangeLog.DELETE)
+
+
+# search vectors of the ?q= search (recipe/search.py): the title of the recipe is in its vector
+@receiver(post_save, sender=Recipe)
+def index_recipe(sender, instance, update_fields=None, **kwargs):
+    """Rebuild the search vector of a saved recipe"""
+    if update_fields is None or 'title' in update_fields:
+        update_search_vectors(Recipe.objects.filter(pk=instance.pk))
+
+
+def _recipe_ids_of(instance):
+    """Return the ids of the recipes of a tag/ingredient"""
+    field = 'tag_fk' if isinstance(instance, Tag) else 'ingredient_fk'
+    return list(Recipe.objects.filter(**{field: instance}).values_list('id', flat=True))
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(pre_delete, sender=Tag)
+@receiver(pre_delete, sender=Ingredient)
+def touch_recipes_of(sender, instance, signal, created=False, **kwargs):
+    """Touch the recipes showing a renamed or deleted tag/ingredient (their detail nests it)"""
+    if created:
+        return
+    recipe_ids = _recipe_ids_of(instance)
+    Recipe.objects.filter(pk__in=recipe_ids).update(updated_at=timezone.now())
+    if signal is pre_delete:
+        # the through rows are deleted by the cascade without m2m_changed: the recipes lose the id silently.
+        # Their search vectors are rebuilt once the rows are gone (reindex_recipes_of)
+        record_changes(instance.useraccount_id, Recipe, recipe_ids)
+        instance._recipe_ids = recipe_ids
+    else:
+        update_search_vectors(Recipe.objects.filter(pk__in=recipe_ids))
+
+
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def reindex_recipes_of(sender, instance, **kwargs):
+    """Rebuild the search vectors of the recipes of a deleted tag/ingredient"""
+    recipe_ids = getattr(instance, '_recipe_ids', None)
+    if recipe_ids:
+        update_search_vectors(Recipe.objects.filter(pk__in=recipe_ids))
+
+
+@receiver(m2m_changed, sender=Recipe.tag_fk.through)
+@receiver(m2m_changed, sender=Recipe.ingredient_fk.through)
+def related_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """Touch, log and reindex the recipes whose tags/ingredients changed"""
+    if action == 'pre_clear':
+        # tag.recipe_set.clear(): the recipes are read before the rows are gone, updated after (post_clear)
+        instance._cleared_recipe_ids = _recipe_ids_of(instance) if reverse else [instance.pk]
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear') or (action != 'post_clear' and not pk_set):
+        return
+
+    if action == 'post_clear':
+        recipe_ids = instance.__dict__.pop('_cleared_recipe_ids', [])
+    elif not reverse:  # recipe.tag_fk.add(...)
+        recipe_ids = [instance.pk]
+    else:  # tag.recipe_set.add(...)
+        recipe_ids = list(pk_set)
+    if not recipe_ids:
+        return
+    Recipe.objects.filter(pk__in=recipe_ids).update(updated_at=timezone.now())
+    record_changes(instance.useraccount_id, Recipe, recipe_ids)
+    update_search_vectors(Recipe.objects.filter(pk__in=recipe_ids))
+
+
+# recipe_count of the tags/ingredients (recipe/counts.py). remove() and clear() are counted from the through rows
+# read before they are deleted: remove() ignores the ids that aren't linked
+@receiver(m2m_changed, sender=Recipe.tag_fk.through)
+@receiver(m2m_changed, sender=Recipe.ingredient_fk.through)
+def count_related_changed(sender, instance, action, reverse, model, pk_set, **kwargs):
+    """Update the recipe_count of the tags/ingredients linked to or unlinked from recipes"""
+    related_model = model if not reverse else type(instance)
+    if action in ('pre_remove', 'pre_clear'):
+        limit = pk_set if action == 'pre_remove' else None
+        instance._uncounted_ids = counts.linked_ids(sender, instance, reverse, limit)
+    elif action in ('post_remove', 'post_clear'):
+        counts.add_counts(related_model, instance.__dict__.pop('_uncounted_ids', []), delta=-1)
+    elif action == 'post_add' and pk_set:  # only the ids that weren't linked yet
+        counts.add_counts(related_model, pk_set if not reverse else [instance.pk] * len(pk_set))
+
+
+# the through rows of a deleted recipe are deleted by the cascade without m2m_changed
+@receiver(pre_delete, sender=Recipe)
+def uncount_deleted_recipe(sender, instance, **kwargs):
+    """Remove a deleted recipe from the recipe_count of its tags and ingredients"""
+    for field_name in ('tag_fk', 'ingredient_fk'):
+        field = Recipe._meta.get_field(field_name)
+        related_ids = counts.linked_ids(field.remote_field.through, instance, reverse=False)
+        counts.add_counts(field.related_model, related_ids, delta=-1)
@@ -0,0 +1,104 @@
+"""
+Delta sync of the recipes, tags and ingredients of a user (GET /api/recipe/sync/).
+
+The sync token is the collection version of the user (core/conditional.py). Without ?since= the client gets all its
+objects and the current version; with ?since=<token> it gets the objects created, updated or deleted after that
+version, read from the change log (core/changes.py), so an offline client syncs in O(changes) instead of O(data).
+Several log rows of one object collapse into its last action, and a response covers at most max_versions versions:
+the client calls again with the returned token while 'more' is true.
+"""
+from django.utils.translation import gettext_lazy as _
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+
+from core.conditional import get_collection_version
+from core.models import ChangeLog, CollectionVersion, Tag, Ingredient, Recipe
+from recipe import serializers
+
+
+# (response key, model, serializer of the items)
+COLLECTIONS = (
+    ('recipes', Recipe, serializers.RecipeSerializer),
+    ('tags', Tag, serializers.TagSerializer),
+    ('ingredients', Ingredient, serializers.IngredientSerializer),
+)
+
+
+class SyncTokenExpired(APIException):
+    status_code = status.HTTP_410_GONE
+    default_detail = _('The change log of this sync token was pruned, sync again without "since".')
+    default_code = 'sync_token_expired'
+
+
+def parse_token(value):
+    """Return the version of a sync token, None for a full sync"""
+    if value in (None, ''):
+        return None
+    try:
+        version = int(value)
+    except ValueError:
+        version = -1
+    if version < 0:
+        raise ValidationError({'since': [f'Expected a sync token, got "{value}".']})
+    return version
+
+
+def get_changes(user, since, max_versions):
+    """Return (token, more, {(model_name, id): action}) of the changes after the version since"""
+    version, pruned_version = (
+        CollectionVersion.objects.filter(pk=user.pk).values_list('version', 'pruned_version').first() or (0, 0)
+    )
+    if since > version:  # never handed out: the changes between the client's real version and it would be lost
+        raise ValidationError({'since': [f'Unknown sync token "{since}", sync again without "since".']})
+    if since < pruned_version:
+        raise SyncTokenExpired()
+
+    log = ChangeLog.objects.filter(useraccount=user, version__gt=since)
+    # cut after max_versions whole versions: the rows of one version (a bulk create) are never split
+    upper = list(log.order_by('version').values_list('version', flat=True).distinct()[max_versions:max_versions + 1])
+    if upper:
+        log = log.filter(version__lt=upper[0])
+
+    token, changes = since, {}
+    for model_name, object_id, action, version in log.order_by('version', 'id').values_list(
+        'model', 'object_id', 'action', 'version'
+    ):
+        changes[model_name, object_id] = action
+        token = max(token, version)
+    if upper:
+        token = upper[0] - 1  # every version before upper[0] is in this response
+
+    return token, bool(upper), changes
+
+
+def sync(request, since, max_versions):
+    """Return the sync response data of the user"""
+    user = request.user
+    if since is None:
+        # the version is read first: a change committed meanwhile is in the data and sent again next time
+        token, more, changes = get_collection_version(user.pk), False, None
+    else:
+        token, more, changes = get_changes(user, since, max_versions)
+
+    data = {'token': str(token), 'more': more}
+    for key, model, serializer_class in COLLECTIONS:
+        queryset = model.objects.filter(useraccount=user).order_by('id')
+        if model is Recipe:
+            queryset = queryset.prefetch_related('tag_fk', 'ingredient_fk')
+
+        deleted = []
+        if changes is not None:
+            actions = {pk: action for (name, pk), action in changes.items() if name == model._meta.model_name}
+            upserted = {pk for pk, action in actions.items() if action == ChangeLog.UPSERT}
+            deleted = {pk for pk, action in actions.items() if action == ChangeLog.DELETE}
+            queryset = queryset.filter(pk__in=upserted) if upserted else queryset.none()
+        objects = list(queryset)
+        if changes is not None:
+            # deleted since it was logged (the tombstone is in a later version)
+            deleted = sorted(deleted | (upserted - {obj.pk for obj in objects}))
+
+        data[key] = {
+            'updated': serializer_class(objects, many=True, context={'request': request}).data,
+            'deleted': deleted,
+        }
+    return data
@@ -0,0 +1,90 @@
+import os
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from recipe.tests.test_recipe_api import HelperSample
+
+
+TAGS_AUTOCOMPLETE_URL = reverse('recipe:tag-autocomplete')
+INGREDIENTS_AUTOCOMPLETE_URL = reverse('recipe:ingredient-autocomplete')
+
+
+class AutocompleteApiTests(TestCase):
+    """Test the autocomplete action of the tags and ingredients"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            os.environ.get('USER_EMAIL'),
+            os.environ.get('USER_PASS')
+        )
+        self.client.force_authenticate(self.user)
+        for name in ('Vegetarian', 'vegan', 'Spicy', 'Veal', 'Quick'):
+            HelperSample.sample_tag(user=self.user, tag_name=name)
+
+    def names(self, url, **params):
+        res = self.client.get(url, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [item.get('tag_name', item.get('ing_name')) for item in res.data]
+
+    def test_login_required(self):
+        """Test the autocomplete needs an authenticated user"""
+        res = APIClient().get(TAGS_AUTOCOMPLETE_URL, {'prefix': 've'})
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_prefix_case_insensitive(self):
+        """Test the names starting with the prefix are returned alphabetically whatever their case"""
+        res = self.client.get(TAGS_AUTOCOMPLETE_URL, {'prefix': 've'})
+
+        self.assertEqual([tag['tag_name'] for tag in res.data], ['Veal', 'vegan', 'Vegetarian'])
+        self.assertEqual(set(res.data[0]), {'id', 'tag_name'})
+
+    def test_limit(self):
+        """Test ?limit= caps the number of names"""
+        self.assertEqual(self.names(TAGS_AUTOCOMPLETE_URL, prefix='VEG', limit=1), ['vegan'])
+
+    def test_like_characters_escaped(self):
+        """Test % and _ in the prefix are matched literally"""
+        HelperSample.sample_tag(user=self.user, tag_name='50% off')
+
+        self.assertEqual(self.names(TAGS_AUTOCOMPLETE_URL, prefix='%'), [])
+        self.assertEqual(self.names(TAGS_AUTOCOMPLETE_URL, prefix='50%'), ['50% off'])
+
+    def test_other_user_names_excluded(self):
+        """Test only the names of the user are completed"""
+        other = get_user_model().objects.create_user('other@testapp.com', 'testpass')
+        HelperSample.sample_tag(user=other, tag_name='Spicier')
+
+        self.assertEqual(self.names(TAGS_AUTOCOMPLETE_URL, prefix='spic'), ['Spicy'])
+
+    def test_ingredients(self):
+        """Test the ingredients are completed on their name"""
+        HelperSample.sample_ingredient(user=self.user, ing_name='Salt')
+        HelperSample.sample_ingredient(user=self.user, ing_name='Salmon')
+        HelperSample.sample_ingredient(user=self.user, ing_name='Sugar')
+
+        self.assertEqual(self.names(INGREDIENTS_AUTOCOMPLETE_URL, prefix='sal'), ['Salmon', 'Salt'])
+
+    def test_new_name_completed(self):
+        """Test a tag created after a first call is completed (no stale 304)"""
+        first = self.client.get(TAGS_AUTOCOMPLETE_URL, {'prefix': 'qu'})
+        self.client.post(reverse('recipe:tag-list'), {'tag_name': 'Quiche'})
+
+        res = self.client.get(TAGS_AUTOCOMPLETE_URL, {'prefix': 'qu'}, HTTP_IF_NONE_MATCH=first['ETag'])
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([tag['tag_name'] for tag in res.data], ['Quiche', 'Quick'])
+
+    def test_invalid_params(self):
+        """Test a missing prefix or a bad limit is a 400"""
+        for params in ({}, {'prefix': ' '}, {'prefix': 've', 'limit': 'ten'},
+                       {'prefix': 've', 'limit': 0}, {'prefix': 've', 'limit': -3}):
+            res = self.client.get(TAGS_AUTOCOMPLETE_URL, params)
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,130 @@
+import os
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Tag, Ingredient, Recipe
+from recipe.tests.test_recipe_api import HelperSample
+
+
+TAGS_BULK_URL = reverse('recipe:tag-bulk-create')
+INGREDIENTS_BULK_URL = reverse('recipe:ingredient-bulk-create')
+RECIPES_BULK_URL = reverse('recipe:recipe-bulk-create')
+
+
+class BulkCreateApiTests(TestCase):
+    """Test the POST .../bulk/ endpoints"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            os.environ.get('USER_EMAIL'),
+            os.environ.get('USER_PASS')
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_bulk_create_tags(self):
+        """Test creating several tags in one request"""
+        payload = [{'tag_name': 'Vegan'}, {'tag_name': 'Dessert'}]
+
+        res = self.client.post(TAGS_BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual([tag['tag_name'] for tag in res.data], ['Vegan', 'Dessert'])
+        tags = Tag.objects.filter(useraccount=self.user)
+        self.assertEqual(sorted(tag.id for tag in tags), sorted(tag['id'] for tag in res.data))
+
+    def test_bulk_create_ingredients(self):
+        """Test creating several ingredients in one request"""
+        payload = [{'ing_name': 'Salt'}, {'ing_name': 'Pepper'}]
+
+        res = self.client.post(INGREDIENTS_BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Ingredient.objects.filter(useraccount=self.user).count(), 2)
+
+    def test_bulk_create_recipes(self):
+        """Test creating recipes with their tags and ingredients"""
+        tag = HelperSample.sample_tag(user=self.user)
+        ingredient = HelperSample.sample_ingredient(user=self.user)
+        payload = [
+            {'title': 'Curry', 'time_minutes': 30, 'price': '5.00',
+             'tag_fk': [tag.id, tag.id], 'ingredient_fk': [ingredient.id]},
+            {'title': 'Toast', 'time_minutes': 5, 'price': '1.50', 'tag_fk': [], 'ingredient_fk': []},
+        ]
+
+        res = self.client.post(RECIPES_BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        curry = Recipe.objects.get(id=res.data[0]['id'], useraccount=self.user)
+        self.assertEqual(list(curry.tag_fk.all()), [tag])
+        self.assertEqual(list(curry.ingredient_fk.all()), [ingredient])
+        self.assertEqual(res.data[0]['tag_fk'], [tag.id])
+        self.assertEqual(res.data[1]['tag_fk'], [])
+        self.assertEqual(Recipe.objects.get(id=res.data[1]['id']).title, 'Toast')
+
+    def test_bulk_create_recipes_queries(self):
+        """Test the ids of all the items are checked with one query per model, whatever the number of items"""
+        tags = [HelperSample.sample_tag(user=self.user, tag_name=f'Tag {i}') for i in range(3)]
+        ingredient = HelperSample.sample_ingredient(user=self.user)
+        payload = [
+            {'title': f'Recipe {i}', 'time_minutes': 5, 'price': '1.00',
+             'tag_fk': [tags[i % 3].id], 'ingredient_fk': [ingredient.id]}
+            for i in range(50)
+        ]
+
+        # 2 in_bulk for the ids, then the writes (recipes, change log, through rows, counts, search vectors) and the
+        # 2 reads of the tag/ingredient ids of the response, none of them repeated per item
+        with self.assertNumQueries(16):
+            res = self.client.post(RECIPES_BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Recipe.objects.filter(useraccount=self.user, tag_fk=tags[1]).count(), 17)
+
+    def test_bulk_create_unknown_ids(self):
+        """Test the ids of other users are reported on their item"""
+        tag = HelperSample.sample_tag(user=self.user)
+        other = HelperSample.sample_tag(user=get_user_model().objects.create_user('other@testapp.com', 'testpass'))
+        payload = [
+            {'title': 'Curry', 'time_minutes': 30, 'price': '5.00', 'tag_fk': [tag.id]},
+            {'title': 'Toast', 'time_minutes': 5, 'price': '1.50', 'tag_fk': [other.id, 'abc']},
+        ]
+
+        res = self.client.post(RECIPES_BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data[0], {})
+        self.assertIn('tag_fk', res.data[1])
+
+    def test_bulk_create_reports_item_errors(self):
+        """Test an invalid item is reported at its index and nothing is created"""
+        payload = [
+            {'title': 'Curry', 'time_minutes': 30, 'price': '5.00', 'tag_fk': [], 'ingredient_fk': []},
+            {'title': '', 'time_minutes': 30, 'price': '5.00', 'tag_fk': [], 'ingredient_fk': []},
+        ]
+
+        res = self.client.post(RECIPES_BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data[0], {})
+        self.assertIn('title', res.data[1])
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_bulk_create_requires_list(self):
+        """Test a single object is rejected"""
+        res = self.client.post(TAGS_BULK_URL, {'tag_name': 'Vegan'}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_create_item_limit(self):
+        """Test the number of items per request is capped"""
+        payload = [{'tag_name': f'Tag {i}'} for i in range(10001)]
+
+        res = self.client.post(TAGS_BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Tag.objects.exists())
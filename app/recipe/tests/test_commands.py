@@ -0,0 +1,31 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from core.models import Recipe, Tag
+
+
+class BenchmarkCommandTests(TestCase):
+
+    def test_benchmark_assigned_only(self):
+        """Test the benchmark times both queries and rolls the seeded data back"""
+        out = StringIO()
+        call_command('benchmark_assigned_only', recipes=20, tags=4, repeat=1, stdout=out)
+
+        output = out.getvalue()
+        self.assertIn('join + distinct: 2 tags', output)
+        self.assertIn('exists: 2 tags', output)
+        self.assertFalse(Recipe.objects.exists())
+        self.assertFalse(Tag.objects.exists())
+
+    def test_benchmark_serializers(self):
+        """Test the benchmark times both serializations, checks they match and rolls the seeded data back"""
+        out = StringIO()
+        call_command('benchmark_serializers', recipes=20, tags=4, repeat=1, stdout=out)
+
+        output = out.getvalue()
+        self.assertIn('Recipe serializer: 20 rows', output)
+        self.assertIn('Recipe rows: 20 rows', output)
+        self.assertIn('Tag rows: 4 rows', output)
+        self.assertFalse(Recipe.objects.exists())
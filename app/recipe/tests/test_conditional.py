@@ -0,0 +1,118 @@
+import os
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag
+from recipe.tests.test_recipe_api import RECIPES_URL, HelperSample, detail_url
+
+
+TAGS_URL = reverse('recipe:tag-list')
+BULK_TAGS_URL = reverse('recipe:tag-bulk-create')
+
+
+class ConditionalRequestTests(TestCase):
+    """Test the ETags and 304 responses of the recipe API"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            os.environ.get('USER_EMAIL'),
+            os.environ.get('USER_PASS')
+        )
+        self.client.force_authenticate(self.user)
+        self.tag = HelperSample.sample_tag(user=self.user, tag_name='Vegan')
+        self.recipe = HelperSample.sample_recipe(user=self.user)
+        self.recipe.tag_fk.add(self.tag)
+
+    def assert_etag_changed(self, url, change):
+        """Assert the ETag of url is not valid any more after change()"""
+        etag = self.client.get(url)['ETag']
+        change()
+        res = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res['ETag'], etag)
+
+    def test_list_not_modified(self):
+        """Test a list revalidated with its ETag is a 304 costing one query"""
+        etag = self.client.get(RECIPES_URL)['ETag']
+
+        with self.assertNumQueries(1):  # collection version
+            res = self.client.get(RECIPES_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(res.content, b'')
+
+    def test_list_etag_depends_on_query(self):
+        """Test another filter or page of the list has another ETag"""
+        etag = self.client.get(RECIPES_URL)['ETag']
+
+        res = self.client.get(RECIPES_URL, {'tag_fk': self.tag.id}, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_list_changes_with_collection(self):
+        """Test creating, renaming, relating and deleting invalidate the list ETags"""
+        self.assert_etag_changed(RECIPES_URL, lambda: HelperSample.sample_recipe(user=self.user, title='Other'))
+        self.assert_etag_changed(RECIPES_URL, lambda: Tag.objects.filter(pk=self.tag.pk).first().save())
+        self.assert_etag_changed(TAGS_URL, lambda: HelperSample.sample_tag(user=self.user, tag_name='Dessert'))
+        self.assert_etag_changed(
+            RECIPES_URL, lambda: self.recipe.ingredient_fk.add(HelperSample.sample_ingredient(user=self.user))
+        )
+        self.assert_etag_changed(RECIPES_URL, lambda: self.recipe.tag_fk.clear())
+        self.assert_etag_changed(RECIPES_URL, lambda: self.recipe.delete())
+
+    def test_bulk_create_changes_list(self):
+        """Test the bulk endpoint invalidates the list ETag"""
+        self.assert_etag_changed(
+            TAGS_URL, lambda: self.client.post(BULK_TAGS_URL, [{'tag_name': 'Quick'}], format='json')
+        )
+
+    def test_other_user_changes_ignored(self):
+        """Test the ETag of a user does not change with the data of another user"""
+        etag = self.client.get(RECIPES_URL)['ETag']
+        other = get_user_model().objects.create_user('other@testapp.com', 'testpass')
+        HelperSample.sample_recipe(user=other)
+
+        res = self.client.get(RECIPES_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_detail_not_modified(self):
+        """Test a recipe revalidated with its ETag is a 304 costing one query"""
+        url = detail_url(self.recipe.id)
+        etag = self.client.get(url)['ETag']
+
+        with self.assertNumQueries(1):  # updated_at
+            res = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_detail_changes_with_related_names(self):
+        """Test renaming a tag of the recipe invalidates the recipe ETag"""
+        def rename():
+            self.tag.tag_name = 'Vegetarian'
+            self.tag.save()
+
+        self.assert_etag_changed(detail_url(self.recipe.id), rename)
+
+    def test_detail_changes_after_patch(self):
+        """Test updating the recipe invalidates its ETag"""
+        url = detail_url(self.recipe.id)
+        self.assert_etag_changed(url, lambda: self.client.patch(url, {'title': 'Renamed'}))
+
+    def test_detail_of_other_user(self):
+        """Test a recipe of another user is still a 404, without ETag"""
+        other = get_user_model().objects.create_user('other@testapp.com', 'testpass')
+        recipe = HelperSample.sample_recipe(user=other)
+
+        res = self.client.get(detail_url(recipe.id))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertNotIn('ETag', res)
+        self.assertTrue(Recipe.objects.filter(pk=recipe.pk).exists())
@@ -0,0 +1,99 @@
+import os
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from recipe.tests.test_recipe_api import RECIPES_URL, HelperSample
+
+
+class RecipeFacetsTests(TestCase):
+    """Test the ?facets=1 counts of the recipe list"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            os.environ.get('USER_EMAIL'),
+            os.environ.get('USER_PASS')
+        )
+        self.client.force_authenticate(self.user)
+        self.vegan = HelperSample.sample_tag(user=self.user, tag_name='Vegan')
+        self.quick = HelperSample.sample_tag(user=self.user, tag_name='Quick')
+        self.rice = HelperSample.sample_ingredient(user=self.user, ing_name='Rice')
+        self.tofu = HelperSample.sample_ingredient(user=self.user, ing_name='Tofu')
+
+        self.curry = HelperSample.sample_recipe(user=self.user, title='Curry', time_minutes=40)
+        self.curry.tag_fk.add(self.vegan)
+        self.curry.ingredient_fk.add(self.rice)
+        self.curry.ingredient_fk.add(self.tofu)
+        self.bowl = HelperSample.sample_recipe(user=self.user, title='Bowl', time_minutes=10)
+        self.bowl.tag_fk.add(self.vegan)
+        self.bowl.tag_fk.add(self.quick)
+        self.bowl.ingredient_fk.add(self.rice)
+        self.steak = HelperSample.sample_recipe(user=self.user, title='Steak', time_minutes=15)
+        self.steak.tag_fk.add(self.quick)
+
+    def facets(self, **params):
+        res = self.client.get(RECIPES_URL, {'facets': 1, **params})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res.data['facets']
+
+    def test_facets_of_all_recipes(self):
+        """Test the facets count the recipes of every tag and ingredient, most used first"""
+        facets = self.facets()
+
+        self.assertEqual(facets['tags'], [
+            {'id': self.quick.id, 'tag_name': 'Quick', 'recipe_count': 2},
+            {'id': self.vegan.id, 'tag_name': 'Vegan', 'recipe_count': 2},
+        ])
+        self.assertEqual(facets['ingredients'], [
+            {'id': self.rice.id, 'ing_name': 'Rice', 'recipe_count': 2},
+            {'id': self.tofu.id, 'ing_name': 'Tofu', 'recipe_count': 1},
+        ])
+
+    def test_facets_follow_filters(self):
+        """Test the facets only count the recipes matching the filters, not only the page"""
+        facets = self.facets(tag_fk=self.vegan.id, page_size=1)
+
+        tags = [(tag['tag_name'], tag['recipe_count']) for tag in facets['tags']]
+        self.assertEqual(tags, [('Vegan', 2), ('Quick', 1)])
+        self.assertEqual(facets['ingredients'][0]['recipe_count'], 2)
+
+        facets = self.facets(time_max=20, q='steak')
+        self.assertEqual(facets, {'tags': [{'id': self.quick.id, 'tag_name': 'Quick', 'recipe_count': 1}],
+                                  'ingredients': []})
+
+    def test_facets_one_query(self):
+        """Test the two facets are read with one more query"""
+        with CaptureQueriesContext(connection) as plain:
+            self.client.get(RECIPES_URL)
+        with CaptureQueriesContext(connection) as faceted:
+            res = self.client.get(RECIPES_URL, {'facets': 1})
+
+        self.assertEqual(len(faceted), len(plain) + 1)
+        self.assertEqual(len(res.data['results']), 3)
+
+    def test_no_facets_by_default(self):
+        """Test the list has no facets without ?facets=1"""
+        res = self.client.get(RECIPES_URL)
+
+        self.assertNotIn('facets', res.data)
+        self.assertNotIn('facets', self.client.get(RECIPES_URL, {'facets': 'false'}).data)
+
+    def test_invalid_flag(self):
+        """Test a ?facets= other than 0/1/true/false is a 400"""
+        res = self.client.get(RECIPES_URL, {'facets': 'yes'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('facets', res.data)
+
+    def test_other_user_excluded(self):
+        """Test the recipes of other users aren't counted"""
+        other = get_user_model().objects.create_user('other@testapp.com', 'testpass')
+        HelperSample.sample_recipe(user=other).tag_fk.add(HelperSample.sample_tag(user=other, tag_name='Other'))
+
+        self.assertEqual([tag['tag_name'] for tag in self.facets()['tags']], ['Quick', 'Vegan'])
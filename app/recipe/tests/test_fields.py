@@ -0,0 +1,81 @@
+import os
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from recipe.tests.test_recipe_api import RECIPES_URL, HelperSample, detail_url
+
+
+class UserRelatedIdsTests(TestCase):
+    """Test the tag_fk/ingredient_fk ids of a recipe payload"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            os.environ.get('USER_EMAIL'),
+            os.environ.get('USER_PASS')
+        )
+        self.client.force_authenticate(self.user)
+
+    def payload(self, **params):
+        payload = {'title': 'Curry', 'time_minutes': 30, 'price': '5.00'}
+        payload.update(params)
+        return payload
+
+    def test_ids_validated_in_one_query(self):
+        """Test the number of ids doesn't change the number of queries"""
+        few = [HelperSample.sample_tag(user=self.user, tag_name=f'Tag {i}').id for i in range(2)]
+        many = [HelperSample.sample_tag(user=self.user, tag_name=f'Tag {i}').id for i in range(2, 30)]
+
+        with CaptureQueriesContext(connection) as few_queries:
+            res = self.client.post(RECIPES_URL, self.payload(tag_fk=few), format='json')
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+        with CaptureQueriesContext(connection) as many_queries:
+            res = self.client.post(RECIPES_URL, self.payload(tag_fk=many), format='json')
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+        self.assertEqual(len(many_queries), len(few_queries))
+        self.assertEqual(sorted(res.data['tag_fk']), sorted(many))
+
+    def test_other_users_ids_rejected(self):
+        """Test a tag of another user can't be linked to a recipe"""
+        other = get_user_model().objects.create_user('other@testapp.com', 'testpass123')
+        other_tag = HelperSample.sample_tag(user=other)
+
+        res = self.client.post(RECIPES_URL, self.payload(tag_fk=[other_tag.id]), format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn(str(other_tag.id), str(res.data['tag_fk']))
+
+    def test_missing_ids_reported_together(self):
+        """Test every unknown id is listed in a single error"""
+        tag = HelperSample.sample_tag(user=self.user)
+
+        res = self.client.post(RECIPES_URL, self.payload(tag_fk=[tag.id, 998, 999]), format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(len(res.data['tag_fk']), 1)
+        self.assertIn('998, 999', res.data['tag_fk'][0])
+
+    def test_invalid_id_type(self):
+        """Test a non numeric id is rejected"""
+        res = self.client.post(RECIPES_URL, self.payload(tag_fk=['abc']), format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_update_with_other_users_ids_rejected(self):
+        """Test an update can't link another user's ingredient"""
+        other = get_user_model().objects.create_user('other@testapp.com', 'testpass123')
+        ingredient = HelperSample.sample_ingredient(user=other)
+        recipe = HelperSample.sample_recipe(user=self.user)
+
+        res = self.client.patch(detail_url(recipe.id), {'ingredient_fk': [ingredient.id]}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(recipe.ingredient_fk.exists())
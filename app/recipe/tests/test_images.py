@@ -0,0 +1,294 @@
+import os
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from PIL import Image
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.conditional import get_collection_version
+from core.models import ChangeLog, ImageBlob, Recipe
+from recipe import images
+from recipe.tests.test_recipe_api import HelperSample, detail_url, image_upload_url
+
+
+IMAGES = {'WORKERS': 0, 'SIZES': {'thumbnail': 20, 'large': 50}}
+
+
+def sample_jpeg(size=(100, 60), orientation=None):
+    """Return the bytes of a JPEG with some EXIF metadata"""
+    exif = Image.Exif()
+    exif[0x010F] = 'Test camera'  # Make
+    if orientation:
+        exif[0x0112] = orientation
+    out = BytesIO()
+    Image.new('RGB', size, 'red').save(out, 'JPEG', exif=exif)
+    return out.getvalue()
+
+
+@override_settings(RECIPE_IMAGES=IMAGES)
+class ImagePipelineTests(TestCase):
+    """Test the generation of the recipe image renditions"""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.media_settings = override_settings(MEDIA_ROOT=self.media_root)
+        self.media_settings.enable()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            os.environ.get('USER_EMAIL'),
+            os.environ.get('USER_PASS')
+        )
+        self.client.force_authenticate(self.user)
+        self.recipe = HelperSample.sample_recipe(user=self.user)
+
+    def tearDown(self):
+        self.media_settings.disable()
+        shutil.rmtree(self.media_root)
+
+    def upload(self, data):
+        upload = ContentFile(data, name='photo.jpg')
+        with self.captureOnCommitCallbacks(execute=True):
+            res = self.client.post(image_upload_url(self.recipe.id), {'image': upload}, format='multipart')
+        self.recipe.refresh_from_db()
+        return res
+
+    def open_rendition(self, size_name, fmt):
+        return Image.open(self.recipe.image.storage.path(self.recipe.image_renditions[size_name][fmt]))
+
+    def test_upload_returns_before_processing(self):
+        """Test the upload response doesn't wait for the renditions"""
+        res = self.client.post(
+            image_upload_url(self.recipe.id), {'image': ContentFile(sample_jpeg(), name='photo.jpg')}, format='multipart'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['image_status'], Recipe.IMAGE_PENDING)
+        self.assertEqual(res.data['renditions'], {})
+
+    def test_renditions_generated(self):
+        """Test every size is written as WebP and JPEG without upscaling"""
+        self.upload(sample_jpeg())
+
+        self.assertEqual(self.recipe.image_status, Recipe.IMAGE_READY)
+        self.assertEqual(set(self.recipe.image_renditions), {'thumbnail', 'large'})
+        with self.open_rendition('thumbnail', 'webp') as img:
+            self.assertEqual((img.format, img.size), ('WEBP', (20, 12)))
+        with self.open_rendition('large', 'jpeg') as img:
+            self.assertEqual((img.format, img.size), ('JPEG', (50, 30)))
+
+    def test_renditions_logged_for_sync(self):
+        """Test the renditions becoming ready are a change of the recipe for the sync and the list ETags"""
+        res = self.client.post(
+            image_upload_url(self.recipe.id), {'image': ContentFile(sample_jpeg(), name='photo.jpg')}, format='multipart'
+        )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        version = get_collection_version(self.user.pk)
+        self.recipe.refresh_from_db()
+
+        images.process_recipe_image(self.recipe.id, self.recipe.image.name)
+
+        self.assertEqual(get_collection_version(self.user.pk), version + 1)
+        self.assertTrue(ChangeLog.objects.filter(
+            useraccount=self.user, version=version + 1, model='recipe', object_id=self.recipe.id
+        ).exists())
+
+    def test_exif_stripped_after_rotation(self):
+        """Test the camera rotation is applied and the EXIF metadata dropped"""
+        self.upload(sample_jpeg(orientation=6))  # rotated 90 degrees
+
+        for fmt in ('webp', 'jpeg'):
+            with self.open_rendition('large', fmt) as img:
+                self.assertEqual(img.size, (30, 50))
+                self.assertEqual(len(img.getexif()), 0)
+
+    def test_detail_exposes_rendition_urls(self):
+        """Test the recipe detail lists the rendition urls once ready"""
+        self.upload(sample_jpeg())
+
+        res = self.client.get(detail_url(self.recipe.id))
+
+        self.assertEqual(res.data['image_status'], Recipe.IMAGE_READY)
+        self.assertTrue(res.data['renditions']['thumbnail']['webp'].startswith('http://testserver/media/'))
+        self.assertTrue(res.data['renditions']['thumbnail']['webp'].endswith('.webp'))
+
+    def test_replaced_image_deletes_old_renditions(self):
+        """Test uploading a new image removes the renditions of the previous one"""
+        self.upload(sample_jpeg())
+        old_path = self.recipe.image.storage.path(self.recipe.image_renditions['large']['webp'])
+
+        self.upload(sample_jpeg(size=(40, 40)))
+
+        self.assertFalse(os.path.exists(old_path))
+        with self.open_rendition('large', 'webp') as img:
+            self.assertEqual(img.size, (40, 40))
+
+    def test_stale_job_discarded(self):
+        """Test a job for an image that was replaced meanwhile leaves the recipe and the storage alone"""
+        self.upload(sample_jpeg())
+        renditions = self.recipe.image_renditions
+        stale = self.recipe.image.storage.save('uploads/recipe/stale.jpg', ContentFile(sample_jpeg(size=(80, 80))))
+        blobs = ImageBlob.objects.count()
+
+        images.process_recipe_image(self.recipe.id, stale)
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_renditions, renditions)
+        self.assertEqual(ImageBlob.objects.count(), blobs)
+
+    def test_unreadable_image_fails(self):
+        """Test a file Pillow can't read marks the image as failed"""
+        name = self.recipe.image.storage.save('uploads/recipe/broken.jpg', ContentFile(b'not an image'))
+        Recipe.objects.filter(id=self.recipe.id).update(image=name, image_status=Recipe.IMAGE_PENDING)
+
+        images.process_recipe_image(self.recipe.id, name)
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_status, Recipe.IMAGE_FAILED)
+
+    def test_process_recipe_images_command(self):
+        """Test the command generates the renditions of pending images"""
+        name = self.recipe.image.storage.save('uploads/recipe/old.jpg', ContentFile(sample_jpeg()))
+        Recipe.objects.filter(id=self.recipe.id).update(image=name)
+        out = StringIO()
+
+        call_command('process_recipe_images', stdout=out)
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_status, Recipe.IMAGE_READY)
+        self.assertIn('Processed 1 images', out.getvalue())
+
+
+@override_settings(RECIPE_IMAGES={**IMAGES, 'WORKERS': 1})
+class ImageWorkerPoolTests(TransactionTestCase):
+    """Test the renditions generated in the worker pool after the upload commits"""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.media_settings = override_settings(MEDIA_ROOT=self.media_root)
+        self.media_settings.enable()
+
+    def tearDown(self):
+        self.media_settings.disable()
+        shutil.rmtree(self.media_root)
+
+    def test_upload_processed_in_pool(self):
+        """Test a queued job records the renditions"""
+        client = APIClient()
+        user = get_user_model().objects.create_user(os.environ.get('USER_EMAIL'), os.environ.get('USER_PASS'))
+        client.force_authenticate(user)
+        recipe = HelperSample.sample_recipe(user=user)
+
+        res = client.post(image_upload_url(recipe.id), {'image': ContentFile(sample_jpeg(), name='photo.jpg')}, format='multipart')
+        images.get_executor().submit(lambda: None).result()  # one worker: the image job ran before this one
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.image_status, Recipe.IMAGE_READY)
+
+
+@override_settings(RECIPE_IMAGES=IMAGES)
+class DeduplicatedImageTests(TestCase):
+    """Test the recipe images shared through the content-addressed storage"""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.media_settings = override_settings(MEDIA_ROOT=self.media_root)
+        self.media_settings.enable()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            os.environ.get('USER_EMAIL'),
+            os.environ.get('USER_PASS')
+        )
+        self.client.force_authenticate(self.user)
+
+    def tearDown(self):
+        self.media_settings.disable()
+        shutil.rmtree(self.media_root)
+
+    def upload(self, recipe, data):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(image_upload_url(recipe.id), {'image': ContentFile(data, name='photo.jpg')}, format='multipart')
+        recipe.refresh_from_db()
+
+    def test_same_photo_stored_once(self):
+        """Test two recipes with the same photo share its file and renditions"""
+        first = HelperSample.sample_recipe(user=self.user, title='First')
+        second = HelperSample.sample_recipe(user=self.user, title='Second')
+        data = sample_jpeg()
+
+        self.upload(first, data)
+        self.upload(second, data)
+
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertEqual(first.image_renditions, second.image_renditions)
+        self.assertEqual(ImageBlob.objects.get(name=first.image.name).refcount, 2)
+
+    def test_recipe_delete_releases_files(self):
+        """Test deleting a recipe only removes the files no other recipe uses"""
+        first = HelperSample.sample_recipe(user=self.user, title='First')
+        second = HelperSample.sample_recipe(user=self.user, title='Second')
+        self.upload(first, sample_jpeg())
+        self.upload(second, sample_jpeg())
+        path = first.image.path
+
+        first.delete()
+        self.assertTrue(os.path.exists(path))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertFalse(os.path.exists(path))
+        self.assertFalse(ImageBlob.objects.exists())
+
+    def test_replaced_image_released(self):
+        """Test uploading a new image deletes the previous file"""
+        recipe = HelperSample.sample_recipe(user=self.user)
+        self.upload(recipe, sample_jpeg())
+        old_path = recipe.image.path
+
+        self.upload(recipe, sample_jpeg(size=(40, 40)))
+
+        self.assertFalse(os.path.exists(old_path))
+
+    def test_image_blobs_command(self):
+        """Test the report and the reconciliation of the reference counts"""
+        first = HelperSample.sample_recipe(user=self.user, title='First')
+        second = HelperSample.sample_recipe(user=self.user, title='Second')
+        self.upload(first, sample_jpeg())
+        self.upload(second, sample_jpeg())
+        size = ImageBlob.objects.get(name=first.image.name).size
+        ImageBlob.objects.filter(name=first.image.name).update(refcount=5)
+        orphan = os.path.join(self.media_root, 'uploads/recipe/orphan.jpg')
+        with open(orphan, 'wb') as file:
+            file.write(b'orphan')
+        out = StringIO()
+
+        call_command('image_blobs', reconcile=True, min_age=0, stdout=out)
+
+        self.assertEqual(ImageBlob.objects.get(name=first.image.name).refcount, 2)
+        self.assertFalse(os.path.exists(orphan))
+        self.assertTrue(os.path.exists(first.image.path))
+        self.assertIn('Fixed 1 reference counts', out.getvalue())
+        self.assertIn('Saved ', out.getvalue())
+        self.assertGreaterEqual(int(out.getvalue().split('Saved ')[1].split()[0]), size)
+
+    def test_image_blobs_counted_under_lock(self):
+        """Test the references are counted once the blobs are locked, a concurrent upload can't be missed"""
+        self.upload(HelperSample.sample_recipe(user=self.user), sample_jpeg())
+
+        with CaptureQueriesContext(connection) as queries:
+            call_command('image_blobs', reconcile=True, stdout=StringIO())
+
+        sqls = [query['sql'] for query in queries.captured_queries]
+        locked = next(i for i, sql in enumerate(sqls) if 'FOR UPDATE' in sql and 'core_imageblob' in sql)
+        counted = next(i for i, sql in enumerate(sqls) if 'FROM "core_recipe"' in sql)
+        self.assertLess(locked, counted)
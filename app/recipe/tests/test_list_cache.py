@@ -0,0 +1,129 @@
+import os
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from recipe.cache import list_cache
+from recipe.tests.test_recipe_api import RECIPES_URL, HelperSample
+
+
+TAGS_URL = reverse('recipe:tag-list')
+
+
+class ListCacheTests(TestCase):
+    """Test the per-user list response cache"""
+
+    def setUp(self):
+        list_cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            os.environ.get('USER_EMAIL'),
+            os.environ.get('USER_PASS')
+        )
+        self.client.force_authenticate(self.user)
+        self.tag = HelperSample.sample_tag(user=self.user, tag_name='Vegan')
+        self.other_tag = HelperSample.sample_tag(user=self.user, tag_name='Dessert')
+        self.recipe = HelperSample.sample_recipe(user=self.user)
+        self.recipe.tag_fk.add(self.tag)
+
+    def tearDown(self):
+        list_cache.clear()
+
+    def test_second_request_from_cache(self):
+        """Test the same list is served from the cache after one query"""
+        first = self.client.get(RECIPES_URL)
+
+        with self.assertNumQueries(1):  # collection version
+            res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual((first['X-Cache'], res['X-Cache']), ('MISS', 'HIT'))
+        self.assertEqual(res.json(), first.json())
+
+    def test_params_normalized(self):
+        """Test the same filter written differently hits the same entry"""
+        ids = f'{self.other_tag.id},{self.tag.id}'
+        self.client.get(RECIPES_URL, {'tag_fk': ids})
+
+        res = self.client.get(RECIPES_URL, {'tag_fk': f'{self.tag.id},{self.other_tag.id},{self.tag.id}'})
+        self.assertEqual(res['X-Cache'], 'HIT')
+
+        res = self.client.get(RECIPES_URL, {'tag_fk': self.tag.id})
+        self.assertEqual(res['X-Cache'], 'MISS')
+
+    def test_unrelated_params_ignored(self):
+        """Test query params the list doesn't read share the entry"""
+        self.client.get(TAGS_URL, {'assigned_only': 1})
+
+        res = self.client.get(TAGS_URL, {'assigned_only': 1, 'utm_source': 'mail'})
+
+        self.assertEqual(res['X-Cache'], 'HIT')
+
+    def test_invalidated_by_writes(self):
+        """Test creating a tag or relating it to a recipe rebuilds the lists"""
+        self.client.get(TAGS_URL, {'assigned_only': 1})
+        self.client.get(RECIPES_URL, {'tag_fk': self.other_tag.id})
+
+        self.recipe.tag_fk.add(self.other_tag)
+
+        res = self.client.get(TAGS_URL, {'assigned_only': 1})
+        self.assertEqual(res['X-Cache'], 'MISS')
+        self.assertEqual(len(res.data['results']), 2)
+        res = self.client.get(RECIPES_URL, {'tag_fk': self.other_tag.id})
+        self.assertEqual(res['X-Cache'], 'MISS')
+        self.assertEqual(len(res.data['results']), 1)
+
+        self.client.post(TAGS_URL, {'tag_name': 'Quick'})
+        res = self.client.get(TAGS_URL)
+        self.assertEqual(res['X-Cache'], 'MISS')
+        self.assertIn('Quick', [tag['tag_name'] for tag in res.data['results']])
+
+    def test_cache_per_user(self):
+        """Test a user never gets the cached list of another user"""
+        self.client.get(TAGS_URL)
+        other = get_user_model().objects.create_user('other@testapp.com', 'testpass')
+        self.client.force_authenticate(other)
+
+        res = self.client.get(TAGS_URL)
+
+        self.assertEqual(res['X-Cache'], 'MISS')
+        self.assertEqual(res.data['results'], [])
+
+    def test_stats(self):
+        """Test the hits and misses are counted per viewset"""
+        self.client.get(TAGS_URL)
+        self.client.get(TAGS_URL)
+        self.client.get(RECIPES_URL)
+
+        self.assertEqual(list_cache.stats(), {
+            'tag': {'hits': 1, 'misses': 1},
+            'recipe': {'hits': 0, 'misses': 1},
+        })
+
+    @override_settings(
+        LIST_CACHE={'TTL': 60, 'SHARED_CACHE': 'default'},
+        CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    )
+    def test_shared_cache(self):
+        """Test a list cached by another worker is read from the shared cache"""
+        first = self.client.get(RECIPES_URL)
+        list_cache.clear()  # another worker: empty LRU, same shared cache
+
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res['X-Cache'], 'HIT')
+        self.assertEqual(res.json(), first.json())
+
+    @override_settings(LIST_CACHE={'TTL': 0})
+    def test_disabled(self):
+        """Test TTL 0 builds every list"""
+        self.client.get(TAGS_URL)
+
+        res = self.client.get(TAGS_URL)
+
+        self.assertNotIn('X-Cache', res)
+        self.assertEqual(list_cache.stats(), {})
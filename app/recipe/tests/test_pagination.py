@@ -0,0 +1,119 @@
+import os
+from base64 import b64encode
+from urllib.parse import urlencode
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Tag, Ingredient
+from recipe.tests.test_recipe_api import RECIPES_URL, HelperSample
+
+
+TAGS_URL = reverse('recipe:tag-list')
+INGREDIENTS_URL = reverse('recipe:ingredient-list')
+
+
+class KeysetPaginationTests(TestCase):
+    """Test the keyset (cursor) pagination of the recipe API list endpoints"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            os.environ.get('USER_EMAIL'),
+            os.environ.get('USER_PASS')
+        )
+        self.client.force_authenticate(self.user)
+
+    def walk(self, url, params):
+        """Follow the next links and return the ids of every page"""
+        pages = []
+        res = self.client.get(url, params)
+        while True:
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            pages.append([item['id'] for item in res.data['results']])
+            if not res.data['next']:
+                return pages
+            res = self.client.get(res.data['next'])
+
+    def test_tags_paged_on_name_and_id(self):
+        """Test tags are neither skipped nor repeated across pages"""
+        other = get_user_model().objects.create_user('other@testapp.com', 'testpass123')
+        for name in ('Vegan', 'Thai', 'Spicy', 'Dessert', 'Brunch', 'Asian'):
+            Tag.objects.create(useraccount=self.user, tag_name=name)
+            Tag.objects.create(useraccount=other, tag_name=name)
+
+        pages = self.walk(TAGS_URL, {'page_size': 2})
+
+        expected = list(Tag.objects.filter(useraccount=self.user).order_by('-tag_name', '-id').values_list('id', flat=True))
+        self.assertEqual([len(page) for page in pages], [2, 2, 2])
+        self.assertEqual(sum(pages, []), expected)
+
+    def test_ingredients_paged(self):
+        """Test ingredients are paged on (ing_name, id)"""
+        for name in ('Salt', 'Kale', 'Fig', 'Egg', 'Apple'):
+            Ingredient.objects.create(useraccount=self.user, ing_name=name)
+
+        pages = self.walk(INGREDIENTS_URL, {'page_size': 2})
+
+        expected = list(Ingredient.objects.order_by('-ing_name', '-id').values_list('id', flat=True))
+        self.assertEqual(sum(pages, []), expected)
+
+    def test_recipes_paged_newest_first(self):
+        """Test recipes are paged on id, newest first"""
+        recipes = [HelperSample.sample_recipe(user=self.user, title=f'Recipe {i}') for i in range(5)]
+
+        pages = self.walk(RECIPES_URL, {'page_size': 2})
+
+        self.assertEqual(pages, [
+            [recipes[4].id, recipes[3].id],
+            [recipes[2].id, recipes[1].id],
+            [recipes[0].id],
+        ])
+
+    def test_previous_link(self):
+        """Test the previous link returns the preceding page"""
+        recipes = [HelperSample.sample_recipe(user=self.user, title=f'Recipe {i}') for i in range(5)]
+
+        first = self.client.get(RECIPES_URL, {'page_size': 2})
+        self.assertIsNone(first.data['previous'])
+        second = self.client.get(first.data['next'])
+        previous = self.client.get(second.data['previous'])
+
+        self.assertEqual(
+            [item['id'] for item in previous.data['results']],
+            [recipes[4].id, recipes[3].id]
+        )
+        self.assertEqual(previous.data['next'], first.data['next'])
+
+    def test_deep_page_query_count(self):
+        """Test a page deep in the result costs the same queries as the first one"""
+        for i in range(10):
+            HelperSample.sample_recipe(user=self.user, title=f'Recipe {i}')
+        pages_url = self.client.get(RECIPES_URL, {'page_size': 2}).data['next']
+        for _ in range(3):
+            pages_url = self.client.get(pages_url).data['next']
+
+        with self.assertNumQueries(2):
+            res = self.client.get(pages_url)
+
+        self.assertEqual(len(res.data['results']), 2)
+
+    def test_invalid_cursor(self):
+        """Test a tampered cursor returns 404 instead of a server error"""
+        res = self.client.get(TAGS_URL, {'cursor': 'cD1ub3Rqc29u'})  # p=notjson
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_cursor_with_wrong_types(self):
+        """Test a cursor whose values don't fit the ordering fields returns 404"""
+        for url, params, position in ((TAGS_URL, {}, '["Tag", "abc"]'), (RECIPES_URL, {}, '["abc"]'),
+                                      (RECIPES_URL, {'ordering': 'price'}, '["cheap", 1]')):
+            cursor = b64encode(urlencode({'p': position}).encode()).decode()
+
+            res = self.client.get(url, {'cursor': cursor, **params})
+
+            self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
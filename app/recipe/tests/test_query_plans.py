@@ -0,0 +1,127 @@
+import os
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Tag, Ingredient, Recipe
+
+
+TAGS_URL = reverse('recipe:tag-list')
+INGREDIENTS_URL = reverse('recipe:ingredient-list')
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+# EXPLAIN-based harness: we run the real request, capture the SQL the viewset emitted and ask Postgres for the
+# plan of each statement. The test tables are tiny, so a sequential scan would always win on cost; we switch
+# seqscans off for the test transaction so the planner shows which index it *can* use for the query shape.
+@skipUnless(connection.vendor == 'postgresql', 'query plans are checked against PostgreSQL')
+class QueryPlanTests(TestCase):
+    """Test the list endpoint queries are served by the per-user indexes"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            os.environ.get('USER_EMAIL'),
+            os.environ.get('USER_PASS')
+        )
+        self.client.force_authenticate(self.user)
+
+        other = get_user_model().objects.create_user('other@testapp.com', 'testpass')
+        for owner in (self.user, other):
+            tags = [Tag.objects.create(useraccount=owner, tag_name=f'Tag {i}') for i in range(5)]
+            ingredients = [Ingredient.objects.create(useraccount=owner, ing_name=f'Ing {i}') for i in range(5)]
+            for i in range(10):
+                recipe = Recipe.objects.create(useraccount=owner, title=f'Recipe {i}', time_minutes=i, price=1)
+                recipe.tag_fk.add(tags[i % 5])
+                recipe.ingredient_fk.add(ingredients[i % 5])
+        self.tag = Tag.objects.filter(useraccount=self.user).first()
+
+    def explain(self, url, params=None, table=None):
+        """Run the request and return the plans of the captured statements (optionally only those on table)"""
+        with CaptureQueriesContext(connection) as captured:
+            res = self.client.get(url, params or {})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        plans = []
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            for query in captured.captured_queries:
+                sql = query['sql']
+                if not sql.startswith('SELECT') or (table and f'FROM "{table}"' not in sql):
+                    continue
+                cursor.execute(f'EXPLAIN {sql}')
+                plans.append('\n'.join(row[0] for row in cursor.fetchall()))
+            cursor.execute('SET LOCAL enable_seqscan = on')
+
+        self.assertTrue(plans, f'no query on {table} was captured')
+        return plans
+
+    def assertIndexUsed(self, plans, index_name):
+        """Assert at least one of the plans scans index_name"""
+        self.assertTrue(
+            any(index_name in plan for plan in plans),
+            f'{index_name} not used:\n' + '\n\n'.join(plans)
+        )
+
+    def test_tag_list_uses_user_name_index(self):
+        """Test listing tags scans the unique (useraccount, tag_name) index"""
+        plans = self.explain(TAGS_URL, table='core_tag')
+
+        self.assertIndexUsed(plans, 'core_tag_user_name_uniq')
+
+    def test_tag_list_next_page_uses_user_name_index(self):
+        """Test a keyset page of tags scans the unique (useraccount, tag_name) index"""
+        next_url = self.client.get(TAGS_URL, {'page_size': 2}).data['next']
+
+        plans = self.explain(next_url, table='core_tag')
+
+        self.assertIndexUsed(plans, 'core_tag_user_name_uniq')
+
+    def test_ingredient_list_uses_user_name_index(self):
+        """Test listing ingredients scans the unique (useraccount, ing_name) index"""
+        plans = self.explain(INGREDIENTS_URL, table='core_ingredient')
+
+        self.assertIndexUsed(plans, 'core_ing_user_name_uniq')
+
+    def test_recipe_list_uses_user_id_index(self):
+        """Test listing recipes scans (useraccount, id)"""
+        plans = self.explain(RECIPES_URL, table='core_recipe')
+
+        self.assertIndexUsed(plans, 'core_recipe_user_id_idx')
+
+    def test_recipe_tag_filter_uses_reverse_index(self):
+        """Test filtering recipes by tag looks the tag up in the (tag_id, recipe_id) index"""
+        plans = self.explain(RECIPES_URL, {'tag_fk': self.tag.id}, table='core_recipe')
+
+        self.assertIndexUsed(plans, 'core_recipe_tag_fk_tag_recipe_idx')
+
+    def test_recipe_match_all_uses_reverse_index(self):
+        """Test the match=all grouping reads the (tag_id, recipe_id) index"""
+        plans = self.explain(RECIPES_URL, {'tag_fk': self.tag.id, 'match': 'all'}, table='core_recipe')
+
+        self.assertIndexUsed(plans, 'core_recipe_tag_fk_tag_recipe_idx')
+
+    def test_assigned_only_uses_reverse_index(self):
+        """Test the assigned_only filter looks tags up in the (tag_id, recipe_id) index"""
+        plans = self.explain(TAGS_URL, {'assigned_only': 1}, table='core_tag')
+
+        self.assertIndexUsed(plans, 'core_recipe_tag_fk_tag_recipe_idx')
+
+    def test_recipe_time_range_uses_time_index(self):
+        """Test ?time_max= ordered by time scans (useraccount, time_minutes, id)"""
+        plans = self.explain(RECIPES_URL, {'time_max': 5, 'ordering': 'time_minutes'}, table='core_recipe')
+
+        self.assertIndexUsed(plans, 'core_recipe_user_time_idx')
+
+    def test_recipe_price_ordering_uses_price_index(self):
+        """Test ?ordering=-price scans (useraccount, price, id)"""
+        plans = self.explain(RECIPES_URL, {'ordering': '-price'}, table='core_recipe')
+
+        self.assertIndexUsed(plans, 'core_recipe_user_price_idx')
@@ -103,7 +103,7 @@ class PrivateRecipeApiTest(TestCase):
         serializer = RecipeSerializer(recipes, many=True)  # passing recipes into serializer
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
 
     def test_recipes_limited_to_user_only(self):
         """Test that Recipes return are for authenticated users only"""
@@ -128,8 +128,8 @@ class PrivateRecipeApiTest(TestCase):
         serializer = RecipeSerializer(recipes, many=True)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(res.data), 1)  # length of data (there is only 1 data return)
-        self.assertEqual(res.data, serializer.data)  # res.data is the data that was returned in the response and we expect that to equal the serializer data that we passed in
+        self.assertEqual(len(res.data['results']), 1)  # length of data (there is only 1 data return)
+        self.assertEqual(res.data['results'], serializer.data)  # res.data is the data that was returned in the response and we expect that to equal the serializer data that we passed in
 
         # print(res.data)
 
@@ -212,7 +212,7 @@ class PrivateRecipeApiTest(TestCase):
         """Test updating a recipe with patch"""
         recipe = HelperSample.sample_recipe(user=self.recipe_user)
         recipe.tag_fk.add(HelperSample.sample_tag(user=self.recipe_user))
-        new_tag = HelperSample.sample_tag(user=self.recipe_user, tag_name='Non-Veg')
+        new_tag = HelperSample.sample_tag(user=self.recipe_user, tag_name='Curry')
 
         payload = {'title': 'Chicken tikka', 'tag_fk': [new_tag.id]}
         url = detail_url(recipe.id)
@@ -304,8 +304,8 @@ class RecipeImageUploadTests(TestCase):
         serializer1 = RecipeSerializer(recipe1)
         serializer2 = RecipeSerializer(recipe2)
         serializer3 = RecipeSerializer(recipe3)
-        self.assertIn(serializer1.data, res.data)
-        self.assertIn(serializer2.data, res.data)
+        self.assertIn(serializer1.data, res.data['results'])
+        self.assertIn(serializer2.data, res.data['results'])
         # self.assertNotIn(serializer3.data, res.data)
 
     def test_filter_recipes_by_ingredients(self):
@@ -328,6 +328,80 @@ class RecipeImageUploadTests(TestCase):
         serializer1 = RecipeSerializer(recipe1)
         serializer2 = RecipeSerializer(recipe2)
         serializer3 = RecipeSerializer(recipe3)
-        self.assertIn(serializer1.data, res.data)
-        self.assertIn(serializer2.data, res.data)
+        self.assertIn(serializer1.data, res.data['results'])
+        self.assertIn(serializer2.data, res.data['results'])
         # self.assertNotIn(serializer3.data, res.data)
+
+
+class RecipeFilterTests(TestCase):
+    """Test filtering recipes by tag and ingredient ids"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            os.environ.get('USER_EMAIL'),
+            os.environ.get("USER_PASS")
+        )
+        self.client.force_authenticate(self.user)
+
+        self.vegan = HelperSample.sample_tag(user=self.user, tag_name='Vegan')
+        self.quick = HelperSample.sample_tag(user=self.user, tag_name='Quick')
+        self.both = HelperSample.sample_recipe(user=self.user, title='Salad')
+        self.both.tag_fk.add(self.vegan, self.quick)
+        self.vegan_only = HelperSample.sample_recipe(user=self.user, title='Curry')
+        self.vegan_only.tag_fk.add(self.vegan)
+        self.untagged = HelperSample.sample_recipe(user=self.user, title='Steak')
+
+    def get_ids(self, params):
+        res = self.client.get(RECIPES_URL, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [recipe['id'] for recipe in res.data['results']]
+
+    def test_filter_any_returns_each_recipe_once(self):
+        """Test a recipe matching several tags is returned once"""
+        ids = self.get_ids({'tag_fk': f'{self.vegan.id},{self.quick.id}'})
+
+        self.assertEqual(ids, [self.vegan_only.id, self.both.id])
+
+    def test_filter_all(self):
+        """Test match=all returns the recipes having every tag"""
+        ids = self.get_ids({'tag_fk': f'{self.vegan.id},{self.quick.id}', 'match': 'all'})
+
+        self.assertEqual(ids, [self.both.id])
+
+    def test_filter_all_ignores_repeated_ids(self):
+        """Test an id given twice is only required once"""
+        ids = self.get_ids({'tag_fk': f'{self.quick.id},{self.quick.id}', 'match': 'all'})
+
+        self.assertEqual(ids, [self.both.id])
+
+    def test_filter_tags_and_ingredients(self):
+        """Test tag and ingredient filters are combined"""
+        tofu = HelperSample.sample_ingredient(user=self.user, ing_name='Tofu')
+        self.vegan_only.ingredient_fk.add(tofu)
+
+        ids = self.get_ids({'tag_fk': str(self.vegan.id), 'ingredient_fk': str(tofu.id)})
+
+        self.assertEqual(ids, [self.vegan_only.id])
+
+    def test_filter_many_ids(self):
+        """Test filtering with a long id list"""
+        tags = [HelperSample.sample_tag(user=self.user, tag_name=f'Tag {i}') for i in range(60)]
+        self.untagged.tag_fk.add(*tags)
+        tag_ids = ','.join(str(tag.id) for tag in tags)
+
+        self.assertEqual(self.get_ids({'tag_fk': tag_ids}), [self.untagged.id])
+        self.assertEqual(self.get_ids({'tag_fk': tag_ids, 'match': 'all'}), [self.untagged.id])
+
+    def test_filter_invalid_ids(self):
+        """Test a non numeric id returns a 400"""
+        res = self.client.get(RECIPES_URL, {'tag_fk': f'{self.vegan.id},abc'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('tag_fk', res.data)
+
+    def test_filter_invalid_match(self):
+        """Test an unknown match mode returns a 400"""
+        res = self.client.get(RECIPES_URL, {'tag_fk': str(self.vegan.id), 'match': 'some'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,150 @@
+import os
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Tag, Ingredient
+from recipe.tests.test_recipe_api import RECIPES_URL, HelperSample
+
+
+TAGS_URL = reverse('recipe:tag-list')
+FACETS_URL = reverse('recipe:facets')
+
+
+class RecipeCountTests(TestCase):
+    """Test the recipe_count of the tags and ingredients"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            os.environ.get('USER_EMAIL'),
+            os.environ.get('USER_PASS')
+        )
+        self.client.force_authenticate(self.user)
+        self.vegan = HelperSample.sample_tag(user=self.user, tag_name='Vegan')
+        self.quick = HelperSample.sample_tag(user=self.user, tag_name='Quick')
+        self.salt = HelperSample.sample_ingredient(user=self.user, ing_name='Salt')
+        self.recipes = [HelperSample.sample_recipe(user=self.user, title=f'Recipe {i}') for i in range(3)]
+
+    def assertCounts(self, **expected):
+        """Assert the recipe_count of the tags/ingredients named by the keywords"""
+        objects = {tag.tag_name: tag.recipe_count for tag in Tag.objects.all()}
+        objects.update((ing.ing_name, ing.recipe_count) for ing in Ingredient.objects.all())
+        self.assertEqual({name: objects[name] for name in expected}, expected)
+
+    def test_add_and_remove(self):
+        """Test linking and unlinking recipes moves the counts, links already made aren't counted twice"""
+        for recipe in self.recipes:
+            recipe.tag_fk.add(self.vegan)
+        self.recipes[0].tag_fk.add(self.vegan, self.quick)
+        self.recipes[0].ingredient_fk.add(self.salt)
+        self.assertCounts(Vegan=3, Quick=1, Salt=1)
+
+        self.recipes[1].tag_fk.remove(self.vegan, self.quick)  # Quick isn't linked to this recipe
+        self.assertCounts(Vegan=2, Quick=1)
+
+        self.recipes[0].tag_fk.clear()
+        self.assertCounts(Vegan=1, Quick=0)
+
+    def test_reverse_changes(self):
+        """Test the changes made from the tag side"""
+        self.vegan.recipe_set.add(*self.recipes)
+        self.assertCounts(Vegan=3)
+
+        self.vegan.recipe_set.remove(self.recipes[0])
+        self.assertCounts(Vegan=2)
+
+        self.vegan.recipe_set.clear()
+        self.assertCounts(Vegan=0)
+
+    def test_recipe_deleted(self):
+        """Test deleting a recipe uncounts it"""
+        self.recipes[0].tag_fk.add(self.vegan)
+        self.recipes[0].ingredient_fk.add(self.salt)
+
+        res = self.client.delete(f'{RECIPES_URL}{self.recipes[0].id}/')
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertCounts(Vegan=0, Salt=0)
+
+    def test_api_writes_counted(self):
+        """Test the recipes created, updated and bulk created through the API are counted"""
+        self.client.post(RECIPES_URL, {
+            'title': 'Curry', 'time_minutes': 30, 'price': '5.00', 'tag_fk': [self.vegan.id], 'tag_names': ['Spicy'],
+        }, format='json')
+        self.client.post(f'{RECIPES_URL}bulk/', [
+            {'title': f'Soup {i}', 'time_minutes': 5, 'price': '1.00', 'tag_fk': [self.vegan.id],
+             'ingredient_names': ['Salt']}
+            for i in range(2)
+        ], format='json')
+        self.assertCounts(Vegan=3, Spicy=1, Salt=2)
+
+        curry = self.vegan.recipe_set.get(title='Curry')
+        self.client.patch(f'{RECIPES_URL}{curry.id}/', {'tag_fk': [self.quick.id]}, format='json')
+        self.assertCounts(Vegan=2, Quick=1, Spicy=0)
+
+    def test_rename_keeps_count(self):
+        """Test saving a tag loaded before its recipes changed doesn't write its old count back"""
+        tag = Tag.objects.get(pk=self.vegan.pk)
+        self.recipes[0].tag_fk.add(self.vegan)
+
+        tag.tag_name = 'Plant based'
+        tag.save()
+
+        self.assertCounts(**{'Plant based': 1})
+
+    def test_list_with_counts(self):
+        """Test ?with_counts=1 adds the recipe_count to the list"""
+        self.recipes[0].tag_fk.add(self.vegan)
+
+        plain = self.client.get(TAGS_URL)
+        counted = self.client.get(TAGS_URL, {'with_counts': 1})
+
+        self.assertNotIn('recipe_count', plain.data['results'][0])
+        self.assertEqual(
+            {tag['tag_name']: tag['recipe_count'] for tag in counted.data['results']}, {'Vegan': 1, 'Quick': 0}
+        )
+        self.assertIn('recipe_count', self.client.get(TAGS_URL, {'with_counts': 'true'}).data['results'][0])
+
+    def test_list_with_counts_invalid(self):
+        """Test a ?with_counts= other than 0/1/true/false is a 400"""
+        res = self.client.get(TAGS_URL, {'with_counts': 'yes'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('with_counts', res.data)
+
+    def test_facets(self):
+        """Test the facets list the used tags and ingredients, most used first"""
+        for recipe in self.recipes:
+            recipe.tag_fk.add(self.vegan)
+        self.recipes[0].tag_fk.add(self.quick)
+        other = get_user_model().objects.create_user('other@testapp.com', 'testpass')
+        HelperSample.sample_recipe(user=other).tag_fk.add(HelperSample.sample_tag(user=other, tag_name='Other'))
+
+        res = self.client.get(FACETS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['tags'], [
+            {'id': self.vegan.id, 'tag_name': 'Vegan', 'recipe_count': 3},
+            {'id': self.quick.id, 'tag_name': 'Quick', 'recipe_count': 1},
+        ])
+        self.assertEqual(res.data['ingredients'], [])
+        self.assertEqual(len(self.client.get(FACETS_URL, {'limit': 1}).data['tags']), 1)
+
+    def test_reconcile_command(self):
+        """Test the command fixes drifted counts"""
+        self.recipes[0].tag_fk.add(self.vegan)
+        Tag.objects.filter(pk=self.vegan.pk).update(recipe_count=7)
+        Ingredient.objects.filter(pk=self.salt.pk).update(recipe_count=2)
+        out = StringIO()
+
+        call_command('reconcile_recipe_counts', stdout=out)
+
+        self.assertIn('Fixed the recipe_count of 1 tags', out.getvalue())
+        self.assertCounts(Vegan=1, Quick=0, Salt=0)
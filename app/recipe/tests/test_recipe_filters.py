@@ -0,0 +1,73 @@
+import os
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from recipe.tests.test_recipe_api import RECIPES_URL, HelperSample
+
+
+class RecipeRangeFilterTests(TestCase):
+    """Test the time/price range filters and the ordering of the recipe list"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            os.environ.get('USER_EMAIL'),
+            os.environ.get('USER_PASS')
+        )
+        self.client.force_authenticate(self.user)
+        self.quick = HelperSample.sample_recipe(user=self.user, title='Quick', time_minutes=10, price='2.50')
+        self.cheap = HelperSample.sample_recipe(user=self.user, title='Cheap', time_minutes=45, price='1.00')
+        self.feast = HelperSample.sample_recipe(user=self.user, title='Feast', time_minutes=120, price='9.50')
+
+    def titles(self, **params):
+        res = self.client.get(RECIPES_URL, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [recipe['title'] for recipe in res.data['results']]
+
+    def test_time_max(self):
+        """Test ?time_max= keeps the recipes taking at most that many minutes"""
+        self.assertEqual(self.titles(time_max=45), ['Cheap', 'Quick'])
+
+    def test_price_range(self):
+        """Test ?price_min= and ?price_max= are inclusive bounds"""
+        self.assertEqual(self.titles(price_min='2.50'), ['Feast', 'Quick'])
+        self.assertEqual(self.titles(price_max='2.5'), ['Cheap', 'Quick'])
+        self.assertEqual(self.titles(price_min=2, price_max=20, time_max=60), ['Quick'])
+
+    def test_ordering(self):
+        """Test ?ordering= sorts on the field, descending with a -"""
+        self.assertEqual(self.titles(ordering='price'), ['Cheap', 'Quick', 'Feast'])
+        self.assertEqual(self.titles(ordering='-time_minutes'), ['Feast', 'Cheap', 'Quick'])
+        self.assertEqual(self.titles(ordering='id'), ['Quick', 'Cheap', 'Feast'])
+
+    def test_ordering_paginated(self):
+        """Test the pages of an ordering with equal values follow each other without repeats"""
+        for i in range(5):
+            HelperSample.sample_recipe(user=self.user, title=f'Same {i}', time_minutes=20, price='3.00')
+
+        res = self.client.get(RECIPES_URL, {'ordering': 'time_minutes', 'page_size': 2})
+        titles = [recipe['title'] for recipe in res.data['results']]
+        while res.data['next']:
+            res = self.client.get(res.data['next'])
+            titles += [recipe['title'] for recipe in res.data['results']]
+
+        self.assertEqual(titles, ['Quick'] + [f'Same {i}' for i in range(5)] + ['Cheap', 'Feast'])
+
+    def test_ordering_search_results(self):
+        """Test ?ordering= replaces the rank of a search"""
+        HelperSample.sample_recipe(user=self.user, title='Quick curry', time_minutes=5, price='4.00')
+
+        self.assertEqual(self.titles(q='quick', ordering='time_minutes'), ['Quick curry', 'Quick'])
+
+    def test_invalid_params(self):
+        """Test invalid values are a 400 naming the param"""
+        for params in ({'time_max': 'soon'}, {'time_max': -1}, {'price_min': 'cheap'}, {'price_max': 'NaN'},
+                       {'ordering': 'title'}, {'ordering': '-useraccount'}):
+            res = self.client.get(RECIPES_URL, params)
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn(next(iter(params)), res.data)
@@ -0,0 +1,80 @@
+import os
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from recipe.serializers import RecipeSerializer, RecipeDetailSerializer
+from recipe.tests.test_recipe_api import RECIPES_URL, HelperSample, detail_url
+
+
+# Query-count regression tests: the number of queries of the recipe endpoints must not grow with the number of
+# recipes (N+1 on tag_fk / ingredient_fk). If one of these fails, look at RecipeViewSet.get_queryset and list().
+class RecipeQueryCountTests(TestCase):
+    """Test the number of database queries issued by the recipe API"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            os.environ.get('USER_EMAIL'),
+            os.environ.get('USER_PASS')
+        )
+        self.client.force_authenticate(self.user)
+
+    def create_recipes(self, count):
+        """Create recipes with two tags and two ingredients each"""
+        tags = [HelperSample.sample_tag(user=self.user, tag_name=f'Tag {count}-{i}') for i in range(2)]
+        ingredients = [HelperSample.sample_ingredient(user=self.user, ing_name=f'Ing {count}-{i}') for i in range(2)]
+        recipes = []
+        for i in range(count):
+            recipe = HelperSample.sample_recipe(user=self.user, title=f'Recipe {i}')
+            recipe.tag_fk.add(*tags)
+            recipe.ingredient_fk.add(*ingredients)
+            recipes.append(recipe)
+
+        return recipes
+
+    def test_list_query_count_is_constant(self):
+        """Test listing recipes costs the same number of queries for 1 or 30 recipes"""
+        self.create_recipes(1)
+        with self.assertNumQueries(2):  # collection version, recipes with their M2M ids aggregated (recipe/rows.py)
+            res = self.client.get(RECIPES_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        self.create_recipes(29)
+        with self.assertNumQueries(2):
+            res = self.client.get(RECIPES_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_list_without_recipes(self):
+        """Test the through tables are not queried when there are no recipes"""
+        with self.assertNumQueries(2):  # collection version, recipes
+            res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_list_returns_related_ids(self):
+        """Test the id lists built from the through tables match the serializer output"""
+        recipes = self.create_recipes(3)
+        other = HelperSample.sample_recipe(user=self.user, title='No tags')
+
+        res = self.client.get(RECIPES_URL)
+
+        # M2M fields have no ordering, so compare the id lists as sets
+        def normalize(data):
+            return [dict(item, tag_fk=set(item['tag_fk']), ingredient_fk=set(item['ingredient_fk'])) for item in data]
+
+        expected = RecipeSerializer([other] + recipes[::-1], many=True)
+        self.assertEqual(normalize(res.data['results']), normalize(expected.data))
+
+    def test_detail_query_count(self):
+        """Test retrieving a recipe prefetches its tags and ingredients"""
+        recipe = self.create_recipes(1)[0]
+
+        with self.assertNumQueries(4):  # updated_at (ETag), recipe + tags + ingredients
+            res = self.client.get(detail_url(recipe.id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, RecipeDetailSerializer(recipe).data)
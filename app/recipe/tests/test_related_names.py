@@ -0,0 +1,144 @@
+import os
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Tag, Ingredient, Recipe
+from recipe.tests.test_recipe_api import HelperSample, detail_url
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+RECIPES_BULK_URL = reverse('recipe:recipe-bulk-create')
+TAGS_URL = reverse('recipe:tag-list')
+TAGS_BULK_URL = reverse('recipe:tag-bulk-create')
+INGREDIENTS_URL = reverse('recipe:ingredient-list')
+
+
+class RelatedNamesApiTests(TestCase):
+    """Test giving tags/ingredients by name and their per-user unique names"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            os.environ.get('USER_EMAIL'),
+            os.environ.get('USER_PASS')
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_create_recipe_with_names(self):
+        """Test existing names are reused and missing ones created"""
+        vegan = HelperSample.sample_tag(user=self.user, tag_name='Vegan')
+        payload = {
+            'title': 'Curry', 'time_minutes': 30, 'price': '5.00',
+            'tag_names': ['Vegan', 'Spicy', 'Spicy'], 'ingredient_names': ['Rice'],
+        }
+
+        res = self.client.post(RECIPES_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertNotIn('tag_names', res.data)
+        recipe = Recipe.objects.get(id=res.data['id'])
+        self.assertEqual(sorted(tag.tag_name for tag in recipe.tag_fk.all()), ['Spicy', 'Vegan'])
+        self.assertIn(vegan, recipe.tag_fk.all())
+        self.assertEqual(Tag.objects.filter(useraccount=self.user).count(), 2)
+        self.assertEqual([ing.ing_name for ing in recipe.ingredient_fk.all()], ['Rice'])
+
+    def test_names_combined_with_ids(self):
+        """Test names are added to the given ids"""
+        tag = HelperSample.sample_tag(user=self.user, tag_name='Vegan')
+        payload = {'title': 'Curry', 'time_minutes': 30, 'price': '5.00', 'tag_fk': [tag.id], 'tag_names': ['Spicy']}
+
+        res = self.client.post(RECIPES_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(res.data['tag_fk']), 2)
+
+    def test_names_are_per_user(self):
+        """Test another user's tag with the same name isn't reused"""
+        other = get_user_model().objects.create_user('other@testapp.com', 'testpass123')
+        other_tag = HelperSample.sample_tag(user=other, tag_name='Vegan')
+        payload = {'title': 'Curry', 'time_minutes': 30, 'price': '5.00', 'tag_names': ['Vegan']}
+
+        res = self.client.post(RECIPES_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertNotIn(other_tag.id, res.data['tag_fk'])
+        self.assertEqual(Tag.objects.filter(tag_name='Vegan').count(), 2)
+
+    def test_update_recipe_with_names(self):
+        """Test a partial update with only names adds them to the current tags"""
+        recipe = HelperSample.sample_recipe(user=self.user)
+        recipe.tag_fk.add(HelperSample.sample_tag(user=self.user, tag_name='Old'))
+        recipe.ingredient_fk.add(HelperSample.sample_ingredient(user=self.user, ing_name='Salt'))
+
+        res = self.client.patch(detail_url(recipe.id), {'tag_names': ['New', 'Old']}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(sorted(tag.tag_name for tag in recipe.tag_fk.all()), ['New', 'Old'])
+        self.assertEqual([ing.ing_name for ing in recipe.ingredient_fk.all()], ['Salt'])
+
+    def test_update_recipe_with_ids_and_names(self):
+        """Test names given with tag_fk are added to these ids, replacing the current tags"""
+        recipe = HelperSample.sample_recipe(user=self.user)
+        recipe.tag_fk.add(HelperSample.sample_tag(user=self.user, tag_name='Old'))
+        kept = HelperSample.sample_tag(user=self.user, tag_name='Kept')
+
+        res = self.client.patch(detail_url(recipe.id), {'tag_fk': [kept.id], 'tag_names': ['New']}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(sorted(tag.tag_name for tag in recipe.tag_fk.all()), ['Kept', 'New'])
+
+    def test_bulk_recipes_resolve_names_once(self):
+        """Test the names of all the items are resolved with one lookup per type"""
+        payload = [
+            {'title': f'Recipe {i}', 'time_minutes': 5, 'price': '1.00',
+             'tag_names': ['Vegan', f'Tag {i}'], 'ingredient_names': ['Salt']}
+            for i in range(20)
+        ]
+
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.post(RECIPES_BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Tag.objects.filter(useraccount=self.user).count(), 21)
+        self.assertEqual(Ingredient.objects.filter(useraccount=self.user).count(), 1)
+        self.assertEqual(Recipe.objects.get(title='Recipe 3').tag_fk.count(), 2)
+        # the change log adds a constant 3 queries per written model (version bump and read, log insert),
+        # the search vectors of the recipes one UPDATE and the recipe counts one UPDATE per distinct increment
+        self.assertLess(len(queries), 30)
+
+    def test_duplicate_tag_rejected(self):
+        """Test creating a tag with a name the user already has fails"""
+        HelperSample.sample_tag(user=self.user, tag_name='Vegan')
+
+        res = self.client.post(TAGS_URL, {'tag_name': 'Vegan'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('tag_name', res.data)
+
+    def test_duplicate_ingredient_rejected(self):
+        """Test creating an ingredient with a name the user already has fails"""
+        HelperSample.sample_ingredient(user=self.user, ing_name='Salt')
+
+        res = self.client.post(INGREDIENTS_URL, {'ing_name': 'Salt'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_duplicate_names_reported_per_item(self):
+        """Test names repeated in the payload or already existing are reported at their index"""
+        HelperSample.sample_tag(user=self.user, tag_name='Vegan')
+        payload = [{'tag_name': 'Vegan'}, {'tag_name': 'Spicy'}, {'tag_name': 'Spicy'}]
+
+        res = self.client.post(TAGS_BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('tag_name', res.data[0])
+        self.assertEqual(res.data[1], {})
+        self.assertIn('tag_name', res.data[2])
+        self.assertEqual(Tag.objects.filter(useraccount=self.user).count(), 1)
@@ -0,0 +1,66 @@
+import os
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from core.models import Recipe, Tag
+from recipe.rows import RowSerializer
+from recipe.serializers import RecipeSerializer, RecipeDetailSerializer, TagSerializer
+from recipe.tests.test_recipe_api import HelperSample
+from recipe.views import RecipeViewSet
+
+
+class RowSerializerTests(TestCase):
+    """Test the lists serialized from .values() rows match the serializers"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            os.environ.get('USER_EMAIL'),
+            os.environ.get('USER_PASS')
+        )
+
+    def serialize(self, serializer):
+        rows = RowSerializer(serializer)
+        return rows.to_representation(rows.values(serializer.Meta.model.objects.order_by('id')))
+
+    def test_recipes_match_serializer(self):
+        """Test prices, ids in insertion order and recipes without relations are serialized the same"""
+        tags = [HelperSample.sample_tag(user=self.user, tag_name=name) for name in ('B', 'A', 'C')]
+        with_tags = HelperSample.sample_recipe(user=self.user, price='2.5')
+        with_tags.tag_fk.add(tags[2])
+        with_tags.tag_fk.add(tags[0])  # one by one: add() inserts the rows of several ids in set order
+        with_tags.tag_fk.add(tags[1])
+        with_tags.ingredient_fk.add(HelperSample.sample_ingredient(user=self.user))
+        HelperSample.sample_recipe(user=self.user, title='Bare', link='https://example.com')
+
+        data = self.serialize(RecipeSerializer())
+
+        recipes = list(Recipe.objects.order_by('id'))
+        RecipeViewSet()._attach_related_ids(recipes)  # the ids in through-table order, as the list returned them
+        expected = RecipeSerializer(recipes, many=True).data
+        self.assertEqual(data, expected)
+        self.assertEqual([list(item) for item in data], [list(item) for item in expected])  # same key order
+        self.assertEqual(data[0]['price'], '2.50')
+        self.assertEqual(data[0]['tag_fk'], [tags[2].id, tags[0].id, tags[1].id])
+        self.assertEqual(data[1]['tag_fk'], [])
+
+    def test_tags_match_serializer(self):
+        """Test the tags are serialized the same"""
+        HelperSample.sample_tag(user=self.user, tag_name='Vegan')
+
+        self.assertEqual(self.serialize(TagSerializer()), TagSerializer(Tag.objects.order_by('id'), many=True).data)
+
+    def test_sparse_fields(self):
+        """Test a serializer restricted with fields only reads and returns these"""
+        HelperSample.sample_recipe(user=self.user, title='Curry')
+        rows = RowSerializer(RecipeSerializer(fields=['title']))
+
+        queryset = rows.values(Recipe.objects.all())
+
+        self.assertNotIn('core_recipe_tag_fk', str(queryset.query))
+        self.assertEqual(rows.to_representation(queryset), [{'title': 'Curry'}])
+
+    def test_nested_fields_unsupported(self):
+        """Test serializers nesting objects are refused"""
+        with self.assertRaises(TypeError):
+            RowSerializer(RecipeDetailSerializer())
@@ -0,0 +1,136 @@
+import os
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe
+from recipe.search import has_trigram
+from recipe.tests.test_recipe_api import RECIPES_URL, HelperSample
+
+
+class RecipeSearchTests(TestCase):
+    """Test the ?q= full-text search of the recipes"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            os.environ.get('USER_EMAIL'),
+            os.environ.get('USER_PASS')
+        )
+        self.client.force_authenticate(self.user)
+        self.curry = HelperSample.sample_recipe(user=self.user, title='Chicken curry')
+        self.soup = HelperSample.sample_recipe(user=self.user, title='Tomato soup')
+        self.salad = HelperSample.sample_recipe(user=self.user, title='Summer salad')
+
+    def search(self, q, **params):
+        res = self.client.get(RECIPES_URL, {'q': q, **params})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res
+
+    def titles(self, q):
+        return [recipe['title'] for recipe in self.search(q).data['results']]
+
+    def test_search_title(self):
+        """Test the recipes are matched by the words of their title"""
+        self.assertEqual(self.titles('curry'), ['Chicken curry'])
+        self.assertEqual(self.titles('tomato soup'), ['Tomato soup'])
+
+    def test_search_prefix(self):
+        """Test the words are matched as prefixes"""
+        self.assertEqual(self.titles('chick cur'), ['Chicken curry'])
+
+    def test_search_typo(self):
+        """Test a misspelled word is matched by trigram similarity"""
+        if not has_trigram():
+            self.skipTest('pg_trgm is not installed')
+        self.assertEqual(self.titles('chiken'), ['Chicken curry'])
+
+    def test_search_tags_and_ingredients(self):
+        """Test the names of the tags and ingredients are searched, and kept up to date"""
+        tag = HelperSample.sample_tag(user=self.user, tag_name='Vegan')
+        self.salad.tag_fk.add(tag)
+        self.soup.ingredient_fk.add(HelperSample.sample_ingredient(user=self.user, ing_name='Basil'))
+
+        self.assertEqual(self.titles('vegan'), ['Summer salad'])
+        self.assertEqual(self.titles('basil'), ['Tomato soup'])
+
+        tag.tag_name = 'Vegetarian'
+        tag.save()
+        self.assertEqual(self.titles('vegan'), [])
+        self.assertEqual(self.titles('vegetarian'), ['Summer salad'])
+
+        self.salad.tag_fk.clear()
+        self.assertEqual(self.titles('vegetarian'), [])
+
+    def test_search_deleted_tag(self):
+        """Test the name of a deleted tag is no longer found"""
+        tag = HelperSample.sample_tag(user=self.user, tag_name='Spicy')
+        self.curry.tag_fk.add(tag)
+
+        tag.delete()
+
+        self.assertEqual(self.titles('spicy'), [])
+
+    def test_search_renamed_recipe(self):
+        """Test a recipe is found by its new title"""
+        res = self.client.patch(f'{RECIPES_URL}{self.soup.id}/', {'title': 'Pumpkin soup'})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        self.assertEqual(self.titles('pumpkin'), ['Pumpkin soup'])
+        self.assertEqual(self.titles('tomato'), [])
+
+    def test_search_bulk_created(self):
+        """Test the recipes of the bulk endpoint are searchable"""
+        self.client.post(f'{RECIPES_URL}bulk/', [
+            {'title': 'Beef stew', 'time_minutes': 60, 'price': '9.00', 'ingredient_names': ['Carrot']},
+        ], format='json')
+
+        self.assertEqual(self.titles('carrot'), ['Beef stew'])
+
+    def test_search_ranked(self):
+        """Test a title match ranks above a tag match"""
+        self.soup.tag_fk.add(HelperSample.sample_tag(user=self.user, tag_name='Curry'))
+
+        self.assertEqual(self.titles('curry'), ['Chicken curry', 'Tomato soup'])
+
+    def test_search_paginated(self):
+        """Test the pages of a search follow the rank without repeating recipes"""
+        for i in range(5):
+            HelperSample.sample_recipe(user=self.user, title=f'Green curry {i}')
+
+        res = self.search('curry', page_size=2)
+        ids = [recipe['id'] for recipe in res.data['results']]
+        while res.data['next']:
+            res = self.client.get(res.data['next'])
+            ids += [recipe['id'] for recipe in res.data['results']]
+
+        self.assertEqual(len(ids), 6)
+        self.assertEqual(len(set(ids)), 6)
+
+    def test_search_other_user(self):
+        """Test the recipes of other users aren't searched"""
+        other = get_user_model().objects.create_user('other@testapp.com', 'testpass')
+        HelperSample.sample_recipe(user=other, title='Chicken curry')
+
+        self.assertEqual(len(self.titles('curry')), 1)
+
+    def test_search_without_words(self):
+        """Test a query without any word is a 400"""
+        res = self.client.get(RECIPES_URL, {'q': '&|!'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_update_search_vectors_command(self):
+        """Test the command rebuilds every vector"""
+        Recipe.objects.update(search_vector=None)
+        out = StringIO()
+
+        call_command('update_search_vectors', batch_size=2, stdout=out)
+
+        self.assertIn('3 recipes', out.getvalue())
+        self.assertEqual(self.titles('salad'), ['Summer salad'])
@@ -0,0 +1,90 @@
+import os
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from recipe.tests.test_recipe_api import RECIPES_URL, HelperSample, detail_url
+
+
+class SparseFieldsApiTests(TestCase):
+    """Test ?fields= and ?expand= of the recipe endpoints"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            os.environ.get('USER_EMAIL'),
+            os.environ.get('USER_PASS')
+        )
+        self.client.force_authenticate(self.user)
+        self.tag = HelperSample.sample_tag(user=self.user, tag_name='Vegan')
+        self.ingredient = HelperSample.sample_ingredient(user=self.user, ing_name='Salt')
+        self.recipe = HelperSample.sample_recipe(user=self.user, title='Curry')
+        self.recipe.tag_fk.add(self.tag)
+        self.recipe.ingredient_fk.add(self.ingredient)
+
+    def test_list_only_requested_fields(self):
+        """Test the list returns and selects only the requested fields"""
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(RECIPES_URL, {'fields': 'id,title'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['results'], [{'id': self.recipe.id, 'title': 'Curry'}])
+        sql = [query['sql'] for query in queries.captured_queries]
+        recipe_query = next(query for query in sql if 'FROM "core_recipe"' in query)
+        self.assertNotIn('"price"', recipe_query)
+        self.assertFalse(any('core_recipe_tag_fk' in query for query in sql))
+
+    def test_list_expand(self):
+        """Test the expanded relations are nested objects, the others stay ids"""
+        res = self.client.get(RECIPES_URL, {'expand': 'tag_fk'})
+
+        recipe = res.data['results'][0]
+        self.assertEqual(recipe['tag_fk'], [{'id': self.tag.id, 'tag_name': 'Vegan'}])
+        self.assertEqual(recipe['ingredient_fk'], [self.ingredient.id])
+
+    def test_list_expand_query_count(self):
+        """Test expanding costs one prefetch query per relation, not one per recipe"""
+        for i in range(5):
+            HelperSample.sample_recipe(user=self.user, title=f'Recipe {i}').tag_fk.add(self.tag)
+
+        with self.assertNumQueries(4):  # collection version, recipes, tags, ingredient ids
+            res = self.client.get(RECIPES_URL, {'expand': 'tag_fk'})
+
+        self.assertEqual(len(res.data['results']), 6)
+
+    def test_fields_with_expand(self):
+        """Test fields and expand combine"""
+        res = self.client.get(RECIPES_URL, {'fields': 'title,ingredient_fk', 'expand': 'ingredient_fk'})
+
+        self.assertEqual(res.data['results'], [
+            {'title': 'Curry', 'ingredient_fk': [{'id': self.ingredient.id, 'ing_name': 'Salt'}]}
+        ])
+
+    def test_detail_fields(self):
+        """Test the detail only returns the requested fields"""
+        res = self.client.get(detail_url(self.recipe.id), {'fields': 'title,tag_fk,renditions'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, {
+            'title': 'Curry', 'tag_fk': [{'id': self.tag.id, 'tag_name': 'Vegan'}], 'renditions': {}
+        })
+
+    def test_detail_etag_per_fieldset(self):
+        """Test another fieldset of the same recipe is not answered 304"""
+        etag = self.client.get(detail_url(self.recipe.id))['ETag']
+
+        res = self.client.get(detail_url(self.recipe.id), {'fields': 'id'}, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_unknown_fields_rejected(self):
+        """Test unknown or write-only fields and non-expandable relations are a 400"""
+        for params in ({'fields': 'id,secret'}, {'fields': 'tag_names'}, {'expand': 'title'}):
+            res = self.client.get(RECIPES_URL, params)
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,175 @@
+import os
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import ChangeLog
+from recipe.tests.test_recipe_api import RECIPES_URL, HelperSample
+from recipe.views import SyncView
+
+
+SYNC_URL = reverse('recipe:sync')
+BULK_TAGS_URL = reverse('recipe:tag-bulk-create')
+
+
+class SyncApiTests(TestCase):
+    """Test the delta sync endpoint"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            os.environ.get('USER_EMAIL'),
+            os.environ.get('USER_PASS')
+        )
+        self.client.force_authenticate(self.user)
+        self.tag = HelperSample.sample_tag(user=self.user, tag_name='Vegan')
+        self.recipe = HelperSample.sample_recipe(user=self.user)
+        self.recipe.tag_fk.add(self.tag)
+
+    def sync(self, since=None):
+        res = self.client.get(SYNC_URL, {'since': since} if since is not None else {})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res.data
+
+    def test_login_required(self):
+        """Test the sync needs an authenticated user"""
+        res = APIClient().get(SYNC_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_full_sync(self):
+        """Test a sync without token returns every object of the user"""
+        other = get_user_model().objects.create_user('other@testapp.com', 'testpass')
+        HelperSample.sample_tag(user=other, tag_name='Other')
+
+        data = self.sync()
+
+        self.assertEqual([tag['tag_name'] for tag in data['tags']['updated']], ['Vegan'])
+        self.assertEqual(data['recipes']['updated'][0]['tag_fk'], [self.tag.id])
+        self.assertEqual(data['ingredients'], {'updated': [], 'deleted': []})
+        self.assertFalse(data['more'])
+
+    def test_no_changes(self):
+        """Test a sync with the current token is empty"""
+        token = self.sync()['token']
+
+        with self.assertNumQueries(3):  # pruned version, cut-off version, change log
+            data = self.sync(token)
+
+        self.assertEqual(data['token'], token)
+        self.assertEqual(data['recipes'], {'updated': [], 'deleted': []})
+
+    def test_changes_since_token(self):
+        """Test only the objects written after the token are returned"""
+        token = self.sync()['token']
+        ingredient = HelperSample.sample_ingredient(user=self.user, ing_name='Salt')
+        self.recipe.ingredient_fk.add(ingredient)
+
+        data = self.sync(token)
+
+        self.assertEqual([ing['ing_name'] for ing in data['ingredients']['updated']], ['Salt'])
+        self.assertEqual(data['recipes']['updated'][0]['ingredient_fk'], [ingredient.id])
+        self.assertEqual(data['tags']['updated'], [])
+        self.assertGreater(int(data['token']), int(token))
+
+    def test_deleted_objects_tombstones(self):
+        """Test deletions are returned, with the recipes that lost a deleted tag"""
+        token = self.sync()['token']
+        tag_id = self.tag.id
+        self.tag.delete()
+
+        data = self.sync(token)
+
+        self.assertEqual(data['tags']['deleted'], [tag_id])
+        self.assertEqual(data['recipes']['updated'][0]['tag_fk'], [])
+
+        token = data['token']
+        recipe_id = self.recipe.id
+        self.client.delete(f'{RECIPES_URL}{recipe_id}/')
+        data = self.sync(token)
+        self.assertEqual(data['recipes'], {'updated': [], 'deleted': [recipe_id]})
+
+    def test_created_then_deleted(self):
+        """Test an object created and deleted after the token is only a tombstone"""
+        token = self.sync()['token']
+        tag = HelperSample.sample_tag(user=self.user, tag_name='Brief')
+        tag_id = tag.id
+        tag.delete()
+
+        data = self.sync(token)
+
+        self.assertEqual(data['tags'], {'updated': [], 'deleted': [tag_id]})
+
+    def test_bulk_created_logged(self):
+        """Test the objects of the bulk endpoint, which sends no signals, are synced"""
+        token = self.sync()['token']
+        self.client.post(BULK_TAGS_URL, [{'tag_name': 'Quick'}, {'tag_name': 'Spicy'}], format='json')
+
+        data = self.sync(token)
+
+        self.assertEqual(sorted(tag['tag_name'] for tag in data['tags']['updated']), ['Quick', 'Spicy'])
+
+    def test_tags_created_by_name_logged(self):
+        """Test tags created from the tag_names of a recipe are synced"""
+        token = self.sync()['token']
+        self.client.post(RECIPES_URL, {
+            'title': 'Curry', 'time_minutes': 30, 'price': '5.00', 'tag_names': ['Spicy']
+        }, format='json')
+
+        data = self.sync(token)
+
+        self.assertEqual([tag['tag_name'] for tag in data['tags']['updated']], ['Spicy'])
+
+    def test_more_pages(self):
+        """Test a response is cut after max_versions and the next call continues"""
+        token = self.sync()['token']
+        for i in range(3):
+            HelperSample.sample_tag(user=self.user, tag_name=f'Tag {i}')
+
+        with patch.object(SyncView, 'max_versions', 2):
+            first = self.sync(token)
+            second = self.sync(first['token'])
+
+        self.assertTrue(first['more'])
+        self.assertFalse(second['more'])
+        names = [tag['tag_name'] for data in (first, second) for tag in data['tags']['updated']]
+        self.assertEqual(names, ['Tag 0', 'Tag 1', 'Tag 2'])
+
+    def test_invalid_token(self):
+        """Test a token that is not a version is a 400"""
+        res = self.client.get(SYNC_URL, {'since': 'abc'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_token_from_the_future(self):
+        """Test a token above the collection version is a 400, not an empty diff"""
+        token = int(self.sync()['token'])
+
+        res = self.client.get(SYNC_URL, {'since': token + 1})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('since', res.data)
+
+    def test_pruned_token(self):
+        """Test a token older than the pruned change log is a 410"""
+        token = self.sync()['token']
+        HelperSample.sample_tag(user=self.user, tag_name='Old')
+        ChangeLog.objects.update(created_at=timezone.now() - timedelta(days=60))
+        out = StringIO()
+
+        call_command('prune_change_log', days=30, stdout=out)
+
+        self.assertIn('Deleted', out.getvalue())
+        self.assertFalse(ChangeLog.objects.exists())
+        res = self.client.get(SYNC_URL, {'since': token})
+        self.assertEqual(res.status_code, status.HTTP_410_GONE)
+        self.assertEqual(self.sync(self.sync()['token'])['tags']['updated'], [])
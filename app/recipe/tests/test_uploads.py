@@ -0,0 +1,266 @@
+import hashlib
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from PIL import Image
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import ImageUpload, Recipe
+from recipe import uploads
+from recipe.tests.test_recipe_api import HelperSample
+
+
+def start_url(recipe_id):
+    return reverse('recipe:recipe-start-upload', args=[recipe_id])
+
+
+def chunk_url(recipe_id, upload_id):
+    return reverse('recipe:recipe-upload-chunk', args=[recipe_id, upload_id])
+
+
+def finalize_url(recipe_id, upload_id):
+    return reverse('recipe:recipe-finalize-upload', args=[recipe_id, upload_id])
+
+
+def sample_png(size=(300, 200)):
+    """Return the bytes of a noisy (barely compressible) PNG"""
+    out = BytesIO()
+    Image.frombytes('RGB', size, os.urandom(size[0] * size[1] * 3)).save(out, 'PNG')
+    return out.getvalue()
+
+
+class ChunkedUploadTests(TestCase):
+    """Test the resumable chunked image uploads"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.uploads = {'TEMP_DIR': os.path.join(self.temp_dir, 'uploads'), 'MAX_CHUNK_SIZE': 64 * 1024}
+        self.media_settings = override_settings(
+            MEDIA_ROOT=os.path.join(self.temp_dir, 'media'),
+            CHUNKED_UPLOADS=self.uploads,
+            RECIPE_IMAGES={'WORKERS': 0},
+        )
+        self.media_settings.enable()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            os.environ.get('USER_EMAIL'),
+            os.environ.get('USER_PASS')
+        )
+        self.client.force_authenticate(self.user)
+        self.recipe = HelperSample.sample_recipe(user=self.user)
+
+    def tearDown(self):
+        self.media_settings.disable()
+        shutil.rmtree(self.temp_dir)
+
+    def start(self, data, filename='photo.png'):
+        res = self.client.post(start_url(self.recipe.id), {
+            'filename': filename, 'size': len(data), 'sha256': hashlib.sha256(data).hexdigest()
+        })
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        return res.data
+
+    def put_chunk(self, upload_id, data, start, total, **headers):
+        return self.client.generic(
+            'PUT', chunk_url(self.recipe.id, upload_id), data, content_type='application/octet-stream',
+            HTTP_CONTENT_RANGE=f'bytes {start}-{start + len(data) - 1}/{total}', **headers
+        )
+
+    def send(self, upload, data):
+        for start in range(0, len(data), upload['chunk_size']):
+            chunk = data[start:start + upload['chunk_size']]
+            res = self.put_chunk(upload['id'], chunk, start, len(data))
+            self.assertEqual(res.status_code, status.HTTP_200_OK, res.data)
+        return res
+
+    def test_chunked_upload(self):
+        """Test an image sent in chunks becomes the recipe image"""
+        data = sample_png()
+        upload = self.start(data)
+        self.assertEqual((upload['offset'], upload['chunk_size']), (0, 64 * 1024))
+
+        self.assertEqual(self.send(upload, data).data['offset'], len(data))
+        with self.captureOnCommitCallbacks(execute=True):
+            res = self.client.post(finalize_url(self.recipe.id, upload['id']))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.recipe.refresh_from_db()
+        with self.recipe.image.open('rb') as image:
+            self.assertEqual(image.read(), data)
+        self.assertEqual(self.recipe.image_status, Recipe.IMAGE_READY)
+        self.assertFalse(ImageUpload.objects.exists())
+        self.assertEqual(os.listdir(os.path.join(self.temp_dir, 'uploads')), [])
+
+    def test_resume_after_interrupted_chunk(self):
+        """Test a short chunk is discarded and the upload resumes from the last complete one"""
+        data = sample_png()
+        upload = self.start(data)
+        self.put_chunk(upload['id'], data[:1000], 0, len(data))
+
+        res = self.client.generic(
+            'PUT', chunk_url(self.recipe.id, upload['id']), data[1000:1500], content_type='application/octet-stream',
+            HTTP_CONTENT_RANGE=f'bytes 1000-2999/{len(data)}'
+        )
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        res = self.client.get(chunk_url(self.recipe.id, upload['id']))
+        self.assertEqual(res.data['offset'], 1000)
+        self.assertEqual(self.put_chunk(upload['id'], data[1000:], 1000, len(data)).status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
+    def test_chunk_at_wrong_offset(self):
+        """Test a chunk that doesn't start at the offset is a conflict"""
+        data = sample_png()
+        upload = self.start(data)
+
+        res = self.put_chunk(upload['id'], data[100:200], 100, len(data))
+
+        self.assertEqual(res.status_code, status.HTTP_409_CONFLICT)
+
+    def test_chunk_received_before_lock(self):
+        """Test the upload is only locked once the chunk arrived, and the offset is checked again under the lock"""
+        data = sample_png()
+        upload = self.start(data)
+        receive_chunk = uploads.receive_chunk
+
+        def receive_and_race(*args, **kwargs):
+            self.assertFalse(any('FOR UPDATE' in query['sql'] for query in captured.captured_queries))
+            received = receive_chunk(*args, **kwargs)
+            ImageUpload.objects.filter(id=upload['id']).update(offset=1000)  # another request appended a chunk
+            return received
+
+        with CaptureQueriesContext(connection) as captured, patch('recipe.uploads.receive_chunk', receive_and_race):
+            res = self.put_chunk(upload['id'], data[:1000], 0, len(data))
+
+        self.assertEqual(res.status_code, status.HTTP_409_CONFLICT)
+        self.assertTrue(any('FOR UPDATE' in query['sql'] for query in captured.captured_queries))
+        self.assertEqual(os.listdir(os.path.join(self.temp_dir, 'uploads')), [])  # the chunk file is removed
+
+    def test_chunk_checksum(self):
+        """Test a chunk not matching its X-Chunk-Sha256 is rejected"""
+        data = sample_png()
+        upload = self.start(data)
+
+        res = self.put_chunk(upload['id'], data[:1000], 0, len(data), HTTP_X_CHUNK_SHA256='0' * 64)
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        res = self.put_chunk(
+            upload['id'], data[:1000], 0, len(data), HTTP_X_CHUNK_SHA256=hashlib.sha256(data[:1000]).hexdigest()
+        )
+        self.assertEqual(res.data['offset'], 1000)
+
+    def test_not_an_image_rejected_on_first_chunk(self):
+        """Test the header is validated before the whole file is sent"""
+        data = b'%PDF-1.4 ' + os.urandom(200 * 1024)
+        upload = self.start(data, filename='doc.png')
+
+        with override_settings(CHUNKED_UPLOADS={**self.uploads, 'HEADER_MAX_SIZE': 32 * 1024}):
+            res = self.put_chunk(upload['id'], data[:64 * 1024], 0, len(data))
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(ImageUpload.objects.get(id=upload['id']).offset, 0)
+
+    def test_too_many_pixels_rejected(self):
+        """Test the image dimensions are checked from the header"""
+        data = sample_png()
+        upload = self.start(data)
+
+        with override_settings(CHUNKED_UPLOADS={**self.uploads, 'MAX_PIXELS': 100}):
+            res = self.put_chunk(upload['id'], data[:1000], 0, len(data))
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        res = self.put_chunk(upload['id'], data[:1000], 0, len(data))
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_concurrent_chunks_capped(self):
+        """Test a chunk is refused while the process writes MAX_CONCURRENT_CHUNKS others"""
+        data = sample_png()
+        upload = self.start(data)
+
+        with override_settings(CHUNKED_UPLOADS={**self.uploads, 'MAX_CONCURRENT_CHUNKS': 1}):
+            slots = uploads.get_slots()
+            slots.acquire()
+            try:
+                res = self.put_chunk(upload['id'], data[:1000], 0, len(data))
+            finally:
+                slots.release()
+
+        self.assertEqual(res.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+
+    def test_finalize_checks_file_checksum(self):
+        """Test the whole file has to match the announced sha256"""
+        data = sample_png(size=(20, 20))
+        res = self.client.post(start_url(self.recipe.id), {'filename': 'a.png', 'size': len(data), 'sha256': 'a' * 64})
+        self.send(res.data, data)
+
+        res = self.client.post(finalize_url(self.recipe.id, res.data['id']))
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.recipe.refresh_from_db()
+        self.assertFalse(self.recipe.image)
+
+    def test_finalize_incomplete_upload(self):
+        """Test an upload can't be finalized before all its bytes arrived"""
+        data = sample_png()
+        upload = self.start(data)
+        self.put_chunk(upload['id'], data[:1000], 0, len(data))
+
+        res = self.client.post(finalize_url(self.recipe.id, upload['id']))
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_upload_size_limit(self):
+        """Test an upload larger than MAX_SIZE can't be started"""
+        res = self.client.post(start_url(self.recipe.id), {
+            'filename': 'big.png', 'size': uploads.get_upload_settings()['MAX_SIZE'] + 1, 'sha256': 'a' * 64
+        })
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_filename_extension_checked(self):
+        """Test an upload whose name isn't an image extension is refused when it starts"""
+        data = sample_png(size=(20, 20))
+
+        res = self.client.post(start_url(self.recipe.id), {
+            'filename': 'x.html', 'size': len(data), 'sha256': hashlib.sha256(data).hexdigest()
+        })
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('filename', res.data)
+        self.assertFalse(ImageUpload.objects.exists())
+
+    def test_other_users_recipe(self):
+        """Test uploads are limited to the user's recipes"""
+        other = get_user_model().objects.create_user('other@testapp.com', 'testpass123')
+        recipe = HelperSample.sample_recipe(user=other)
+
+        res = self.client.post(start_url(recipe.id), {'filename': 'a.png', 'size': 10, 'sha256': 'a' * 64})
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_clear_stale_uploads(self):
+        """Test the command deletes expired uploads and their partial files"""
+        data = sample_png()
+        upload = self.start(data)
+        self.put_chunk(upload['id'], data[:1000], 0, len(data))
+        ImageUpload.objects.filter(id=upload['id']).update(created_at=timezone.now() - timedelta(days=2))
+        out = StringIO()
+
+        call_command('clear_stale_uploads', stdout=out)
+
+        self.assertFalse(ImageUpload.objects.exists())
+        self.assertEqual(os.listdir(os.path.join(self.temp_dir, 'uploads')), [])
+        self.assertIn('Deleted 1 stale uploads', out.getvalue())
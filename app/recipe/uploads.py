@@ -0,0 +1,219 @@
+"""
+Resumable chunked uploads of recipe images.
+
+    POST .../recipes/<id>/uploads/                      {"filename", "size", "sha256"} -> {"id", "offset", "chunk_size"}
+    PUT  .../recipes/<id>/uploads/<upload>/             raw bytes, Content-Range: bytes <start>-<end>/<size>,
+                                                        optional X-Chunk-Sha256: <hex digest of the chunk>
+    GET  .../recipes/<id>/uploads/<upload>/             -> {"offset"} to resume after a broken connection
+    POST .../recipes/<id>/uploads/<upload>/finalize/    checks the whole sha256 and stores the file as Recipe.image
+
+A chunk is copied from the request stream to a temporary <TEMP_DIR>/<upload id>.*.chunk file in BUFFER_SIZE pieces,
+so neither Django's upload handlers nor the serializer ever hold the photo. Only then is the ImageUpload row locked
+to check the offset again and append the chunk to <TEMP_DIR>/<upload id>.part: a slow client never keeps the row
+locked (and a transaction open) while it sends. At most MAX_CONCURRENT_CHUNKS chunks are received at once per worker
+process, which caps its upload memory to about MAX_CONCURRENT_CHUNKS * (BUFFER_SIZE + HEADER_MAX_SIZE).
+
+The image header is checked as soon as enough bytes arrived (Image.open only parses the header), so a file that
+isn't an image, or is too large in pixels, is rejected after its first chunk instead of after the whole upload.
+"""
+import hashlib
+import os
+import re
+import shutil
+import tempfile
+import threading
+from io import BytesIO
+
+from django.conf import settings
+from django.utils.translation import gettext_lazy as _
+from PIL import Image
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+
+
+DEFAULTS = {
+    'TEMP_DIR': '/vol/web/uploads',
+    'MAX_SIZE': 30 * 1024 * 1024,
+    'MAX_CHUNK_SIZE': 8 * 1024 * 1024,
+    'BUFFER_SIZE': 64 * 1024,
+    'HEADER_MAX_SIZE': 256 * 1024,  # an image whose header isn't parsed within these bytes is rejected
+    'MAX_CONCURRENT_CHUNKS': 4,
+    'FORMATS': ('JPEG', 'PNG', 'WEBP', 'GIF'),
+    'MAX_PIXELS': 50000000,
+    'EXPIRY_HOURS': 24,
+}
+
+CONTENT_RANGE_RE = re.compile(r'^bytes (\d+)-(\d+)/(\d+)$')
+
+
+def get_upload_settings():
+    """Return CHUNKED_UPLOADS merged with the defaults"""
+    return {**DEFAULTS, **getattr(settings, 'CHUNKED_UPLOADS', {})}
+
+
+class OffsetConflict(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = _('The chunk does not start at the current offset of the upload.')
+    default_code = 'offset_conflict'
+
+
+class ChunkTooLarge(APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = _('Chunk too large.')
+    default_code = 'chunk_too_large'
+
+
+class UploadsBusy(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = _('Too many chunks in progress, retry later.')
+    default_code = 'uploads_busy'
+
+
+def part_path(upload):
+    """Return the path of the file receiving the bytes of an upload"""
+    return os.path.join(get_upload_settings()['TEMP_DIR'], f'{upload.id}.part')
+
+
+def delete_part(upload):
+    """Delete the received bytes of an upload"""
+    try:
+        os.remove(part_path(upload))
+    except FileNotFoundError:
+        pass
+
+
+_slots = None
+_slots_count = 0
+_slots_lock = threading.Lock()
+
+
+def get_slots():
+    """Return the semaphore limiting the chunks written at once by this process"""
+    global _slots, _slots_count
+
+    count = get_upload_settings()['MAX_CONCURRENT_CHUNKS']
+    with _slots_lock:
+        if _slots is None or _slots_count != count:
+            _slots = threading.BoundedSemaphore(count)
+            _slots_count = count
+
+    return _slots
+
+
+def parse_content_range(value, size):
+    """Return (start, length) of a 'bytes <start>-<end>/<size>' header"""
+    match = CONTENT_RANGE_RE.match(value or '')
+    if not match:
+        raise ValidationError({'non_field_errors': ['Content-Range: bytes <start>-<end>/<size> is required.']})
+
+    start, end, total = (int(group) for group in match.groups())
+    if total != size or end < start or end >= size:
+        raise ValidationError({'non_field_errors': [f'Invalid Content-Range for an upload of {size} bytes.']})
+    return start, end - start + 1
+
+
+def receive_chunk(upload, stream, content_range, content_length, chunk_sha256=None):
+    """Copy the chunk read from stream to a temporary file, return (start, length, path of the file)"""
+    conf = get_upload_settings()
+    start, length = parse_content_range(content_range, upload.size)
+    if length > conf['MAX_CHUNK_SIZE']:
+        raise ChunkTooLarge(f'Chunks are limited to {conf["MAX_CHUNK_SIZE"]} bytes.')
+    if content_length != length:
+        raise ValidationError({'non_field_errors': ['Content-Length does not match Content-Range.']})
+    if start != upload.offset:  # the upload isn't locked yet, append_chunk() checks the offset again
+        raise OffsetConflict(f'Expected a chunk starting at byte {upload.offset}.')
+
+    slots = get_slots()
+    if not slots.acquire(timeout=1):
+        raise UploadsBusy()
+    try:
+        os.makedirs(conf['TEMP_DIR'], exist_ok=True)
+        digest = hashlib.sha256()
+        remaining = length
+        with tempfile.NamedTemporaryFile(dir=conf['TEMP_DIR'], prefix=f'{upload.id}.', suffix='.chunk',
+                                         delete=False) as chunk:
+            try:
+                while remaining:
+                    data = stream.read(min(conf['BUFFER_SIZE'], remaining))
+                    if not data:
+                        break
+                    chunk.write(data)
+                    digest.update(data)
+                    remaining -= len(data)
+
+                if remaining or (chunk_sha256 and digest.hexdigest() != chunk_sha256.lower()):
+                    raise ValidationError({'non_field_errors': ['Incomplete chunk.' if remaining else 'Chunk checksum mismatch.']})
+            except BaseException:
+                os.remove(chunk.name)
+                raise
+    finally:
+        slots.release()
+
+    return start, length, chunk.name
+
+
+def append_chunk(upload, start, length, chunk_path):
+    """Append a chunk received by receive_chunk() to the upload, the upload must be locked (select_for_update)"""
+    if start != upload.offset:  # another request appended the same chunk in the meantime
+        raise OffsetConflict(f'Expected a chunk starting at byte {upload.offset}.')
+
+    path = part_path(upload)
+    with open(chunk_path, 'rb') as chunk, open(path, 'r+b' if os.path.exists(path) else 'wb') as part:
+        part.seek(start)
+        part.truncate()  # drops what an interrupted chunk left after the offset
+        shutil.copyfileobj(chunk, part, get_upload_settings()['BUFFER_SIZE'])
+
+    if not upload.header_checked:
+        try:
+            upload.header_checked = check_header(path, start + length, complete=start + length == upload.size)
+        except ValidationError:
+            with open(path, 'r+b') as part:
+                part.truncate(start)
+            raise
+    upload.offset = start + length
+    upload.save(update_fields=['offset', 'header_checked'])
+
+
+# PIL.ImageFile.Parser would allocate the whole pixel buffer (load_prepare) as soon as it knows the size,
+# Image.open only parses the header and reads the pixels lazily, which we never do here
+def check_header(path, received, complete):
+    """Return True once the header of the received bytes is a valid image, False while more bytes are needed"""
+    conf = get_upload_settings()
+    with open(path, 'rb') as part:
+        prefix = part.read(min(received, conf['HEADER_MAX_SIZE']))
+
+    try:
+        with Image.open(BytesIO(prefix)) as image:
+            image_format, (width, height) = image.format, image.size
+    except Image.DecompressionBombError:
+        raise ValidationError({'non_field_errors': ['Image too large.']})
+    except (OSError, SyntaxError, EOFError, ValueError):
+        if complete or received >= conf['HEADER_MAX_SIZE']:
+            raise ValidationError({'non_field_errors': ['Upload a valid image.']})
+        return False
+
+    if image_format not in conf['FORMATS']:
+        raise ValidationError({'non_field_errors': [f'Unsupported image format {image_format}.']})
+    if width * height > conf['MAX_PIXELS']:
+        raise ValidationError({'non_field_errors': ['Image too large.']})
+    return True
+
+
+def verify_upload(upload):
+    """Check the complete upload against its sha256 and Pillow's verify()"""
+    conf = get_upload_settings()
+    if upload.offset != upload.size:
+        raise ValidationError({'non_field_errors': [f'Upload incomplete: {upload.offset} of {upload.size} bytes received.']})
+
+    digest = hashlib.sha256()
+    with open(part_path(upload), 'rb') as part:
+        for data in iter(lambda: part.read(conf['BUFFER_SIZE']), b''):
+            digest.update(data)
+    if digest.hexdigest() != upload.sha256:
+        raise ValidationError({'non_field_errors': ['File checksum mismatch.']})
+
+    try:
+        with Image.open(part_path(upload)) as image:
+            image.verify()  # checks the file structure without decoding the pixels
+    except Exception:
+        raise ValidationError({'non_field_errors': ['Upload a valid image.']})
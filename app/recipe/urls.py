@@ -13,5 +13,7 @@ app_name = 'recipe'
 
 urlpatterns = [
     path('', include(router.urls)),
+    path('sync/', views.SyncView.as_view(), name='sync'),
+    path('facets/', views.FacetsView.as_view(), name='facets'),
 
 ]
\ No newline at end of file
@@ -1,15 +1,34 @@
+import os
+from collections import defaultdict
+
+from django.core.files import File
+from django.db import transaction
+from django.db.models import Count, Exists, OuterRef
+from django.db.models.functions import Upper
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
+
 from rest_framework import viewsets, mixins
-from rest_framework.authentication import TokenAuthentication
 from rest_framework.permissions import IsAuthenticated
 
 from rest_framework.response import Response
-from rest_framework import viewsets, mixins, status
+from rest_framework import generics, viewsets, mixins, status
 
 from rest_framework.decorators import action, api_view  # to use add custom actions to views function()
+from rest_framework.exceptions import ValidationError
+from rest_framework.fields import DecimalField, IntegerField
+from rest_framework.generics import get_object_or_404
 
-from core.models import Tag, Ingredient, Recipe
+from core.conditional import collection_etag, make_etag
+from core.renderers import stream_response
+from core.models import Tag, Ingredient, Recipe, ImageUpload
+from user.authentication import CachedTokenAuthentication
 
-from . import serializers
+from . import images, search, serializers, sync, uploads
+from .cache import cache_list
+from .facets import facet_counts
+from .rows import RowSerializer
+from .pagination import KeysetPagination
 
 
 # Creating below mothod to handle RecipeImageSerializer class
@@ -23,9 +42,89 @@ def get_serializer_class(self):
     return self.serializer_class
 
 
+def recipe_etag(request, pk=None, **kwargs):
+    """Return the ETag of a recipe of the user from its updated_at and the url (?fields=), None without recipe"""
+    try:
+        updated_at = Recipe.objects.filter(useraccount=request.user, pk=pk).values_list('updated_at', flat=True).first()
+    except (TypeError, ValueError):  # not an id, the view answers 404
+        return None
+    return make_etag('recipe', pk, updated_at.isoformat(), request.get_full_path()) if updated_at else None
+
+
+# the on/off query params of our own (?with_counts=, ?facets=), a value we can't read is a 400 and not a 500
+FLAG_VALUES = {'0': False, 'false': False, '1': True, 'true': True}
+
+
+def query_flag(request, name):
+    """Return the boolean of a 0/1/true/false query param, False when it isn't given"""
+    value = request.query_params.get(name, '0')
+    try:
+        return FLAG_VALUES[value.lower()]
+    except KeyError:
+        raise ValidationError({name: ['Expected 0, 1, true or false.']})
+
+
+# Re-Usable mixin adding POST .../bulk/ to a viewset, used by our importers.
+# The whole list is validated first (many=True) and nothing is written if one item is invalid: the 400 response
+# holds one error dict per item, in the order of the payload ({} for the valid ones).
+class BulkCreateMixin:
+    """Create a list of objects in one request and one transaction"""
+    bulk_max_items = 10000
+
+    @action(methods=['POST'], detail=False, url_path='bulk')
+    def bulk_create(self, request):
+        """Create all the objects of the posted list"""
+        if not isinstance(request.data, list):
+            raise ValidationError({'non_field_errors': ['Expected a list of items.']})
+        if len(request.data) > self.bulk_max_items:
+            raise ValidationError({'non_field_errors': [f'At most {self.bulk_max_items} items per request.']})
+
+        serializer = self.get_serializer(data=request.data, many=True)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        with transaction.atomic():
+            self.perform_bulk_create(serializer)
+
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    def perform_bulk_create(self, serializer):
+        """Save the objects for the logged in user"""
+        serializer.save(useraccount=self.request.user)
+
+
+# Re-Usable mixin serializing a list from .values() rows (recipe/rows.py) instead of model instances,
+# the response is the same as the serializer's. Run ./manage.py benchmark_serializers to compare both.
+class RowListMixin:
+    """List action built from .values() rows"""
+
+    def list_rows(self, queryset):
+        """Return the (paginated) response of the queryset"""
+        rows = RowSerializer(self.get_serializer())
+        ordering = [name.lstrip('-') for name in self.ordering] + ['id']  # the pagination cursor reads them
+        queryset = rows.values(queryset, *ordering)
+
+        page = self.paginate_queryset(queryset)
+        data = rows.to_representation(page if page is not None else queryset)
+        if page is not None:
+            return self.get_paginated_response(data)
+
+        return Response(data)
+
+
+# Re-Usable mixin sending the large lists (more than JSON_RENDERING['STREAM_MIN_ITEMS'] items) as a streamed
+# response encoded one item at a time by core.renderers.StreamingJSONRenderer, the small ones are rendered as usual
+class StreamingResponseMixin:
+    """Stream the large JSON responses of the view"""
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        return stream_response(response)
+
+
 # creating Re-Usable Baes Class for Tag and Ingredient
 # we can create Baesclass and child class can inherit BaseClass
-# look for Example TagViewSet (inheriting base class) and IngredientsViewSet (without BaseClass)
+# look for Example TagViewSet and IngredientsViewSet (both inheriting base class)
 #
 #
 #
@@ -36,13 +135,82 @@ def get_serializer_class(self):
 #   there are create and update that validate the data with the is_valid method to be saved,
 #   and perform_create and perform_update that call the serializer's save method."""
 #
-class BaseRecipeAttrViewSet(viewsets.GenericViewSet,
+class BaseRecipeAttrViewSet(BulkCreateMixin,
+                            RowListMixin,
+                            StreamingResponseMixin,
+                            viewsets.GenericViewSet,
                             mixins.CreateModelMixin,
                             mixins.ListModelMixin):
     """Base viewset for user owned recipe attributes"""
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
+    pagination_class = KeysetPagination
+    recipe_field = None  # name of the Recipe ManyToManyField pointing at this model ('tag_fk', 'ingredient_fk')
+    list_cache_params = ('assigned_only', 'with_counts')  # query params changing the list (recipe/cache.py)
+    autocomplete_limit = 10  # names returned by autocomplete/ without ?limit=
+    autocomplete_max_limit = 50
 
+    def get_queryset(self):
+        """Return objects for the current authenticated user only"""
+
+        # assigned_only is a zero or a one (or false/true): with the query parameters, there's no concept of type,
+        # bool() of the string "0" would be True, so query_flag() reads the value and answers 400 to anything else
+        assigned_only = query_flag(self.request, 'assigned_only')
+        queryset = self.queryset.filter(useraccount=self.request.user)
+        if assigned_only:
+            queryset = self._filter_assigned_only(queryset)
+
+        return queryset.order_by(*self.ordering)
+
+    # ?with_counts=1 adds the recipe_count of the objects (recipe/counts.py) to the list and autocomplete/
+    def get_serializer(self, *args, **kwargs):
+        if query_flag(self.request, 'with_counts'):
+            kwargs['with_counts'] = True
+        return super().get_serializer(*args, **kwargs)
+
+    # creating private function to keep the objects which are used by at least one recipe.
+    # Joining the recipes (recipe__isnull=False) returns one row per recipe-tag pair which then needs a .distinct(),
+    # so Postgres sorts/hashes every pair of the user before removing the duplicates. A correlated EXISTS is a
+    # semi-join: it stops at the first matching through-table row, found in the (tag_id, recipe_id) index.
+    def _filter_assigned_only(self, queryset):
+        """Filter the queryset to objects assigned to a recipe"""
+        field = Recipe._meta.get_field(self.recipe_field)
+        assigned = field.remote_field.through.objects.filter(**{field.m2m_reverse_field_name(): OuterRef('pk')})
+
+        return queryset.filter(Exists(assigned))
+
+    # 304 Not Modified while the user's tags/ingredients/recipes didn't change (core/conditional.py),
+    # otherwise answered from the list cache (recipe/cache.py) when the same list was built before
+    @method_decorator(condition(etag_func=collection_etag))
+    @cache_list
+    def list(self, request, *args, **kwargs):
+        return self.list_rows(self.filter_queryset(self.get_queryset()))
+
+    # Trigger PostMan GET{{url}}/api/recipe/tags/autocomplete/?prefix=ve&limit=10
+    # the names starting with the prefix whatever the case, read from the (useraccount_id, upper(name)) index of
+    # migration core 0020 as a range scan; only the matching rows are sorted
+    @action(methods=['GET'], detail=False)
+    @method_decorator(condition(etag_func=collection_etag))
+    def autocomplete(self, request):
+        """Return the first objects whose name starts with ?prefix=, in alphabetical order"""
+        prefix = request.query_params.get('prefix', '')
+        if not prefix.strip():
+            raise ValidationError({'prefix': ['This query parameter is required.']})
+        try:
+            limit = int(request.query_params.get('limit', self.autocomplete_limit))
+        except ValueError:
+            limit = 0
+        if limit < 1:
+            raise ValidationError({'limit': ['Expected a positive integer.']})
+        limit = min(limit, self.autocomplete_max_limit)
+
+        name_field = self.get_serializer_class().name_field
+        rows = RowSerializer(self.get_serializer())
+        queryset = rows.values(
+            self.queryset.filter(useraccount=request.user, **{f'{name_field}__istartswith': prefix})
+        ).order_by(Upper(name_field), name_field, 'id')
+
+        return Response(rows.to_representation(queryset[:limit]))
 
     def perform_create(self, serializer):
         """Save objects into Database"""
@@ -56,74 +224,101 @@ class TagViewSet(BaseRecipeAttrViewSet):
 
     queryset = Tag.objects.all()
     serializer_class = serializers.TagSerializer
+    ordering = ('-tag_name', '-id')  # keyset pagination position, backed by the (useraccount, tag_name, id) index
+    recipe_field = 'tag_fk'
 
-    def get_queryset(self):
-        """Return objects for the current authenticated user only"""
-
-        # Implement feature for filtering tags
-        # The reason we pass it in as an integer first is because our assigned only
-        # Value is going to be a zero or a one they're going to be the supported values for assigned only and in
-        # With the query parameters, there's no concept of type So if you type one in the parameter
-        # then there's no way for it to know whether that was intended to be a string or whether it was intended to be a
-        # Integer because you don't put quotes around them when you do query parameters get parameters
-        # So what we need to do is first convert that to an integer and then convert to a boolean
-        # otherwise if you do boolean of a string with zero in it
-        assigned_only = bool(int(self.request.query_params.get('assigned_only', 0)))
-        queryset = self.queryset
-        if assigned_only:
-            queryset = queryset.filter(recipe__isnull=False)
-
-        return queryset.filter(useraccount=self.request.user).order_by('-tag_name').distinct()
-
-    # perform_create will execute bcoz we inherit BaseClass()
+    # get_queryset and perform_create will execute bcoz we inherit BaseClass()
 
 
-class IngredientViewSet(viewsets.GenericViewSet,
-                        mixins.ListModelMixin,
-                        mixins.CreateModelMixin):
+class IngredientViewSet(BaseRecipeAttrViewSet):
     """Manage ingredients in the database"""
     print('*****Ingredient_ViewSet*****')
 
-    authentication_classes = (TokenAuthentication,)
-    permission_classes = (IsAuthenticated,)
     queryset = Ingredient.objects.all()
     serializer_class = serializers.IngredientSerializer
-
-    # GET from Database
-    def get_queryset(self):
-        """return all objects for the current authenticated user only"""
-
-        # Implement feature for filtering ingredients
-        assigned_only = bool(int(self.request.query_params.get('assigned_only', 0)))
-        queryset = self.queryset
-        if assigned_only:
-            queryset = queryset.filter(recipe__isnull=False)
-
-        return queryset.filter(useraccount=self.request.user).order_by('-ing_name').distinct()
-
-    # '''create function is a function that allows us to hook into the create process when creating an object
-    # and what happens is when we do a create object in our viewset this function will be invoked and the serializer the
-    # validated sterilizer will be passed in as a serializer argument and then we can perform any modifications here that we'd like to create process'''
-    # Create/POST
-    def perform_create(self, serializer):
-        """Create a new Ingredient fpr logged in user"""
-        serializer.save(useraccount=self.request.user)
+    ordering = ('-ing_name', '-id')
+    recipe_field = 'ingredient_fk'
 
 
 # creating views function for Reverse' recipe-list' and 'recipe-detail'
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(BulkCreateMixin, RowListMixin, StreamingResponseMixin, viewsets.ModelViewSet):
     """Manage Recipe in the database"""
     print('*****Recipe_ViewSet*****')
 
     serializer_class = serializers.RecipeSerializer  # importing from recipe/serializer
     queryset = Recipe.objects.all()
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
+    pagination_class = KeysetPagination
+    ordering = ('-id',)
+    # query params changing the list (recipe/cache.py)
+    list_cache_params = (
+        'tag_fk', 'ingredient_fk', 'match', 'fields', 'expand', 'q', 'time_max', 'price_min', 'price_max', 'ordering',
+        'facets',
+    )
+    related_fields = ('tag_fk', 'ingredient_fk')
+    # ?time_max=30&price_max=5: query param -> (lookup, field validating the value)
+    range_filters = {
+        'time_max': ('time_minutes__lte', IntegerField(min_value=0)),
+        'price_min': ('price__gte', DecimalField(max_digits=None, decimal_places=None, min_value=0)),
+        'price_max': ('price__lte', DecimalField(max_digits=None, decimal_places=None, min_value=0)),
+    }
+    # ?ordering=price / -time_minutes, the id is the tie-breaker in the same direction (keyset pagination)
+    ordering_fields = ('id', 'time_minutes', 'price')
 
     # creating private function to convert Str(queryset) to integer(id)
-    def _params_to_ints(self, qryset):
-        """Convert a list of string IDs to a list of integers"""
-        return [int(str_id) for str_id in qryset.split(',')]
+    # a bad value (?tag_fk=1,abc) is reported as a 400 instead of letting int() raise a 500
+    def _params_to_ints(self, qryset, param='ids'):
+        """Convert a comma separated string of IDs to a sorted list of unique integers"""
+        try:
+            return sorted({int(str_id) for str_id in qryset.split(',') if str_id.strip()})
+        except ValueError:
+            raise ValidationError({param: [f'Expected a comma separated list of ids, got "{qryset}".']})
+
+    # the through table is filtered directly so a recipe matching several ids is still returned once:
+    #   match=any -> EXISTS (a through row for one of the ids), a semi-join on the (recipe_id, tag_id) index
+    #   match=all -> the recipe ids having a through row for every id (GROUP BY recipe_id HAVING COUNT = n),
+    #                read from the (tag_id, recipe_id) index; cheaper than one EXISTS per id for long id lists
+    def _filter_related(self, queryset, field_name, ids, match):
+        """Filter recipes by the ids of one of their ManyToMany fields"""
+        field = Recipe._meta.get_field(field_name)
+        rows = field.remote_field.through.objects.filter(**{f'{field.m2m_reverse_field_name()}__in': ids})
+        recipe = field.m2m_field_name()  # 'recipe'
+
+        if match == 'any':
+            return queryset.filter(Exists(rows.filter(**{recipe: OuterRef('pk')})))
+
+        # (recipe_id, tag_id) is unique so counting the rows counts the distinct matched ids
+        matched_all = rows.values(recipe).annotate(matched=Count('id')).filter(matched=len(ids)).values(recipe)
+        return queryset.filter(pk__in=matched_all)
+
+    # the ranges are plain comparisons on the columns: with the useraccount_id equality they are a range scan of
+    # the (useraccount, time_minutes, id) / (useraccount, price, id) index, already in the order of ?ordering=
+    def _filter_ranges(self, queryset):
+        """Filter recipes by the time_max, price_min and price_max query params"""
+        for param, (lookup, field) in self.range_filters.items():
+            value = self.request.query_params.get(param)
+            if value is None or value == '':
+                continue
+            try:
+                value = field.run_validation(value)
+            except ValidationError as exc:
+                raise ValidationError({param: exc.detail})
+            queryset = queryset.filter(**{lookup: value})
+
+        return queryset
+
+    def _ordering(self):
+        """Return the ordering of ?ordering=, None when it isn't given"""
+        value = self.request.query_params.get('ordering')
+        if not value:
+            return None
+        if value.lstrip('-') not in self.ordering_fields:
+            raise ValidationError({'ordering': [f'Expected one of {", ".join(self.ordering_fields)}, or -field.']})
+        if value.lstrip('-') == 'id':
+            return (value,)
+
+        return (value, '-id' if value.startswith('-') else 'id')
 
     # Trigger PostMan GET{{url}}/api/recipe/recipes/
     def get_queryset(self):
@@ -136,17 +331,156 @@ class RecipeViewSet(viewsets.ModelViewSet):
         # default the get function returns none so the tags key doesn't exist in our query params
         tag_fk = self.request.query_params.get('tag_fk')
         ingredient_fk = self.request.query_params.get('ingredient_fk')
+        # match=any (default) returns recipes with at least one of the ids, match=all the recipes having all of them
+        match = self.request.query_params.get('match', 'any')
+        if match not in ('any', 'all'):
+            raise ValidationError({'match': ['Expected "any" or "all".']})
+
         queryset = self.queryset
         # please look above private _param_to_int function()
         if tag_fk:  # if tag_fk is not None:
-            tag_ids = self._params_to_ints(tag_fk)
-            # __id__in means filter by id in foreign_key and return all of the tags where the ID is in the list that we provided
-            queryset = queryset.filter(tag_fk__id__in=tag_ids)
+            tag_ids = self._params_to_ints(tag_fk, 'tag_fk')
+            if tag_ids:
+                queryset = self._filter_related(queryset, 'tag_fk', tag_ids, match)
         if ingredient_fk:
-            ingredient_ids = self._params_to_ints(ingredient_fk)
-            queryset = queryset.filter(ingredient_fk__id__in=ingredient_ids)
+            ingredient_ids = self._params_to_ints(ingredient_fk, 'ingredient_fk')
+            if ingredient_ids:
+                queryset = self._filter_related(queryset, 'ingredient_fk', ingredient_ids, match)
+
+        queryset = queryset.filter(useraccount=self.request.user)
+
+        # ?q=chicken curry searches the titles, tag and ingredient names (recipe/search.py), best matches first.
+        # The pagination cursor then holds the (rank, id) of the last recipe of the page
+        q = self.request.query_params.get('q', '').strip()
+        if q and self.action == 'list':
+            queryset = search.search(queryset, q)
+            self.ordering = ('-rank', '-id')
+
+        # ?ordering= replaces the default order (-id, or the rank of a search), the pagination cursor follows it
+        if self.action == 'list':
+            queryset = self._filter_ranges(queryset)
+            self.ordering = self._ordering() or self.ordering
+
+        # per-action querysets: the detail serializer nests full Tag/Ingredient objects so we prefetch them
+        # (2 extra queries instead of 2 per recipe), the list only needs the ids which list() loads itself.
+        # With ?fields= only the columns and relations of the requested fields are read
+        fields, _ = self._sparse_fieldset()
+        if self.action in ('list', 'retrieve'):
+            queryset = queryset.prefetch_related(*self._nested_fields())
+            if fields is not None:
+                queryset = queryset.only(*self.get_serializer_class().columns(fields))
+
+        return queryset.order_by(*self.ordering)
+
+    # ?fields=id,title returns only these fields, ?expand=tag_fk,ingredient_fk nests the objects instead of their ids
+    def _sparse_fieldset(self):
+        """Return (fields, expand) of the query params, fields is None when every field is wanted"""
+        if self.action not in ('list', 'retrieve'):
+            return None, ()
+        if not hasattr(self, '_sparse'):
+            serializer_class = self.get_serializer_class()
+            readable = [name for name, field in serializer_class().fields.items() if not field.write_only]
+            self._sparse = (
+                self._field_names('fields', readable),
+                self._field_names('expand', serializer_class.expandable) or (),
+            )
+        return self._sparse
+
+    def _field_names(self, param, allowed):
+        """Return the comma separated field names of a query param, None when it isn't given"""
+        value = self.request.query_params.get(param)
+        if not value:
+            return None
+        names = [name.strip() for name in value.split(',') if name.strip()]
+        unknown = [name for name in names if name not in allowed]
+        if unknown:
+            raise ValidationError({param: [f'Unknown field(s): {", ".join(unknown)}.']})
+        return names
+
+    def _related_fields(self):
+        """Return the ManyToMany fields in the response"""
+        fields, _ = self._sparse_fieldset()
+        return [name for name in self.related_fields if fields is None or name in fields]
+
+    def _nested_fields(self):
+        """Return the ManyToMany fields whose objects are nested in the response, the others only show ids"""
+        _, expand = self._sparse_fieldset()
+        nested = self.related_fields if self.action == 'retrieve' else expand
+        return [name for name in self._related_fields() if name in nested]
+
+    def get_serializer(self, *args, **kwargs):
+        fields, expand = self._sparse_fieldset()
+        if fields is not None or expand:
+            kwargs.update(fields=fields, expand=expand)
+        return super().get_serializer(*args, **kwargs)
+
+    def _attach_related_ids(self, recipes, field_names=related_fields):
+        """Load the tag_fk and ingredient_fk ids of a page of recipes with one through-table query each"""
+        recipe_ids = [recipe.id for recipe in recipes]
+        if not recipe_ids:
+            return
+
+        for field_name in field_names:
+            field = Recipe._meta.get_field(field_name)
+            related_model = field.related_model
+            source, target = field.m2m_column_name(), field.m2m_reverse_name()  # 'recipe_id', 'tag_id'
+
+            # we only read the through table (recipe_id, tag_id), the tag table itself is never joined
+            related_ids = defaultdict(list)
+            rows = field.remote_field.through.objects.filter(
+                **{f'{source}__in': recipe_ids}
+            ).order_by('id').values_list(source, target)
+            for recipe_id, related_id in rows:
+                related_ids[recipe_id].append(related_id)
+
+            # fill Django's prefetch cache the same way prefetch_related() does, with pk-only (deferred) objects,
+            # so PrimaryKeyRelatedField reads recipe.tag_fk.all() without a query per recipe
+            for recipe in recipes:
+                related = getattr(recipe, field_name).all()
+                related._result_cache = [
+                    related_model.from_db(related.db, ['id'], [pk]) for pk in related_ids[recipe.id]
+                ]
+                related._prefetch_done = True
+                if not hasattr(recipe, '_prefetched_objects_cache'):
+                    recipe._prefetched_objects_cache = {}
+                recipe._prefetched_objects_cache[field_name] = related
 
-        return queryset.filter(useraccount=self.request.user)
+    # Trigger PostMan GET{{url}}/api/recipe/recipes/
+    @method_decorator(condition(etag_func=collection_etag))
+    @cache_list
+    def list(self, request, *args, **kwargs):
+        """Return the recipes of the user with their tag and ingredient ids"""
+        # ?facets=1 adds the tag/ingredient counts of all the recipes matching the filters (recipe/facets.py),
+        # next to the page: {"next": ..., "previous": ..., "results": [...], "facets": {"tags": [...], ...}}
+        with_facets = query_flag(request, 'facets')
+        queryset = self.filter_queryset(self.get_queryset())
+        response = self._list_page(queryset)
+
+        if with_facets and isinstance(response.data, dict):
+            response.data['facets'] = facet_counts(queryset)
+
+        return response
+
+    def _list_page(self, queryset):
+        """Return the response of the (paginated) recipes"""
+        nested = self._nested_fields()  # ?expand=, prefetched by get_queryset
+        if not nested:
+            return self.list_rows(queryset)
+
+        page = self.paginate_queryset(queryset)
+        recipes = list(page if page is not None else queryset)
+        self._attach_related_ids(recipes, [name for name in self._related_fields() if name not in nested])
+
+        serializer = self.get_serializer(recipes, many=True)
+        if page is not None:
+            return self.get_paginated_response(serializer.data)
+
+        return Response(serializer.data)
+
+    # Trigger PostMan GET{{url}}/api/recipe/recipes/<id>/
+    @method_decorator(condition(etag_func=recipe_etag))
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
 
     # way the Django rest framework knows which serializer to display in the browse-able api
     #   So what we will do is we will check if the action is 'retrieve' or 'upload-image'
@@ -156,8 +490,10 @@ class RecipeViewSet(viewsets.ModelViewSet):
 
         if self.action == 'retrieve':
             return serializers.RecipeDetailSerializer
-        elif self.action == 'upload_image':
+        elif self.action in ('upload_image', 'finalize_upload'):
             return serializers.RecipeImageSerializer
+        elif self.action in ('start_upload', 'upload_chunk'):
+            return serializers.ImageUploadSerializer
 
         return self.serializer_class
 
@@ -168,6 +504,12 @@ class RecipeViewSet(viewsets.ModelViewSet):
 
         serializer.save(useraccount=self.request.user)
 
+    # trigger PostMan POST{{url}}/api/recipe/recipes/bulk/
+    def perform_bulk_create(self, serializer):
+        """Create the recipes and load their tag/ingredient ids for the response"""
+        serializer.save(useraccount=self.request.user)
+        self._attach_related_ids(serializer.instance)
+
     # using 'action' decorator (Method='to allow user to post image for recipe'
     # detail=True ==>> action will be specific detailed recipe with us already exist and able to use detail URL that has the ID or the Recipe in the URL
     # url_path = 'upload-image' ==>> this is path that will be visible in out URL-PATH
@@ -181,7 +523,9 @@ class RecipeViewSet(viewsets.ModelViewSet):
         )
 
         if serializer.is_valid():
-            serializer.save()
+            old_image, old_renditions = recipe.image.name, recipe.image_renditions
+            recipe = serializer.save(image_status=Recipe.IMAGE_PENDING, image_renditions={})
+            self._image_replaced(recipe, old_image, old_renditions)
             return Response(
                 serializer.data,
                 status=status.HTTP_200_OK
@@ -191,3 +535,119 @@ class RecipeViewSet(viewsets.ModelViewSet):
             serializer.errors,
             status=status.HTTP_400_BAD_REQUEST
         )
+
+    @staticmethod
+    def _image_replaced(recipe, old_image, old_renditions):
+        """Release the previous image and its renditions and queue the new renditions"""
+        # the storage only removes the files once no other recipe references them (core/storage.py)
+        images.delete_image(old_image, old_renditions)
+        # the response doesn't wait for the resized copies, see recipe/images.py
+        images.schedule_renditions(recipe)
+
+    # chunked resumable uploads for big photos, see recipe/uploads.py for the protocol
+    # trigger PostMan POST{{url}}/api/recipe/recipes/<id>/uploads/
+    @action(methods=['POST'], detail=True, url_path='uploads')
+    def start_upload(self, request, pk=None):
+        """Start a chunked image upload"""
+        recipe = self.get_object()
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        serializer.save(recipe=recipe)
+
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    @staticmethod
+    def _get_upload(recipe, upload_id, lock=False):
+        """Return an upload of the recipe"""
+        queryset = ImageUpload.objects.filter(recipe=recipe)
+        if lock:
+            queryset = queryset.select_for_update()
+        return get_object_or_404(queryset, pk=upload_id)
+
+    # PUT sends the next chunk, GET returns the offset to resume from
+    @action(methods=['GET', 'PUT'], detail=True, url_path=r'uploads/(?P<upload_id>[0-9a-f-]{36})')
+    def upload_chunk(self, request, pk=None, upload_id=None):
+        """Receive a chunk of an upload"""
+        if request.method == 'GET':
+            return Response(self.get_serializer(self._get_upload(self.get_object(), upload_id)).data)
+
+        # the chunk is received before the upload is locked: the row lock (and the transaction) is only held to
+        # check the offset and append the chunk, not while a slow client sends it
+        recipe = self.get_object()
+        start, length, chunk_path = uploads.receive_chunk(
+            self._get_upload(recipe, upload_id),
+            request.stream,  # never request.data: the body is copied to disk as it is read
+            request.META.get('HTTP_CONTENT_RANGE'),
+            int(request.META.get('CONTENT_LENGTH') or 0),
+            request.META.get('HTTP_X_CHUNK_SHA256')
+        )
+        try:
+            with transaction.atomic():
+                upload = self._get_upload(recipe, upload_id, lock=True)  # one chunk appended at a time per upload
+                uploads.append_chunk(upload, start, length, chunk_path)
+        finally:
+            os.remove(chunk_path)
+
+        return Response(self.get_serializer(upload).data)
+
+    @action(methods=['POST'], detail=True, url_path=r'uploads/(?P<upload_id>[0-9a-f-]{36})/finalize')
+    def finalize_upload(self, request, pk=None, upload_id=None):
+        """Store a complete upload as the recipe image"""
+        recipe = self.get_object()
+        with transaction.atomic():
+            upload = self._get_upload(recipe, upload_id, lock=True)
+            uploads.verify_upload(upload)
+            path = uploads.part_path(upload)
+
+            old_image, old_renditions = recipe.image.name, recipe.image_renditions
+            recipe.image_status, recipe.image_renditions = Recipe.IMAGE_PENDING, {}
+            with open(path, 'rb') as part:
+                recipe.image.save(upload.filename, File(part))  # copied to the storage in chunks
+            upload.delete()
+            self._image_replaced(recipe, old_image, old_renditions)
+        os.remove(path)
+
+        return Response(self.get_serializer(recipe).data, status=status.HTTP_200_OK)
+
+
+# Trigger PostMan GET{{url}}/api/recipe/facets/?limit=20
+# the tags and ingredients used by the recipes of the user with their number of recipes, most used first.
+# Read from the recipe_count columns (recipe/counts.py), not counted from the through tables
+class FacetsView(StreamingResponseMixin, generics.GenericAPIView):
+    """Number of recipes per tag and per ingredient of the user"""
+    authentication_classes = (CachedTokenAuthentication,)
+    permission_classes = (IsAuthenticated,)
+    facets = {'tags': serializers.TagSerializer, 'ingredients': serializers.IngredientSerializer}
+
+    @method_decorator(condition(etag_func=collection_etag))
+    def get(self, request):
+        """Return {'tags': [...], 'ingredients': [...]} of the objects used by at least one recipe"""
+        limit = request.query_params.get('limit')
+        try:
+            limit = int(limit) if limit else None
+        except ValueError:
+            raise ValidationError({'limit': ['Expected an integer.']})
+
+        data = {}
+        for key, serializer_class in self.facets.items():
+            serializer = serializer_class(with_counts=True)
+            rows = RowSerializer(serializer)
+            queryset = rows.values(
+                serializer.Meta.model.objects.filter(useraccount=request.user, recipe_count__gt=0)
+            ).order_by('-recipe_count', serializer.name_field, 'id')
+            data[key] = rows.to_representation(queryset[:limit] if limit is not None else queryset)
+
+        return Response(data)
+
+
+# Trigger PostMan GET{{url}}/api/recipe/sync/?since=<token>
+class SyncView(StreamingResponseMixin, generics.GenericAPIView):
+    """Changes of the recipes, tags and ingredients of the user since a sync token"""
+    authentication_classes = (CachedTokenAuthentication,)
+    permission_classes = (IsAuthenticated,)
+    max_versions = 1000  # versions replayed per response, see recipe/sync.py
+
+    def get(self, request):
+        """Return the objects changed since ?since=<token>, all of them without it"""
+        since = sync.parse_token(request.query_params.get('since'))
+        return Response(sync.sync(request, since, self.max_versions))
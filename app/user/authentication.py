@@ -0,0 +1,125 @@
+"""
+Token authentication with a cache in front of the authtoken table.
+
+DRF's TokenAuthentication runs Token.objects.select_related('user').get(key=...) on every API call.
+CachedTokenAuthentication resolves the token key to the user from an in-process LRU (with a TTL) and, when
+configured, from a Django cache shared by all workers, and only goes to the database on a miss.
+Entries are invalidated by user/signals.py when a token is deleted or its UserAccount is saved.
+
+The shared cache only holds the user id of a token (no password hash outside the database): a worker missing
+the token in its LRU reads the user by primary key, the authtoken table is skipped.
+
+The signals only run in the worker making the change, the LRUs of the other workers can't be reached from there.
+With a shared cache the eviction also increments a generation counter of the token in it (add + incr, atomic in
+redis/memcached, and without expiry so it never restarts at a value an LRU entry still holds), and a worker checks
+that counter (one small shared cache read instead of the token + user SELECT) before trusting its LRU entry.
+Without a shared cache another worker keeps authenticating a deleted token until its entry expires, keep the TTL
+short then.
+
+settings.TOKEN_AUTH_CACHE = {
+    'TTL': 60,               # seconds an entry is trusted, without SHARED_CACHE how stale another worker's LRU can be
+    'MAX_SIZE': 10000,       # entries kept in the in-process LRU
+    'SHARED_CACHE': None,    # alias in settings.CACHES shared by the workers (redis, memcached...), None to disable
+}
+"""
+import copy
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from rest_framework.authentication import TokenAuthentication
+
+from core.cache import LocalCache
+
+
+DEFAULTS = {
+    'TTL': 60,
+    'MAX_SIZE': 10000,
+    'SHARED_CACHE': None,
+}
+
+
+def get_cache_settings():
+    """Return TOKEN_AUTH_CACHE merged with the defaults"""
+    return {**DEFAULTS, **getattr(settings, 'TOKEN_AUTH_CACHE', {})}
+
+
+class TokenUserCache:
+    """Two level token -> user cache: the in-process LRU, then the optional shared Django cache"""
+    key_prefix = 'auth-token:'
+    generation_prefix = 'auth-token-generation:'
+
+    def __init__(self):
+        self.local = LocalCache()
+
+    def _shared(self, conf):
+        return caches[conf['SHARED_CACHE']] if conf['SHARED_CACHE'] else None
+
+    def get(self, key):
+        conf = get_cache_settings()
+        shared = self._shared(conf)
+        generation_key = self.generation_prefix + key
+        # the LRU holds (user, generation of the token when it was cached)
+        entry = self.local.get(key)
+        if entry is not None and shared is not None:
+            if shared.get(generation_key, 0) != entry[1]:
+                self.local.delete(key)  # evicted by another worker
+                entry = None
+
+        if entry is None and shared is not None:
+            values = shared.get_many([self.key_prefix + key, generation_key])
+            user_id = values.get(self.key_prefix + key)
+            user = get_user_model().objects.filter(pk=user_id, is_active=True).first() if user_id else None
+            if user is not None:
+                entry = (user, values.get(generation_key, 0))
+                self.local.set(key, entry, conf['TTL'], conf['MAX_SIZE'])
+
+        # every request gets its own copy so attributes set on request.user don't leak into the cache
+        return copy.copy(entry[0]) if entry is not None else None
+
+    def set(self, key, user):
+        conf = get_cache_settings()
+        if not conf['TTL']:
+            return
+
+        shared = self._shared(conf)
+        generation = shared.get(self.generation_prefix + key, 0) if shared is not None else 0
+        self.local.set(key, (user, generation), conf['TTL'], conf['MAX_SIZE'])
+        if shared is not None:
+            shared.set(self.key_prefix + key, user.pk, conf['TTL'])
+
+    def delete(self, key):
+        conf = get_cache_settings()
+        self.local.delete(key)
+        shared = self._shared(conf)
+        if shared is not None:
+            shared.delete(self.key_prefix + key)
+            generation_key = self.generation_prefix + key
+            shared.add(generation_key, 0, None)
+            try:
+                shared.incr(generation_key)
+            except ValueError:  # dropped by the cache between add() and incr()
+                shared.set(generation_key, 1, None)
+
+    def clear(self):
+        """Empty the in-process LRU (the shared cache entries expire on their own)"""
+        self.local.clear()
+
+
+token_cache = TokenUserCache()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """Token authentication resolving the token key from the token cache before the database"""
+
+    def authenticate_credentials(self, key):
+        user = token_cache.get(key)
+        if user is not None:
+            # request.auth gets an unsaved Token carrying the key, like the one DRF would have loaded
+            return user, self.get_model()(key=key, user=user)
+
+        # miss: DRF looks the token up and rejects unknown keys and inactive users
+        user, token = super().authenticate_credentials(key)
+        token_cache.set(key, user)
+
+        return user, token
@@ -0,0 +1,45 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.hashers import check_password, get_hasher, identify_hasher, make_password
+
+from user.hashers import run_hashing
+
+
+UserModel = get_user_model()
+
+
+# Same checks as ModelBackend, but the password hashing itself goes through user.hashers.run_hashing, so with
+# PASSWORD_HASHING['OFFLOAD_WORKERS'] set it runs in the bounded pool. Only the pure CPU part is offloaded:
+# the user lookup and the re-hash save stay on the request thread and its database connection.
+class HashOffloadModelBackend(ModelBackend):
+    """Authenticate against AUTH_USER_MODEL verifying the password in the hashing pool"""
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+
+        try:
+            user = UserModel._default_manager.get_by_natural_key(username)
+        except UserModel.DoesNotExist:
+            # Run the default password hasher once to reduce the timing
+            # difference between an existing and a nonexistent user (#20760).
+            run_hashing(make_password, password)
+            return None
+
+        if not run_hashing(check_password, password, user.password):
+            return None
+
+        if self._must_rehash(user.password):
+            # transparent upgrade of PBKDF2 (or lower cost) hashes to the preferred hasher
+            user.password = run_hashing(make_password, password)
+            user.save(update_fields=['password'])
+
+        return user if self.user_can_authenticate(user) else None
+
+    @staticmethod
+    def _must_rehash(encoded):
+        """Return True when encoded isn't a hash of the preferred hasher with its current cost"""
+        preferred = get_hasher()
+        return identify_hasher(encoded).algorithm != preferred.algorithm or preferred.must_update(encoded)
@@ -0,0 +1,86 @@
+"""
+Password hashers with a cost configurable from settings.PASSWORD_HASHING, and the bounded thread pool used by
+user.backends.HashOffloadModelBackend to verify passwords off the request thread.
+
+The algorithm names are the stock Django ones ('argon2', 'bcrypt_sha256') so the hashes stay readable by Django's
+own hashers. When the cost settings change, must_update() reports the old hashes and they are re-hashed with the
+new cost on the next successful login, the same way PBKDF2 hashes are upgraded to the preferred hasher.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import Argon2PasswordHasher, BCryptSHA256PasswordHasher
+
+
+DEFAULTS = {
+    'HASHER': 'argon2',
+    'ARGON2_TIME_COST': 2,
+    'ARGON2_MEMORY_COST': 65536,  # KiB
+    'ARGON2_PARALLELISM': 1,
+    'BCRYPT_ROUNDS': 12,
+    'OFFLOAD_WORKERS': 0,
+}
+
+
+def get_hashing_settings():
+    """Return PASSWORD_HASHING merged with the defaults"""
+    return {**DEFAULTS, **getattr(settings, 'PASSWORD_HASHING', {})}
+
+
+class TunableArgon2PasswordHasher(Argon2PasswordHasher):
+    """Argon2 hasher whose time/memory cost and parallelism come from settings"""
+
+    @property
+    def time_cost(self):
+        return get_hashing_settings()['ARGON2_TIME_COST']
+
+    @property
+    def memory_cost(self):
+        return get_hashing_settings()['ARGON2_MEMORY_COST']
+
+    @property
+    def parallelism(self):
+        return get_hashing_settings()['ARGON2_PARALLELISM']
+
+
+class TunableBCryptSHA256PasswordHasher(BCryptSHA256PasswordHasher):
+    """bcrypt hasher whose number of rounds comes from settings"""
+
+    @property
+    def rounds(self):
+        return get_hashing_settings()['BCRYPT_ROUNDS']
+
+
+# argon2-cffi and bcrypt release the GIL while hashing, so a small pool really runs that many hashes in parallel
+# while it also caps how many CPU-heavy verifications a worker process runs at once during a login burst.
+_executor = None
+_executor_workers = 0
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """Return the password hashing pool, None when offloading is disabled"""
+    global _executor, _executor_workers
+
+    workers = get_hashing_settings()['OFFLOAD_WORKERS']
+    if not workers:
+        return None
+
+    with _executor_lock:
+        if _executor is None or _executor_workers != workers:
+            if _executor is not None:
+                _executor.shutdown(wait=False)
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash')
+            _executor_workers = workers
+
+    return _executor
+
+
+def run_hashing(func, *args):
+    """Run a (database free) hashing function in the pool, or inline when offloading is disabled"""
+    executor = get_executor()
+    if executor is None:
+        return func(*args)
+
+    return executor.submit(func, *args).result()
@@ -0,0 +1,49 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.hashers import check_password, get_hashers, make_password
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    """Django command to measure password verifications (logins) per second for each configured hasher"""
+
+    help = 'Time check_password() for every hasher of PASSWORD_HASHERS, on one thread and on --threads threads'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seconds', type=float, default=2.0, help='duration of each measurement')
+        parser.add_argument('--threads', type=int, default=4, help='threads of the parallel measurement, 0 to skip')
+
+    def handle(self, *args, **options):
+        """Handle the command"""
+        password = 'correct horse battery staple'
+        for hasher in get_hashers():
+            try:
+                encoded = make_password(password, hasher=hasher)
+            except ValueError as exc:  # library of the hasher isn't installed
+                self.stdout.write(f'{hasher.algorithm:>16}: skipped ({exc})')
+                continue
+
+            per_core = self.measure(password, encoded, options['seconds'], threads=1)
+            line = f'{hasher.algorithm:>16}: {per_core:8.1f} logins/sec per core'
+            if options['threads']:
+                parallel = self.measure(password, encoded, options['seconds'], threads=options['threads'])
+                line += f', {parallel:8.1f} logins/sec on {options["threads"]} threads'
+            self.stdout.write(line)
+
+    @staticmethod
+    def measure(password, encoded, seconds, threads):
+        """Return the check_password() calls per second over all threads"""
+        def worker():
+            done = 0
+            deadline = time.perf_counter() + seconds
+            while time.perf_counter() < deadline:
+                check_password(password, encoded)
+                done += 1
+            return done
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            total = sum(executor.map(lambda _: worker(), range(threads)))
+
+        return total / (time.perf_counter() - start)
@@ -0,0 +1,24 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from user.authentication import token_cache
+
+
+# Keep the token cache of user/authentication.py honest: a deleted token must stop authenticating and a
+# deactivated/updated UserAccount (e.g. through ManageUserView) must be reloaded from the database.
+@receiver(post_delete, sender=Token)
+def evict_deleted_token(sender, instance, **kwargs):
+    """Remove a deleted token from the token cache"""
+    token_cache.delete(instance.key)
+
+
+@receiver(post_save, sender=get_user_model())
+def evict_user_tokens(sender, instance, created, **kwargs):
+    """Remove the tokens of a saved user from the token cache"""
+    if created:
+        return
+
+    for key in Token.objects.filter(user_id=instance.pk).values_list('key', flat=True):
+        token_cache.delete(key)
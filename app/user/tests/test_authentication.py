@@ -0,0 +1,153 @@
+import os
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from user.authentication import TokenUserCache, token_cache
+
+
+ME_URL = reverse('user:me')
+TAGS_URL = reverse('recipe:tag-list')
+
+
+@override_settings(LIST_CACHE={'TTL': 0})  # every request reads the tags
+class CachedTokenAuthenticationTests(TestCase):
+    """Test the token cache in front of the authtoken table"""
+
+    def setUp(self):
+        token_cache.clear()
+        self.user = get_user_model().objects.create_user(
+            os.environ.get('USER_EMAIL'),
+            os.environ.get('USER_PASS'),
+            username=os.environ.get('USER_NAME'),
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def tearDown(self):
+        token_cache.clear()
+
+    def test_second_request_skips_token_lookup(self):
+        """Test the token is only looked up in the database on the first request"""
+        with self.assertNumQueries(3):  # token + user, collection version, tags
+            res = self.client.get(TAGS_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        with self.assertNumQueries(2):  # collection version, tags
+            res = self.client.get(TAGS_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_invalid_token_rejected(self):
+        """Test an unknown token is still rejected"""
+        self.client.credentials(HTTP_AUTHORIZATION='Token 0000')
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deleted_token_rejected(self):
+        """Test deleting a token evicts it from the cache"""
+        self.client.get(ME_URL)
+
+        self.token.delete()
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivated_user_rejected(self):
+        """Test deactivating a user evicts its token from the cache"""
+        self.client.get(ME_URL)
+
+        self.user.is_active = False
+        self.user.save()
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_profile_update_reloads_user(self):
+        """Test updating the user through ManageUserView refreshes the cached user"""
+        self.client.get(ME_URL)
+
+        self.client.patch(ME_URL, {'username': 'renamed'})
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.data['username'], 'renamed')
+
+    def test_entry_expires_after_ttl(self):
+        """Test a cached token is looked up again once the TTL passed"""
+        with patch('core.cache.time.monotonic', return_value=1000):
+            self.client.get(TAGS_URL)
+        with patch('core.cache.time.monotonic', return_value=1000 + 61):
+            with self.assertNumQueries(3):
+                self.client.get(TAGS_URL)
+
+    @override_settings(TOKEN_AUTH_CACHE={'TTL': 60, 'MAX_SIZE': 1})
+    def test_lru_size_bounded(self):
+        """Test the least recently used token is dropped when the LRU is full"""
+        other = get_user_model().objects.create_user('other@testapp.com', 'testpass')
+        other_token = Token.objects.create(user=other)
+        self.client.get(TAGS_URL)
+
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {other_token.key}')
+        self.client.get(TAGS_URL)
+
+        self.assertIsNone(token_cache.get(self.token.key))
+        self.assertEqual(token_cache.get(other_token.key), other)
+
+    @override_settings(
+        TOKEN_AUTH_CACHE={'TTL': 60, 'SHARED_CACHE': 'default'},
+        CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    )
+    def test_shared_cache(self):
+        """Test a token cached by another worker is read from the shared cache"""
+        self.client.get(TAGS_URL)
+        token_cache.clear()  # another worker: empty LRU, same shared cache
+
+        with CaptureQueriesContext(connection) as queries:  # user by id, collection version, tags
+            res = self.client.get(TAGS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(queries), 3)
+        self.assertFalse(any('authtoken' in query['sql'] for query in queries.captured_queries))
+        self.assertEqual(caches['default'].get(TokenUserCache.key_prefix + self.token.key), self.user.pk)
+        key = self.token.key
+        self.token.delete()
+        self.assertIsNone(token_cache.get(key))
+
+    @override_settings(
+        TOKEN_AUTH_CACHE={'TTL': 60, 'SHARED_CACHE': 'default'},
+        CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    )
+    def test_deleted_by_other_worker(self):
+        """Test a token deleted in another worker stops authenticating here while it is still in our LRU"""
+        self.client.get(TAGS_URL)
+
+        # the signal runs in the other worker and evicts its own LRU and the shared cache, not ours
+        with patch('user.signals.token_cache', TokenUserCache()):
+            self.token.delete()
+        res = self.client.get(TAGS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @override_settings(
+        TOKEN_AUTH_CACHE={'TTL': 60, 'SHARED_CACHE': 'default'},
+        CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    )
+    def test_every_eviction_counted(self):
+        """Test each eviction moves the generation of the token on"""
+        key = TokenUserCache.generation_prefix + self.token.key
+
+        token_cache.delete(self.token.key)
+        token_cache.delete(self.token.key)
+
+        self.assertEqual(caches['default'].get(key), 2)
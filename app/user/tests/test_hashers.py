@@ -0,0 +1,85 @@
+import os
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+
+TOKEN_URL = reverse('user:token')
+
+HASHING = {'HASHER': 'argon2', 'ARGON2_TIME_COST': 1, 'ARGON2_MEMORY_COST': 1024, 'ARGON2_PARALLELISM': 1}
+
+
+@override_settings(PASSWORD_HASHING=HASHING)
+class PasswordHashingTests(TestCase):
+    """Test the preferred hasher, the rehash on login and the hashing pool"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.email = os.environ.get('USER_EMAIL')
+        self.password = os.environ.get('USER_PASS')
+        self.user = get_user_model().objects.create_user(self.email, self.password)
+
+    def login(self, password=None):
+        return self.client.post(TOKEN_URL, {'email': self.email, 'password': password or self.password})
+
+    def test_new_password_uses_argon2(self):
+        """Test new users get an argon2 hash with the configured cost"""
+        self.assertTrue(self.user.password.startswith('argon2$argon2id$v=19$m=1024,t=1,p=1$'))
+
+    def test_pbkdf2_hash_upgraded_on_login(self):
+        """Test an existing PBKDF2 hash is re-hashed with argon2 on login"""
+        self.user.password = make_password(self.password, hasher='pbkdf2_sha256')
+        self.user.save()
+
+        res = self.login()
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('argon2$'))
+
+    def test_failed_login_keeps_hash(self):
+        """Test a wrong password doesn't re-hash anything"""
+        self.user.password = make_password(self.password, hasher='pbkdf2_sha256')
+        self.user.save()
+
+        res = self.login('wrong-password')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('pbkdf2_sha256$'))
+
+    def test_cost_change_rehashes_on_login(self):
+        """Test raising the argon2 cost re-hashes the password on the next login"""
+        with override_settings(PASSWORD_HASHING={**HASHING, 'ARGON2_TIME_COST': 2}):
+            res = self.login()
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.assertIn(',t=2,', self.user.password)
+
+    def test_unknown_user(self):
+        """Test an unknown email fails to authenticate"""
+        res = self.client.post(TOKEN_URL, {'email': 'nobody@testapp.com', 'password': self.password})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_login_with_hashing_pool(self):
+        """Test logins verified in the hashing thread pool"""
+        with override_settings(PASSWORD_HASHING={**HASHING, 'OFFLOAD_WORKERS': 2}):
+            self.assertEqual(self.login().status_code, status.HTTP_200_OK)
+            self.assertEqual(self.login('wrong-password').status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_benchmark_login(self):
+        """Test the login benchmark reports every hasher"""
+        out = StringIO()
+        call_command('benchmark_login', seconds=0.01, threads=0, stdout=out)
+
+        self.assertIn('argon2:', out.getvalue())
+        self.assertIn('pbkdf2_sha256:', out.getvalue())
@@ -165,3 +165,15 @@ class PrivateUserApiTests(TestCase):
         self.assertEqual(self.user.username, payload['username'])
         self.assertTrue(self.user.check_password(payload['password']))
         self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_profile_not_modified(self):
+        """Test the profile revalidated with its ETag is a 304 until it is updated"""
+        etag = self.client.get(ME_URL)['ETag']
+
+        res = self.client.get(ME_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.client.patch(ME_URL, {'username': 'renamed'})
+        res = self.client.get(ME_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['username'], 'renamed')
@@ -1,9 +1,18 @@
-from rest_framework import generics, authentication, permissions
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
+from rest_framework import generics, permissions
 from rest_framework.authtoken.views import ObtainAuthToken
 from rest_framework.settings import api_settings
 from user.serializers import UserSerializer
 
 from user.serializers import UserSerializer, AuthTokenSerializer
+from user.authentication import CachedTokenAuthentication
+from core.conditional import make_etag
+
+
+def user_etag(request, *args, **kwargs):
+    """Return the ETag of the authenticated user from its updated_at"""
+    return make_etag('me', request.user.pk, request.user.updated_at.isoformat())
 
 # Create your views here.
 class CreateUserView(generics.CreateAPIView):
@@ -27,8 +36,13 @@ class ManageUserView(generics.RetrieveUpdateAPIView):
     print('*****Manage_UserView*****')
 
     serializer_class = UserSerializer
-    authentication_classes = (authentication.TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (permissions.IsAuthenticated,)
 
     def get_object(self):
         return self.request.user
+
+    # Trigger PostMan GET{{url}}/api/user/me/, 304 Not Modified while the user didn't change
+    @method_decorator(condition(etag_func=user_etag))
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)